@@ -5,7 +5,18 @@
 # This script builds the den CLI as a standalone executable using PyInstaller
 # and installs it to ~/Local/den with a symlink at /usr/local/bin/den.
 #
-# Usage: ./install.sh
+# Usage: ./install.sh [--fast | --slim]
+#
+# Options:
+#   --fast  Build the fast-start profile (onedir layout, see den.spec). The
+#           build is installed to ~/Local/den.d/releases/<timestamp> and
+#           ~/Local/den becomes a symlink to it.
+#   --slim  Like --fast, but without the anthropic SDK and the AI Brewfile
+#           formatter. Set {"brew": {"formatter": "plain"}} in
+#           ~/.config/den/config.json to use it with `den brew upgrade`.
+#
+# Both profiles replace ~/Local/den atomically with a rename, so a den
+# process started during installation runs either the old or the new build.
 #
 # Exit codes:
 #   0 - Success
@@ -24,8 +35,12 @@ NC='\033[0m' # No Color
 # Installation paths
 BINARY_DIR="$HOME/Local"
 BINARY_PATH="$BINARY_DIR/den"
+RELEASES_DIR="$BINARY_DIR/den.d/releases"
 SYMLINK_PATH="/usr/local/bin/den"
 
+# Number of onedir (fast and slim) releases kept for rollback
+KEEP_RELEASES=3
+
 # Print colored status messages
 info() {
     echo -e "${GREEN}[INFO]${NC} $1"
@@ -39,6 +54,27 @@ error() {
     echo -e "${RED}[ERROR]${NC} $1"
 }
 
+# ============================================================================
+# Arguments
+# ============================================================================
+
+BUILD_PROFILE="onefile"
+for arg in "$@"; do
+    case "$arg" in
+        --fast)
+            BUILD_PROFILE="fast"
+            ;;
+        --slim)
+            BUILD_PROFILE="slim"
+            ;;
+        *)
+            error "Unknown option: $arg"
+            error "Usage: ./install.sh [--fast | --slim]"
+            exit 1
+            ;;
+    esac
+done
+
 # ============================================================================
 # Dependency Checks
 # ============================================================================
@@ -109,7 +145,7 @@ echo ""
 # Build Process
 # ============================================================================
 
-info "Building den executable with PyInstaller..."
+info "Building den executable with PyInstaller ($BUILD_PROFILE profile)..."
 echo ""
 
 # Clean previous builds
@@ -123,15 +159,21 @@ if [ -d "build" ]; then
 fi
 
 # Run PyInstaller using the virtual environment
-if ! $PYINSTALLER_CMD den.spec; then
+if ! DEN_BUILD_PROFILE="$BUILD_PROFILE" $PYINSTALLER_CMD den.spec; then
     error "PyInstaller build failed."
     error "Check the output above for details."
     exit 2
 fi
 
 # Verify build output
-if [ ! -f "dist/den" ]; then
-    error "Build completed but executable not found at dist/den"
+if [ "$BUILD_PROFILE" != "onefile" ]; then
+    BUILD_OUTPUT="dist/den/den"
+else
+    BUILD_OUTPUT="dist/den"
+fi
+
+if [ ! -f "$BUILD_OUTPUT" ]; then
+    error "Build completed but executable not found at $BUILD_OUTPUT"
     exit 2
 fi
 
@@ -153,15 +195,48 @@ if [ ! -d "$BINARY_DIR" ]; then
     fi
 fi
 
-# Copy executable to ~/Local/den
-info "Copying executable to $BINARY_PATH"
-if ! cp "dist/den" "$BINARY_PATH"; then
-    error "Failed to copy executable to $BINARY_PATH"
+# Stage the new build next to ~/Local/den, then rename it into place. The
+# rename is atomic, so running den processes keep the old build and new
+# invocations get the new one; nothing ever sees a partially copied file.
+STAGED_PATH="$BINARY_PATH.new.$$"
+
+if [ "$BUILD_PROFILE" != "onefile" ]; then
+    RELEASE_DIR="$RELEASES_DIR/$(date +%Y%m%d%H%M%S)"
+    info "Copying build to $RELEASE_DIR"
+    if ! mkdir -p "$RELEASES_DIR" || ! cp -R "dist/den" "$RELEASE_DIR"; then
+        error "Failed to copy build to $RELEASE_DIR"
+        exit 3
+    fi
+
+    if ! ln -s "$RELEASE_DIR/den" "$STAGED_PATH"; then
+        error "Failed to create symlink to $RELEASE_DIR/den"
+        exit 3
+    fi
+else
+    info "Copying executable to $BINARY_PATH"
+    if ! cp "dist/den" "$STAGED_PATH"; then
+        error "Failed to copy executable to $BINARY_PATH"
+        rm -f "$STAGED_PATH"
+        exit 3
+    fi
+
+    # Make sure it's executable
+    chmod +x "$STAGED_PATH"
+fi
+
+if ! mv -f "$STAGED_PATH" "$BINARY_PATH"; then
+    error "Failed to move new build into place at $BINARY_PATH"
+    rm -f "$STAGED_PATH"
     exit 3
 fi
 
-# Make sure it's executable
-chmod +x "$BINARY_PATH"
+# Prune old onedir releases, keeping the newest few for rollback
+if [ -d "$RELEASES_DIR" ]; then
+    ls -1 "$RELEASES_DIR" | sort -r | tail -n +$((KEEP_RELEASES + 1)) | while read -r old_release; do
+        info "Removing old release: $old_release"
+        rm -rf "${RELEASES_DIR:?}/$old_release"
+    done
+fi
 
 # Create symbolic link in /usr/local/bin
 info "Creating symbolic link at $SYMLINK_PATH"
@@ -217,6 +292,7 @@ echo -e "${GREEN}============================================${NC}"
 echo -e "${GREEN}  Installation completed successfully!${NC}"
 echo -e "${GREEN}============================================${NC}"
 echo ""
+echo "  Build profile: $BUILD_PROFILE"
 echo "  Binary location: $BINARY_PATH"
 echo "  Symlink location: $SYMLINK_PATH"
 echo ""
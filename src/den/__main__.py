@@ -1,10 +1,26 @@
 """Entry point for running den as a module or via PyInstaller.
 
 This module allows the package to be executed with `python -m den`
-and serves as the entry point for PyInstaller bundling.
+and serves as the entry point for PyInstaller bundling and the `den`
+console script. Commands are forwarded to a running den daemon when one
+is available, otherwise they run in-process.
 """
 
-from den.main import app
+import sys
+
+from den.daemon import forward_to_daemon
+
+
+def main() -> None:
+  """Run den, forwarding to the resident daemon if one is running."""
+  exit_code = forward_to_daemon(sys.argv[1:])
+  if exit_code is not None:
+    sys.exit(exit_code)
+
+  from den.main import app
+
+  app(prog_name="den")
+
 
 if __name__ == "__main__":
-  app()
+  main()
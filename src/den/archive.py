@@ -0,0 +1,203 @@
+"""Local content-addressed archive of Brewfiles.
+
+Every Brewfile that `den brew upgrade` generates (raw `brew bundle dump`
+output) or backs up (formatted) is kept under ~/.config/den/archive/:
+
+  objects/<algorithm>/<xx>/<rest of hex>.gz   gzip-compressed content
+  index.jsonl                                 one line per new version
+
+Objects are named by their compute_hash() digest, so identical content is
+stored once. The index records when each kind of Brewfile changed:
+
+  {"timestamp": 1760000000.0, "kind": "raw", "digest": "sha256:..."}
+
+A line is only appended when the content differs from the latest version
+of the same kind, so unchanged runs don't grow the archive. `den brew
+diff` reads versions from here without any network access.
+"""
+
+import gzip
+import json
+import time
+from dataclasses import asdict, dataclass
+from pathlib import Path
+
+from den.file_utils import append_bytes, atomic_write_bytes
+from den.hash_utils import compute_hash, parse_digest, verify_hash
+
+# Kinds of Brewfile stored in the archive
+RAW = "raw"
+FORMATTED = "formatted"
+KINDS = (RAW, FORMATTED)
+
+# Shortest hex prefix accepted as a reference to a version
+MIN_PREFIX_LENGTH = 6
+
+
+class ArchiveError(Exception):
+  """Raised when a version cannot be found or read from the archive."""
+
+
+def get_archive_dir() -> Path:
+  """Return the archive directory.
+
+  Returns:
+    Path to ~/.config/den/archive
+  """
+  return Path.home() / ".config" / "den" / "archive"
+
+
+@dataclass(frozen=True)
+class ArchiveEntry:
+  """One version recorded in the archive index.
+
+  Attributes:
+    timestamp: Unix time the version was archived.
+    kind: "raw" or "formatted".
+    digest: compute_hash() digest of the content.
+  """
+
+  timestamp: float
+  kind: str
+  digest: str
+
+
+class BrewfileArchive:
+  """Content-addressed, compressed Brewfile store with a version index.
+
+  Attributes:
+    root: The archive directory.
+  """
+
+  def __init__(self, root: Path | None = None):
+    self.root = root or get_archive_dir()
+
+  @property
+  def index_path(self) -> Path:
+    """Path of the version index."""
+    return self.root / "index.jsonl"
+
+  def object_path(self, digest: str) -> Path:
+    """Return where the content with the given digest is stored."""
+    algorithm, value = parse_digest(digest)
+    return self.root / "objects" / algorithm / value[:2] / f"{value[2:]}.gz"
+
+  def entries(self, kind: str | None = None) -> list[ArchiveEntry]:
+    """Return the indexed versions, oldest first.
+
+    Args:
+      kind: Only return versions of this kind.
+
+    Raises:
+      OSError: If the index exists but cannot be read.
+    """
+    try:
+      lines = self.index_path.read_text(encoding="utf-8").splitlines()
+    except FileNotFoundError:
+      return []
+
+    entries = []
+    for line in lines:
+      try:
+        entry = ArchiveEntry(**json.loads(line))
+      except (ValueError, TypeError):
+        # Skip a line torn by a crash mid-append
+        continue
+      if kind is None or entry.kind == kind:
+        entries.append(entry)
+    return entries
+
+  def store(
+    self, content: str, kind: str, timestamp: float | None = None
+  ) -> ArchiveEntry:
+    """Archive a Brewfile.
+
+    The object is written only if no identical content is stored yet, and
+    an index line is appended only if the content differs from the latest
+    version of the same kind.
+
+    Args:
+      content: Brewfile content.
+      kind: "raw" or "formatted".
+      timestamp: Unix time to record (defaults to now).
+
+    Returns:
+      The latest entry of that kind after storing.
+
+    Raises:
+      OSError: If the archive cannot be written.
+    """
+    digest = compute_hash(content)
+    path = self.object_path(digest)
+    if not path.exists():
+      atomic_write_bytes(path, gzip.compress(content.encode("utf-8"), mtime=0))
+
+    history = self.entries(kind)
+    if history and history[-1].digest == digest:
+      return history[-1]
+
+    entry = ArchiveEntry(timestamp or time.time(), kind, digest)
+    append_bytes(self.index_path, (json.dumps(asdict(entry)) + "\n").encode("utf-8"))
+    return entry
+
+  def load(self, digest: str) -> str:
+    """Return the content stored under a digest.
+
+    Raises:
+      ArchiveError: If the content is missing, unreadable or doesn't
+        match its digest.
+    """
+    try:
+      data = gzip.decompress(self.object_path(digest).read_bytes())
+    except FileNotFoundError as e:
+      raise ArchiveError(f"Version {digest} is not in the archive") from e
+    except (OSError, EOFError, ValueError) as e:
+      raise ArchiveError(f"Failed to read version {digest}: {e}") from e
+
+    content = data.decode("utf-8")
+    if not verify_hash(content, digest):
+      raise ArchiveError(f"Archived version {digest} is corrupt")
+    return content
+
+  def resolve(self, ref: str, kind: str) -> ArchiveEntry:
+    """Find a version by position, digest or digest prefix.
+
+    Args:
+      ref: "1" for the latest version of the kind, "2" for the one before
+        it, and so on; or a full digest; or a hex prefix of at least
+        MIN_PREFIX_LENGTH characters, with or without the algorithm.
+      kind: "raw" or "formatted".
+
+    Raises:
+      ArchiveError: If no version, or more than one, matches.
+    """
+    history = self.entries(kind)
+    if ref.isdigit() and len(ref) < MIN_PREFIX_LENGTH:
+      position = int(ref)
+      if not 1 <= position <= len(history):
+        raise ArchiveError(
+          f"There are {len(history)} archived {kind} Brewfiles, not {position}"
+        )
+      return history[-position]
+
+    value = ref.partition(":")[2] if ":" in ref else ref
+    if len(value) < MIN_PREFIX_LENGTH:
+      raise ArchiveError(
+        f"Digest prefix '{ref}' is too short "
+        f"(use at least {MIN_PREFIX_LENGTH} characters)"
+      )
+
+    matches: dict[str, ArchiveEntry] = {}
+    for entry in reversed(history):
+      algorithm, hex_value = entry.digest.split(":", 1)
+      if ":" in ref and not ref.startswith(f"{algorithm}:"):
+        continue
+      if hex_value.startswith(value):
+        matches.setdefault(entry.digest, entry)
+    if not matches:
+      raise ArchiveError(f"No archived {kind} Brewfile matches '{ref}'")
+    if len(matches) > 1:
+      raise ArchiveError(
+        f"'{ref}' matches more than one archived {kind} Brewfile"
+      )
+    return next(iter(matches.values()))
@@ -0,0 +1,396 @@
+"""Cold-start benchmark harness with per-command budgets.
+
+This module measures how long den takes to start. For each benchmark case it
+runs the command several times in fresh processes, records the wall time,
+and collects a `python -X importtime` breakdown of the slowest imports. The
+median wall time is compared to the budget stored for the command and a
+regression report is printed.
+
+Run it from a source checkout with:
+
+  python -m den.benchmark
+  python -m den.benchmark --binary dist/den --runs 20
+
+Budgets are read from benchmarks/budgets.json at the repository root. The
+command exits with status 1 when any command exceeds its budget.
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from collections.abc import Sequence
+from dataclasses import dataclass, field
+from pathlib import Path
+
+# Default number of timed runs per command (after one warm-up run)
+DEFAULT_RUNS = 10
+
+# Number of imports listed for each command in the report
+DEFAULT_TOP_IMPORTS = 10
+
+# Number of fake LaunchAgents created for the uninstall benchmark
+FAKE_AGENT_COUNT = 25
+
+DEFAULT_BUDGETS_PATH = (
+  Path(__file__).resolve().parents[2] / "benchmarks" / "budgets.json"
+)
+
+
+class BenchmarkError(Exception):
+  """Raised when a benchmark cannot be run."""
+
+
+@dataclass
+class BenchmarkCase:
+  """A command whose cold start is measured.
+
+  Attributes:
+    name: Budget key and display name, e.g. "den hello".
+    args: Arguments passed to den.
+    stdin: Text written to the command's standard input.
+    frozen: Whether the case runs the frozen binary instead of Python.
+  """
+
+  name: str
+  args: list[str]
+  stdin: str = ""
+  frozen: bool = False
+
+
+@dataclass
+class ImportTiming:
+  """One line of `python -X importtime` output.
+
+  Attributes:
+    module: Imported module name.
+    self_us: Time spent importing the module itself, in microseconds.
+    cumulative_us: Time including the module's own imports, in microseconds.
+  """
+
+  module: str
+  self_us: int
+  cumulative_us: int
+
+
+@dataclass
+class BenchmarkResult:
+  """Measurements for one benchmark case.
+
+  Attributes:
+    name: Name of the benchmark case.
+    wall_ms: Wall time of each timed run in milliseconds.
+    budget_ms: Budget for the median wall time, or None if not budgeted.
+    imports: Imports with the highest self time.
+  """
+
+  name: str
+  wall_ms: list[float]
+  budget_ms: float | None = None
+  imports: list[ImportTiming] = field(default_factory=list)
+
+  @property
+  def median_ms(self) -> float:
+    """Return the median wall time in milliseconds."""
+    return statistics.median(self.wall_ms)
+
+  @property
+  def over_budget(self) -> bool:
+    """Return True if the median wall time exceeds the budget."""
+    return self.budget_ms is not None and self.median_ms > self.budget_ms
+
+
+DEFAULT_CASES = [
+  BenchmarkCase("den --version", ["--version"]),
+  BenchmarkCase("den hello", ["hello"]),
+  BenchmarkCase("den launchctl uninstall", ["launchctl", "uninstall"]),
+  BenchmarkCase("den (frozen) --version", ["--version"], frozen=True),
+]
+
+
+def parse_importtime(output: str) -> list[ImportTiming]:
+  """Parse `python -X importtime` output.
+
+  Args:
+    output: Standard error of a process run with -X importtime.
+
+  Returns:
+    One entry per imported module, in import order.
+  """
+  timings = []
+  for line in output.splitlines():
+    if not line.startswith("import time:"):
+      continue
+    fields = line[len("import time:") :].split("|")
+    if len(fields) != 3:
+      continue
+    try:
+      self_us = int(fields[0])
+      cumulative_us = int(fields[1])
+    except ValueError:
+      continue  # Header line
+    timings.append(ImportTiming(fields[2].strip(), self_us, cumulative_us))
+  return timings
+
+
+def top_imports(
+  timings: list[ImportTiming], count: int = DEFAULT_TOP_IMPORTS
+) -> list[ImportTiming]:
+  """Return the imports that take the most time themselves.
+
+  Self time points at the module that is actually slow to import; the
+  cumulative time shows how much it drags in with it.
+  """
+  return sorted(timings, key=lambda t: t.self_us, reverse=True)[:count]
+
+
+def load_budgets(path: Path) -> dict[str, float]:
+  """Load per-command wall time budgets.
+
+  Args:
+    path: JSON file mapping command names to {"wall_ms": <budget>}.
+
+  Returns:
+    Dictionary mapping command names to budgets in milliseconds.
+
+  Raises:
+    BenchmarkError: If the file cannot be read or is malformed.
+  """
+  try:
+    with path.open("r", encoding="utf-8") as f:
+      data = json.load(f)
+  except (OSError, json.JSONDecodeError) as e:
+    raise BenchmarkError(f"Failed to read budgets from {path}: {e}") from e
+
+  budgets = {}
+  for name, entry in data.items():
+    if not isinstance(entry, dict) or not isinstance(
+      entry.get("wall_ms"), (int, float)
+    ):
+      raise BenchmarkError(f"Invalid budget for {name!r} in {path}")
+    budgets[name] = float(entry["wall_ms"])
+  return budgets
+
+
+def create_fake_home(root: Path, agent_count: int = FAKE_AGENT_COUNT) -> Path:
+  """Create a home directory with fake LaunchAgents for the default domain.
+
+  Args:
+    root: Directory to create the home directory in.
+    agent_count: Number of plist files to create.
+
+  Returns:
+    Path to the fake home directory.
+  """
+  home = root / "home"
+  agents_dir = home / "Library" / "LaunchAgents"
+  agents_dir.mkdir(parents=True)
+  for i in range(agent_count):
+    (agents_dir / f"com.example.benchmark-{i}.plist").write_text(
+      "<plist/>\n", encoding="utf-8"
+    )
+  return home
+
+
+def _command(case: BenchmarkCase, binary: Path | None) -> list[str] | None:
+  """Return the command line for a case, or None if it cannot run."""
+  if case.frozen:
+    if binary is None:
+      return None
+    return [str(binary), *case.args]
+  return [sys.executable, "-m", "den", *case.args]
+
+
+def time_command(
+  argv: list[str], env: dict[str, str], stdin: str = "", runs: int = DEFAULT_RUNS
+) -> list[float]:
+  """Run a command repeatedly and return the wall time of each run.
+
+  One untimed warm-up run is made first so that every timed run sees a warm
+  filesystem cache, as a user running den repeatedly would.
+
+  Args:
+    argv: Command line to run.
+    env: Environment for the command.
+    stdin: Text written to the command's standard input.
+    runs: Number of timed runs.
+
+  Returns:
+    Wall time of each timed run in milliseconds.
+
+  Raises:
+    BenchmarkError: If the command cannot be executed.
+  """
+  wall_ms = []
+  for i in range(runs + 1):
+    start = time.perf_counter()
+    try:
+      subprocess.run(
+        argv,
+        input=stdin,
+        capture_output=True,
+        text=True,
+        env=env,
+        check=False,
+      )
+    except OSError as e:
+      raise BenchmarkError(f"Failed to run {argv[0]}: {e}") from e
+    if i > 0:
+      wall_ms.append((time.perf_counter() - start) * 1000)
+  return wall_ms
+
+
+def measure_imports(
+  args: list[str], env: dict[str, str], stdin: str = ""
+) -> list[ImportTiming]:
+  """Run den under -X importtime and return every import it made."""
+  result = subprocess.run(
+    [sys.executable, "-X", "importtime", "-m", "den", *args],
+    input=stdin,
+    capture_output=True,
+    text=True,
+    env=env,
+    check=False,
+  )
+  return parse_importtime(result.stderr)
+
+
+def run_benchmarks(
+  cases: Sequence[BenchmarkCase],
+  budgets: dict[str, float],
+  runs: int = DEFAULT_RUNS,
+  binary: Path | None = None,
+  top: int = DEFAULT_TOP_IMPORTS,
+) -> list[BenchmarkResult]:
+  """Measure every case that can run in this environment.
+
+  Commands run with HOME set to a temporary directory containing fake
+  LaunchAgents, and with the daemon disabled so the cold start is measured.
+
+  Args:
+    cases: Benchmark cases to run.
+    budgets: Budgets by case name.
+    runs: Number of timed runs per case.
+    binary: Frozen den binary, or None to skip frozen cases.
+    top: Number of imports to record per case.
+
+  Returns:
+    One result per case that ran.
+  """
+  from den.daemon import DAEMON_DISABLE_ENV
+
+  results = []
+  with tempfile.TemporaryDirectory() as tmp:
+    env = dict(os.environ)
+    env["HOME"] = str(create_fake_home(Path(tmp)))
+    env[DAEMON_DISABLE_ENV] = "1"
+    env["PYTHONPATH"] = os.pathsep.join(
+      filter(None, [str(Path(__file__).resolve().parents[1]), env.get("PYTHONPATH")])
+    )
+
+    for case in cases:
+      argv = _command(case, binary)
+      if argv is None:
+        continue
+      result = BenchmarkResult(
+        name=case.name,
+        wall_ms=time_command(argv, env, case.stdin, runs),
+        budget_ms=budgets.get(case.name),
+      )
+      if not case.frozen:
+        timings = measure_imports(case.args, env, case.stdin)
+        result.imports = top_imports(timings, top)
+      results.append(result)
+  return results
+
+
+def format_report(results: list[BenchmarkResult]) -> str:
+  """Format benchmark results as a regression report.
+
+  Args:
+    results: Results to report.
+
+  Returns:
+    A table of median and maximum wall times against budgets, followed by
+    the slowest imports of each command.
+  """
+  name_width = max([len("Command")] + [len(r.name) for r in results])
+  lines = [
+    f"{'Command':<{name_width}}  {'Median':>9}  {'Max':>9}  {'Budget':>9}  Status",
+  ]
+  for result in results:
+    budget = f"{result.budget_ms:.0f} ms" if result.budget_ms is not None else "-"
+    if result.budget_ms is None:
+      status = "no budget"
+    elif result.over_budget:
+      over = result.median_ms - result.budget_ms
+      status = f"REGRESSION (+{over:.0f} ms)"
+    else:
+      status = "ok"
+    lines.append(
+      f"{result.name:<{name_width}}  {result.median_ms:>6.0f} ms  "
+      f"{max(result.wall_ms):>6.0f} ms  {budget:>9}  {status}"
+    )
+
+  for result in results:
+    if not result.imports:
+      continue
+    lines.append("")
+    lines.append(f"Slowest imports for {result.name} (self / cumulative):")
+    for timing in result.imports:
+      lines.append(
+        f"  {timing.self_us / 1000:>7.1f} ms  {timing.cumulative_us / 1000:>7.1f} ms"
+        f"  {timing.module}"
+      )
+
+  regressions = [r.name for r in results if r.over_budget]
+  lines.append("")
+  if regressions:
+    lines.append(f"{len(regressions)} command(s) over budget: {', '.join(regressions)}")
+  else:
+    lines.append("All commands within budget.")
+  return "\n".join(lines) + "\n"
+
+
+def main(argv: list[str] | None = None) -> int:
+  """Run the benchmark suite and print the regression report.
+
+  Args:
+    argv: Command line arguments, defaulting to sys.argv[1:].
+
+  Returns:
+    0 if every command is within budget, 1 on a regression, 2 on error.
+  """
+  parser = argparse.ArgumentParser(
+    prog="python -m den.benchmark", description="Measure den cold-start time."
+  )
+  parser.add_argument("--runs", type=int, default=DEFAULT_RUNS)
+  parser.add_argument("--budgets", type=Path, default=DEFAULT_BUDGETS_PATH)
+  parser.add_argument(
+    "--binary",
+    type=Path,
+    default=None,
+    help="frozen den binary to benchmark (e.g. dist/den)",
+  )
+  parser.add_argument("--top", type=int, default=DEFAULT_TOP_IMPORTS)
+  args = parser.parse_args(argv)
+
+  try:
+    budgets = load_budgets(args.budgets)
+    results = run_benchmarks(
+      DEFAULT_CASES, budgets, runs=args.runs, binary=args.binary, top=args.top
+    )
+  except BenchmarkError as e:
+    print(f"Error: {e}", file=sys.stderr)
+    return 2
+
+  print(format_report(results), end="")
+  return 1 if any(result.over_budget for result in results) else 0
+
+
+if __name__ == "__main__":
+  sys.exit(main())
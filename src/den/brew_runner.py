@@ -2,9 +2,112 @@
 
 This module handles execution of Homebrew commands including brew upgrade
 and brew bundle dump for generating Brewfiles.
+
+Before upgrading, update_homebrew() refreshes Homebrew's metadata (brew
+outdated doesn't auto-update) and list_outdated() asks `brew outdated
+--json=v2` what would change, so runs with nothing to upgrade can skip brew
+upgrade entirely, and
+prefetch_packages() downloads the outdated packages concurrently with
+`brew fetch`. brew upgrade then installs them one by one from the warm
+Homebrew cache instead of downloading each in turn.
+
+brew upgrade can run for a long time, so its output is streamed: each line
+is handed to a callback as soon as brew prints it, and only the last
+STDERR_TAIL_LINES lines of stderr are kept for error messages.
 """
 
+import json
+import logging
+import os
+import re
+import selectors
 import subprocess
+import time
+from collections import deque
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass
+
+from den.brew_scanner import NativeDumpUnsupported, dump_brewfile
+from den.config import load_config
+from den.tracing import span
+
+# Child of den.brew, so records reach brew-upgrade.log when it is set up
+logger = logging.getLogger("den.brew.runner")
+
+# Default number of concurrent `brew fetch` processes
+DEFAULT_PREFETCH_JOBS = 4
+
+# Lines of stderr kept for BrewCommandError
+STDERR_TAIL_LINES = 40
+
+# Bytes read from a pipe at a time
+READ_SIZE = 64 * 1024
+
+# "==> Upgrading 3 outdated packages:"
+UPGRADE_COUNT_PATTERN = re.compile(r"==> Upgrading (\d+) outdated \w+")
+
+# "==> Upgrading git" or "==> Upgrading git 2.42.0 -> 2.43.0"
+UPGRADE_PACKAGE_PATTERN = re.compile(r"==> Upgrading (\S+)(?: |$)")
+
+
+@dataclass(frozen=True)
+class UpgradeProgress:
+  """A package that brew upgrade has started upgrading.
+
+  Attributes:
+    name: Formula or cask name.
+    index: Position of the package in this upgrade, starting at 1.
+    total: Number of outdated packages, if brew announced it.
+  """
+
+  name: str
+  index: int
+  total: int | None
+
+
+@dataclass(frozen=True)
+class OutdatedPackage:
+  """A formula or cask that brew upgrade would upgrade.
+
+  Attributes:
+    name: Formula or cask name.
+    kind: "formula" or "cask".
+    installed_versions: Versions currently installed.
+    current_version: Version brew would upgrade to.
+    pinned: Whether the formula is pinned (brew upgrade skips it).
+  """
+
+  name: str
+  kind: str
+  installed_versions: tuple[str, ...]
+  current_version: str
+  pinned: bool = False
+
+  def describe(self) -> str:
+    """Return e.g. "git 2.42.0 -> 2.43.0"."""
+    installed = ", ".join(self.installed_versions) or "?"
+    return f"{self.name} {installed} -> {self.current_version}"
+
+
+@dataclass(frozen=True)
+class FetchResult:
+  """Outcome of prefetching one package.
+
+  Attributes:
+    package: The package that was fetched.
+    duration_s: Wall time of `brew fetch`, in seconds.
+    error: Why the fetch failed, or None if it succeeded.
+  """
+
+  package: OutdatedPackage
+  duration_s: float
+  error: str | None = None
+
+  @property
+  def ok(self) -> bool:
+    """Whether the package was downloaded."""
+    return self.error is None
 
 
 class BrewCommandError(Exception):
@@ -17,27 +120,302 @@ class BrewCommandError(Exception):
     super().__init__(f"Command '{command}' failed with code {returncode}: {stderr}")
 
 
-def run_brew_upgrade() -> None:
+def stream_command(
+  args: list[str],
+  on_line: Callable[[str, str], None],
+  stderr_tail_lines: int = STDERR_TAIL_LINES,
+  env: dict[str, str] | None = None,
+) -> tuple[int, str]:
+  """Run a command, passing each line it prints to a callback.
+
+  stdout and stderr are read together through a selector, so neither pipe
+  can fill up and block the command while the other is being read.
+
+  Args:
+    args: Command and arguments.
+    on_line: Called with ("stdout" or "stderr", line without its newline)
+      for every line, in the order they are read.
+    stderr_tail_lines: Number of trailing stderr lines to return.
+    env: Environment for the command (defaults to den's own).
+
+  Returns:
+    The exit code and the last stderr lines.
+
+  Raises:
+    FileNotFoundError: If the command doesn't exist.
+  """
+  stderr_tail: deque[str] = deque(maxlen=stderr_tail_lines)
+  with subprocess.Popen(
+    args,
+    stdin=subprocess.DEVNULL,
+    stdout=subprocess.PIPE,
+    stderr=subprocess.PIPE,
+    env=env,
+  ) as process:
+    partial = {"stdout": b"", "stderr": b""}
+    with selectors.DefaultSelector() as selector:
+      selector.register(process.stdout, selectors.EVENT_READ, "stdout")
+      selector.register(process.stderr, selectors.EVENT_READ, "stderr")
+      while selector.get_map():
+        for key, _ in selector.select():
+          stream = key.data
+          data = os.read(key.fd, READ_SIZE)
+          if data:
+            *lines, partial[stream] = (partial[stream] + data).split(b"\n")
+          else:
+            selector.unregister(key.fileobj)
+            lines = [partial[stream]] if partial[stream] else []
+          for raw in lines:
+            line = raw.decode("utf-8", errors="replace").rstrip("\r")
+            if stream == "stderr":
+              stderr_tail.append(line)
+            on_line(stream, line)
+    returncode = process.wait()
+  return returncode, "\n".join(stderr_tail)
+
+
+def run_brew_upgrade(
+  on_line: Callable[[str, str], None] | None = None,
+  on_progress: Callable[[UpgradeProgress], None] | None = None,
+  auto_update: bool = True,
+) -> None:
   """Execute brew upgrade command to update all installed packages.
 
+  Args:
+    on_line: Called with ("stdout" or "stderr", line) as brew prints each
+      line.
+    on_progress: Called when brew starts upgrading each package.
+    auto_update: Whether brew may update its metadata first. Turn it off
+      after update_homebrew(), so brew upgrade installs the versions that
+      were listed and prefetched rather than newer ones.
+
   Raises:
     BrewCommandError: If brew upgrade fails.
   """
+  total: int | None = None
+  upgraded = 0
+
+  def handle_line(stream: str, line: str) -> None:
+    nonlocal total, upgraded
+    if on_line is not None:
+      on_line(stream, line)
+    if stream != "stdout":
+      return
+    count = UPGRADE_COUNT_PATTERN.match(line)
+    if count:
+      total = int(count.group(1))
+      return
+    package = UPGRADE_PACKAGE_PATTERN.match(line)
+    if package:
+      upgraded += 1
+      if on_progress is not None:
+        on_progress(UpgradeProgress(package.group(1), upgraded, total))
+
   try:
-    result = subprocess.run(
-      ["brew", "upgrade"],
-      capture_output=True,
-      text=True,
-      check=False,
-    )
-    if result.returncode != 0:
-      raise BrewCommandError("brew upgrade", result.returncode, result.stderr)
+    with span("brew upgrade", "subprocess") as s:
+      returncode, stderr = stream_command(
+        ["brew", "upgrade"], handle_line, env=_brew_env(auto_update)
+      )
+      s.set_attribute("exit_code", returncode)
+      s.set_attribute("packages", upgraded)
+    if returncode != 0:
+      raise BrewCommandError("brew upgrade", returncode, stderr)
   except FileNotFoundError as e:
     raise BrewCommandError("brew upgrade", -1, "brew command not found") from e
 
 
+def parse_outdated(output: str) -> list[OutdatedPackage]:
+  """Parse `brew outdated --json=v2` output.
+
+  Args:
+    output: JSON with "formulae" and "casks" lists.
+
+  Returns:
+    Outdated formulae followed by outdated casks.
+
+  Raises:
+    ValueError: If the output is not in the expected format.
+  """
+  data = json.loads(output)
+  if not isinstance(data, dict):
+    raise ValueError("expected a JSON object")
+
+  packages = []
+  for key, kind in (("formulae", "formula"), ("casks", "cask")):
+    for item in data.get(key) or []:
+      try:
+        installed = item.get("installed_versions") or []
+        if isinstance(installed, str):
+          # Casks report a single string in older Homebrew versions
+          installed = [installed]
+        packages.append(
+          OutdatedPackage(
+            name=str(item["name"]),
+            kind=kind,
+            installed_versions=tuple(str(version) for version in installed),
+            current_version=str(item["current_version"]),
+            pinned=bool(item.get("pinned", False)),
+          )
+        )
+      except (AttributeError, KeyError, TypeError) as e:
+        raise ValueError(f"unexpected {kind} entry: {item!r}") from e
+  return packages
+
+
+def auto_update_disabled() -> bool:
+  """Return whether HOMEBREW_NO_AUTO_UPDATE turns off Homebrew's updates."""
+  return bool(os.environ.get("HOMEBREW_NO_AUTO_UPDATE"))
+
+
+def update_homebrew() -> bool:
+  """Refresh Homebrew's formula and cask metadata with `brew update`.
+
+  brew outdated compares against the metadata the last update left behind,
+  and skipping brew upgrade also skips the update it would have done, so
+  without this a scheduled run could report nothing outdated indefinitely.
+  Like brew upgrade's auto-update, it is skipped when
+  HOMEBREW_NO_AUTO_UPDATE is set.
+
+  Returns:
+    Whether brew update ran.
+
+  Raises:
+    BrewCommandError: If brew update fails.
+  """
+  if auto_update_disabled():
+    return False
+  command = "brew update"
+  try:
+    with span(command, "subprocess") as s:
+      result = subprocess.run(
+        ["brew", "update"], capture_output=True, text=True, check=False
+      )
+      s.set_attribute("exit_code", result.returncode)
+  except FileNotFoundError as e:
+    raise BrewCommandError(command, -1, "brew command not found") from e
+  if result.returncode != 0:
+    raise BrewCommandError(command, result.returncode, result.stderr)
+  return True
+
+
+def list_outdated() -> list[OutdatedPackage]:
+  """Return the formulae and casks that brew upgrade would upgrade.
+
+  Returns:
+    Outdated packages, including pinned formulae.
+
+  Raises:
+    BrewCommandError: If brew outdated fails or prints unexpected output.
+  """
+  command = "brew outdated --json=v2"
+  try:
+    with span(command, "subprocess") as s:
+      result = subprocess.run(
+        ["brew", "outdated", "--json=v2"],
+        capture_output=True,
+        text=True,
+        check=False,
+      )
+      s.set_attribute("exit_code", result.returncode)
+  except FileNotFoundError as e:
+    raise BrewCommandError(command, -1, "brew command not found") from e
+  if result.returncode != 0:
+    raise BrewCommandError(command, result.returncode, result.stderr)
+  try:
+    return parse_outdated(result.stdout)
+  except ValueError as e:
+    raise BrewCommandError(command, 0, f"Invalid output: {e}") from e
+
+
+def get_prefetch_jobs() -> int:
+  """Return how many packages are fetched at once (0 disables prefetch)."""
+  jobs = load_config().section("brew").get("prefetch_jobs", DEFAULT_PREFETCH_JOBS)
+  if isinstance(jobs, bool) or not isinstance(jobs, int) or jobs < 0:
+    return DEFAULT_PREFETCH_JOBS
+  return jobs
+
+
+def _brew_env(auto_update: bool) -> dict[str, str] | None:
+  """Return the environment for a brew command, or None to inherit den's."""
+  if auto_update:
+    return None
+  return {**os.environ, "HOMEBREW_NO_AUTO_UPDATE": "1"}
+
+
+def fetch_package(package: OutdatedPackage) -> FetchResult:
+  """Download a package into the Homebrew cache with `brew fetch`.
+
+  Auto-update is disabled so concurrent fetches don't each update Homebrew;
+  the metadata is refreshed once by update_homebrew() before listing.
+
+  Returns:
+    The result; failures are reported in it rather than raised.
+  """
+  kind_flag = "--cask" if package.kind == "cask" else "--formula"
+  env = _brew_env(auto_update=False)
+  start = time.perf_counter()
+  try:
+    with span("brew fetch", "subprocess", package=package.name) as s:
+      result = subprocess.run(
+        ["brew", "fetch", kind_flag, package.name],
+        capture_output=True,
+        text=True,
+        check=False,
+        env=env,
+      )
+      s.set_attribute("exit_code", result.returncode)
+  except OSError as e:
+    return FetchResult(package, time.perf_counter() - start, str(e))
+
+  duration = time.perf_counter() - start
+  if result.returncode != 0:
+    lines = result.stderr.strip().splitlines()
+    error = lines[-1] if lines else f"exit code {result.returncode}"
+    return FetchResult(package, duration, error)
+  return FetchResult(package, duration)
+
+
+def prefetch_packages(
+  packages: list[OutdatedPackage],
+  jobs: int = DEFAULT_PREFETCH_JOBS,
+  on_result: Callable[[FetchResult], None] | None = None,
+) -> list[FetchResult]:
+  """Fetch packages concurrently, at most `jobs` at a time.
+
+  Args:
+    packages: Packages to download.
+    jobs: Maximum number of concurrent `brew fetch` processes.
+    on_result: Called on the calling thread as each fetch finishes.
+
+  Returns:
+    Results in the order the fetches finished.
+  """
+  if not packages or jobs < 1:
+    return []
+  results = []
+  with ThreadPoolExecutor(
+    max_workers=min(jobs, len(packages)), thread_name_prefix="brew-fetch"
+  ) as executor:
+    futures = [executor.submit(fetch_package, package) for package in packages]
+    for future in as_completed(futures):
+      result = future.result()
+      if on_result is not None:
+        on_result(result)
+      results.append(result)
+  return results
+
+
+def native_dump_enabled() -> bool:
+  """Return whether the Brewfile may be built without brew bundle dump."""
+  return load_config().section("brew").get("native_dump", True) is not False
+
+
 def generate_brewfile() -> str:
-  """Execute brew bundle dump and return Brewfile content.
+  """Return the Brewfile for the installed packages.
+
+  The Homebrew prefix is scanned directly (see den.brew_scanner) unless
+  brew.native_dump is false in config.json. If the scan can't reproduce
+  `brew bundle dump` exactly, brew bundle dump is run instead.
 
   Returns:
     The Brewfile content as a string.
@@ -45,13 +423,25 @@ def generate_brewfile() -> str:
   Raises:
     BrewCommandError: If brew bundle dump fails.
   """
+  if native_dump_enabled():
+    with span("native Brewfile dump") as s:
+      try:
+        content = dump_brewfile()
+        s.set_attribute("fallback", False)
+        return content
+      except NativeDumpUnsupported as e:
+        s.set_attribute("fallback", True)
+        logger.info(f"Running brew bundle dump: {e}")
+
   try:
-    result = subprocess.run(
-      ["brew", "bundle", "dump", "--force", "--file=-"],
-      capture_output=True,
-      text=True,
-      check=False,
-    )
+    with span("brew bundle dump", "subprocess") as s:
+      result = subprocess.run(
+        ["brew", "bundle", "dump", "--force", "--file=-"],
+        capture_output=True,
+        text=True,
+        check=False,
+      )
+      s.set_attribute("exit_code", result.returncode)
     if result.returncode != 0:
       raise BrewCommandError(
         "brew bundle dump --force --file=-", result.returncode, result.stderr
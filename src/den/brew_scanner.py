@@ -0,0 +1,343 @@
+"""Native Brewfile generation from the Homebrew prefix.
+
+`brew bundle dump` starts Homebrew's Ruby runtime, which takes seconds. This
+module builds the same Brewfile by reading what Homebrew leaves on disk:
+
+  <repository>/Library/Taps/<user>/homebrew-<repo>/.git/config   taps
+  <prefix>/Cellar/<name>/<version>/INSTALL_RECEIPT.json          formulae
+  <prefix>/Caskroom/<token>/.metadata/INSTALL_RECEIPT.json       casks
+
+It reproduces the tap, brew and cask lines of `brew bundle dump` and their
+order: taps and casks sorted by name, formulae sorted by name (core before
+tap formulae) and then so that dependencies come before dependents. Where
+that can't be done with certainty it raises NativeDumpUnsupported, and the
+caller runs `brew bundle dump` instead. That includes:
+
+- formulae installed with options, or with a Homebrew service installed
+  (dumped with args: and restart_service:);
+- formulae whose receipt, tap or keg-only status can't be read;
+- casks without an install receipt, and taps without a git remote;
+- other package managers that bundle also dumps (mas, whalebrew, VS Code).
+"""
+
+import json
+import os
+import re
+import shutil
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any
+
+# Prefixes Homebrew installs to by default, checked in order
+DEFAULT_PREFIXES = (
+  Path("/opt/homebrew"),
+  Path("/usr/local"),
+  Path("/home/linuxbrew/.linuxbrew"),
+)
+
+# Taps whose formulae and casks are dumped by bare name
+CORE_TAP = "homebrew/core"
+CASK_TAP = "homebrew/cask"
+
+# Formulae and commands whose packages `brew bundle dump` also lists
+BUNDLE_EXTRA_FORMULAE = ("mas", "whalebrew")
+BUNDLE_EXTRA_COMMANDS = ("code",)
+
+# A `keg_only` call in a formula's Ruby source
+KEG_ONLY_PATTERN = re.compile(r"^\s*keg_only\b", re.MULTILINE)
+
+RECEIPT_NAME = "INSTALL_RECEIPT.json"
+
+
+class NativeDumpUnsupported(Exception):
+  """Raised when the installed packages can't be dumped without brew."""
+
+
+@dataclass
+class InstalledFormula:
+  """An installed formula, as read from its keg.
+
+  Attributes:
+    name: Formula name (the Cellar directory name).
+    full_name: Name qualified with its tap unless it is from homebrew/core.
+    requested: Whether `brew bundle dump` lists it (installed on request or
+      not as a dependency).
+    dependencies: Names of the formulae it declares as dependencies.
+    link: Value of the `link:` option, or None when it is omitted.
+  """
+
+  name: str
+  full_name: str
+  requested: bool
+  dependencies: list[str] = field(default_factory=list)
+  link: bool | None = None
+
+  def render(self) -> str:
+    """Return the Brewfile line for the formula."""
+    line = f'brew "{self.full_name}"'
+    if self.link is not None:
+      line += f", link: {str(self.link).lower()}"
+    return line
+
+
+def find_homebrew_prefix() -> Path | None:
+  """Return the Homebrew prefix, or None if there is none to scan.
+
+  $HOMEBREW_PREFIX is used when set; otherwise the default prefixes are
+  checked for a Cellar.
+  """
+  configured = os.environ.get("HOMEBREW_PREFIX")
+  candidates = (Path(configured),) if configured else DEFAULT_PREFIXES
+  for prefix in candidates:
+    if (prefix / "Cellar").is_dir():
+      return prefix
+  return None
+
+
+def find_homebrew_repository(prefix: Path) -> Path:
+  """Return the Homebrew repository, which holds Library/Taps.
+
+  It is the prefix itself except on Intel Macs, where it is
+  /usr/local/Homebrew.
+  """
+  configured = os.environ.get("HOMEBREW_REPOSITORY")
+  if configured:
+    return Path(configured)
+  if (prefix / "Homebrew" / "Library").is_dir():
+    return prefix / "Homebrew"
+  return prefix
+
+
+def _read_json(path: Path) -> dict[str, Any]:
+  """Read a JSON object, raising NativeDumpUnsupported if that fails."""
+  try:
+    data = json.loads(path.read_text(encoding="utf-8"))
+  except (OSError, ValueError) as e:
+    raise NativeDumpUnsupported(f"Cannot read {path}: {e}") from e
+  if not isinstance(data, dict):
+    raise NativeDumpUnsupported(f"Unexpected content in {path}")
+  return data
+
+
+def _tap_remote(tap_dir: Path) -> str | None:
+  """Return the origin URL from a tap's git config."""
+  try:
+    config = (tap_dir / ".git" / "config").read_text(encoding="utf-8")
+  except OSError:
+    return None
+  section = None
+  for line in config.splitlines():
+    line = line.strip()
+    if line.startswith("["):
+      section = line
+    elif section == '[remote "origin"]' and line.startswith("url"):
+      key, _, value = line.partition("=")
+      if key.strip() == "url":
+        return value.strip()
+  return None
+
+
+def scan_taps(repository: Path) -> list[str]:
+  """Return the `tap` lines for the installed taps, sorted.
+
+  A remote other than the tap's default GitHub URL is added to the line.
+
+  Raises:
+    NativeDumpUnsupported: If a tap's remote can't be read.
+  """
+  taps_dir = repository / "Library" / "Taps"
+  lines = set()
+  try:
+    users = [entry for entry in os.scandir(taps_dir) if entry.is_dir()]
+  except FileNotFoundError:
+    return []
+  for user in users:
+    for repo in os.scandir(user.path):
+      if not repo.is_dir() or not repo.name.startswith("homebrew-"):
+        continue
+      name = f"{user.name}/{repo.name.removeprefix('homebrew-')}"
+      remote = _tap_remote(Path(repo.path))
+      if remote is None:
+        raise NativeDumpUnsupported(f"Cannot read the remote of tap {name}")
+      default = f"https://github.com/{user.name}/{repo.name}"
+      if remote.removesuffix("/").removesuffix(".git").lower() != default.lower():
+        lines.add(f'tap "{name}", "{remote}"')
+      else:
+        lines.add(f'tap "{name}"')
+  return sorted(lines)
+
+
+def _select_keg(formula_dir: Path, opt_link: Path) -> Path:
+  """Return the version directory of the formula that is in use."""
+  kegs = [
+    Path(entry.path)
+    for entry in os.scandir(formula_dir)
+    if entry.is_dir() and (Path(entry.path) / RECEIPT_NAME).is_file()
+  ]
+  if not kegs:
+    raise NativeDumpUnsupported(f"No install receipt in {formula_dir}")
+  if opt_link.exists():
+    current = opt_link.resolve()
+    for keg in kegs:
+      if keg.resolve() == current:
+        return keg
+  return max(kegs, key=lambda keg: _read_json(keg / RECEIPT_NAME).get("time") or 0)
+
+
+def _service_installed(name: str) -> bool:
+  """Return whether a Homebrew service for the formula is installed."""
+  home = Path.home()
+  return (
+    home / "Library" / "LaunchAgents" / f"homebrew.mxcl.{name}.plist"
+  ).exists() or (
+    home / ".config" / "systemd" / "user" / f"homebrew.{name}.service"
+  ).exists()
+
+
+def read_formula(prefix: Path, name: str) -> InstalledFormula:
+  """Read an installed formula from its keg.
+
+  Raises:
+    NativeDumpUnsupported: If the formula can't be dumped exactly.
+  """
+  keg = _select_keg(prefix / "Cellar" / name, prefix / "opt" / name)
+  receipt = _read_json(keg / RECEIPT_NAME)
+
+  source = receipt.get("source") or {}
+  tap = source.get("tap") if isinstance(source, dict) else None
+  if not isinstance(tap, str) or not tap:
+    raise NativeDumpUnsupported(f"Unknown tap for formula {name}")
+  full_name = name if tap == CORE_TAP else f"{tap}/{name}"
+
+  requested = bool(receipt.get("installed_on_request")) or not receipt.get(
+    "installed_as_dependency"
+  )
+  if requested and receipt.get("used_options"):
+    raise NativeDumpUnsupported(f"Formula {name} was installed with options")
+  if requested and _service_installed(name):
+    raise NativeDumpUnsupported(f"Formula {name} has a Homebrew service")
+
+  dependencies = []
+  for dependency in receipt.get("runtime_dependencies") or []:
+    if not isinstance(dependency, dict) or not dependency.get("full_name"):
+      continue
+    if dependency.get("declared_directly", True):
+      dependencies.append(str(dependency["full_name"]))
+
+  link = None
+  if requested:
+    try:
+      formula_source = (keg / ".brew" / f"{name}.rb").read_text(encoding="utf-8")
+    except OSError as e:
+      raise NativeDumpUnsupported(
+        f"Cannot tell whether formula {name} is keg-only"
+      ) from e
+    keg_only = KEG_ONLY_PATTERN.search(formula_source) is not None
+    linked = (prefix / "var" / "homebrew" / "linked" / name).exists()
+    if keg_only and linked:
+      link = True
+    elif not keg_only and not linked:
+      link = False
+
+  return InstalledFormula(name, full_name, requested, dependencies, link)
+
+
+def _sort_formulae(formulae: list[InstalledFormula]) -> list[InstalledFormula]:
+  """Order formulae the way `brew bundle dump` does.
+
+  Formulae are sorted by full name with core formulae first, then
+  topologically so each comes after the formulae it depends on.
+  """
+  ordered = sorted(formulae, key=lambda f: ("/" in f.full_name, f.full_name))
+  by_name = {f.name: f for f in ordered} | {f.full_name: f for f in ordered}
+  result: list[InstalledFormula] = []
+  visited: set[str] = set()
+
+  def visit(formula: InstalledFormula) -> None:
+    if formula.full_name in visited:
+      return
+    visited.add(formula.full_name)
+    for dependency in sorted(formula.dependencies):
+      if dependency in by_name:
+        visit(by_name[dependency])
+    result.append(formula)
+
+  for formula in ordered:
+    visit(formula)
+  return result
+
+
+def scan_formulae(prefix: Path) -> list[str]:
+  """Return the `brew` lines for the requested installed formulae.
+
+  Raises:
+    NativeDumpUnsupported: If a formula can't be dumped exactly.
+  """
+  names = sorted(
+    entry.name
+    for entry in os.scandir(prefix / "Cellar")
+    if entry.is_dir() and not entry.name.startswith(".")
+  )
+  for extra in BUNDLE_EXTRA_FORMULAE:
+    if extra in names:
+      raise NativeDumpUnsupported(f"brew bundle also dumps {extra} packages")
+
+  formulae = [read_formula(prefix, name) for name in names]
+  return [f.render() for f in _sort_formulae(formulae) if f.requested]
+
+
+def scan_casks(prefix: Path) -> list[str]:
+  """Return the `cask` lines for the installed casks, sorted.
+
+  Raises:
+    NativeDumpUnsupported: If a cask has no install receipt.
+  """
+  try:
+    entries = list(os.scandir(prefix / "Caskroom"))
+  except FileNotFoundError:
+    return []
+
+  names = []
+  for entry in entries:
+    if not entry.is_dir() or entry.name.startswith("."):
+      continue
+    receipt_path = Path(entry.path) / ".metadata" / RECEIPT_NAME
+    if not receipt_path.is_file():
+      raise NativeDumpUnsupported(f"Cask {entry.name} has no install receipt")
+    source = _read_json(receipt_path).get("source") or {}
+    tap = source.get("tap") if isinstance(source, dict) else None
+    if not isinstance(tap, str) or not tap:
+      raise NativeDumpUnsupported(f"Unknown tap for cask {entry.name}")
+    names.append(entry.name if tap == CASK_TAP else f"{tap}/{entry.name}")
+  return [f'cask "{name}"' for name in sorted(names)]
+
+
+def dump_brewfile(prefix: Path | None = None) -> str:
+  """Build the Brewfile `brew bundle dump` would write.
+
+  Args:
+    prefix: Homebrew prefix (defaults to find_homebrew_prefix()).
+
+  Returns:
+    The Brewfile content.
+
+  Raises:
+    NativeDumpUnsupported: If Homebrew isn't found or the installed packages
+      can't be dumped exactly.
+  """
+  prefix = prefix or find_homebrew_prefix()
+  if prefix is None:
+    raise NativeDumpUnsupported("No Homebrew prefix found")
+  for command in BUNDLE_EXTRA_COMMANDS:
+    if shutil.which(command):
+      raise NativeDumpUnsupported(f"brew bundle also dumps {command} packages")
+
+  try:
+    lines = [
+      *scan_taps(find_homebrew_repository(prefix)),
+      *scan_formulae(prefix),
+      *scan_casks(prefix),
+    ]
+  except OSError as e:
+    raise NativeDumpUnsupported(f"Cannot scan {prefix}: {e}") from e
+  return "\n".join(lines) + "\n" if lines else ""
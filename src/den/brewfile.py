@@ -0,0 +1,169 @@
+"""Brewfile parsing and canonical hashing.
+
+`brew bundle dump` output can change without the set of installed packages
+changing: entries move around, quoting and whitespace differ, options are
+written in another order, and `--describe` adds comment lines. Backing up
+the Brewfile costs an Anthropic call and a Gist update, so den decides
+whether it changed by hashing a canonical form instead of the raw text.
+
+The canonical form parses each line into an entry (type, name, options),
+normalizes quoting, whitespace and option order, drops comments and
+duplicates, and sorts the entries. Lines den can't parse are kept with
+their whitespace collapsed, so an unknown entry type still counts as a
+change.
+"""
+
+import re
+from dataclasses import dataclass
+
+from den.hash_utils import DEFAULT_ALGORITHM, compute_hash, verify_hash
+
+# `<type> "<name>"` or `<type> '<name>'`, optionally followed by options
+_ENTRY_RE = re.compile(r"""^(\w+)\s+(["'])(.*?)\2\s*(?:,\s*(.*))?$""")
+
+# `key: value` option
+_OPTION_RE = re.compile(r"^(\w+):\s*(.*)$")
+
+
+@dataclass(frozen=True, order=True)
+class BrewfileEntry:
+  """One normalized Brewfile entry.
+
+  Attributes:
+    kind: Entry type, e.g. "tap", "brew", "cask" or "mas". Lines that
+      could not be parsed have the kind "raw".
+    name: Entry name without quotes, or the whole line for raw entries.
+    options: (key, value) pairs sorted by key, with normalized values.
+  """
+
+  kind: str
+  name: str
+  options: tuple[tuple[str, str], ...] = ()
+
+  def render(self) -> str:
+    """Return the entry as a canonical Brewfile line."""
+    if self.kind == "raw":
+      return self.name
+    parts = [f'{self.kind} "{self.name}"']
+    parts.extend(f"{key}: {value}" for key, value in self.options)
+    return ", ".join(parts)
+
+
+def _split_top_level(text: str) -> list[str]:
+  """Split on commas that are not inside quotes or brackets."""
+  parts: list[str] = []
+  depth = 0
+  quote = ""
+  current: list[str] = []
+  for char in text:
+    if quote:
+      if char == quote:
+        quote = ""
+    elif char in "\"'":
+      quote = char
+    elif char in "[{(":
+      depth += 1
+    elif char in "]})":
+      depth -= 1
+    elif char == "," and depth == 0:
+      parts.append("".join(current))
+      current = []
+      continue
+    current.append(char)
+  parts.append("".join(current))
+  return [part.strip() for part in parts if part.strip()]
+
+
+def _normalize_value(value: str) -> str:
+  """Normalize an option value's quoting and whitespace."""
+  tokens: list[str] = []
+  for token in re.findall(r"""'[^']*'|"[^"]*"|[^\s'"]+""", value):
+    if token.startswith("'"):
+      token = f'"{token[1:-1]}"'
+    tokens.append(token)
+  normalized = " ".join(tokens)
+  # Whitespace inside brackets and around separators is not meaningful
+  return re.sub(r"\s*([\[\]{},])\s*", r"\1", normalized).replace(",", ", ")
+
+
+def parse_entry(line: str) -> BrewfileEntry | None:
+  """Parse one Brewfile line.
+
+  Returns:
+    The entry, or None for blank lines and comments.
+  """
+  line = line.strip()
+  if not line or line.startswith("#"):
+    return None
+
+  match = _ENTRY_RE.match(line)
+  if match is None:
+    return BrewfileEntry("raw", " ".join(line.split()))
+
+  kind, _, name, rest = match.groups()
+  options = []
+  for part in _split_top_level(rest or ""):
+    option = _OPTION_RE.match(part)
+    if option is None:
+      return BrewfileEntry("raw", " ".join(line.split()))
+    options.append((option.group(1), _normalize_value(option.group(2))))
+  return BrewfileEntry(kind, name, tuple(sorted(options)))
+
+
+def parse_brewfile(content: str) -> list[BrewfileEntry]:
+  """Parse Brewfile content into entries, in file order."""
+  entries = []
+  for line in content.splitlines():
+    entry = parse_entry(line)
+    if entry is not None:
+      entries.append(entry)
+  return entries
+
+
+def canonicalize_brewfile(content: str) -> str:
+  """Return the canonical form of a Brewfile: sorted, unique entries."""
+  entries = sorted(set(parse_brewfile(content)))
+  return "".join(f"{entry.render()}\n" for entry in entries)
+
+
+def compute_brewfile_hash(content: str, algorithm: str = DEFAULT_ALGORITHM) -> str:
+  """Hash the canonical form of a Brewfile.
+
+  Brewfiles that differ only in entry order, quoting, whitespace, option
+  order or comments get the same hash.
+  """
+  return compute_hash(canonicalize_brewfile(content), algorithm)
+
+
+@dataclass(frozen=True)
+class BrewfileComparison:
+  """Result of comparing a Brewfile with the stored hash.
+
+  Attributes:
+    hash: Canonical hash of the new Brewfile.
+    unchanged: Whether the Brewfile matches the stored hash.
+    legacy: Whether it matched a hash of the raw text, as stored by den
+      versions before canonical hashing. The state should be updated to
+      the canonical hash.
+  """
+
+  hash: str
+  unchanged: bool
+  legacy: bool = False
+
+
+def compare_brewfile(content: str, stored_hash: str | None) -> BrewfileComparison:
+  """Compare a Brewfile with the hash stored after the last backup.
+
+  The stored hash is checked against the canonical form first and then,
+  for state written before canonical hashing, against the raw text.
+  """
+  canonical = canonicalize_brewfile(content)
+  new_hash = compute_hash(canonical)
+  if stored_hash is None:
+    return BrewfileComparison(new_hash, unchanged=False)
+  if verify_hash(canonical, stored_hash):
+    return BrewfileComparison(new_hash, unchanged=True)
+  if verify_hash(content, stored_hash):
+    return BrewfileComparison(new_hash, unchanged=True, legacy=True)
+  return BrewfileComparison(new_hash, unchanged=False)
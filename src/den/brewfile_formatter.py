@@ -1,16 +1,15 @@
 """Brewfile formatting with Anthropic API integration.
 
 This module handles formatting Brewfiles using the Anthropic API to add
-descriptions, categorization, and documentation.
+descriptions, categorization, and documentation. It is the "anthropic"
+formatter backend (see den.formatters) and is only imported when that
+backend is selected.
 """
 
 import anthropic
 
-
-class BrewfileFormatterError(Exception):
-  """Exception raised for Brewfile formatting errors."""
-
-  pass
+from den.formatters import BrewfileFormatterError
+from den.tracing import span
 
 
 def build_formatting_prompt(raw_content: str) -> str:
@@ -88,11 +87,21 @@ def format_brewfile(raw_content: str, api_key: str) -> str:
 
   try:
     client = anthropic.Anthropic(api_key=api_key)
-    message = client.messages.create(
-      model="claude-sonnet-4-20250514",
-      max_tokens=4096,
-      messages=[{"role": "user", "content": prompt}],
-    )
+    with span("POST /v1/messages", "http", service="anthropic") as s:
+      try:
+        message = client.messages.create(
+          model="claude-sonnet-4-20250514",
+          max_tokens=4096,
+          messages=[{"role": "user", "content": prompt}],
+        )
+      except anthropic.APIStatusError as e:
+        s.set_attribute("status_code", e.status_code)
+        raise
+      s.set_attribute("status_code", 200)
+      usage = getattr(message, "usage", None)
+      if usage is not None:
+        s.set_attribute("input_tokens", usage.input_tokens)
+        s.set_attribute("output_tokens", usage.output_tokens)
     # Extract text content from the response
     if message.content and len(message.content) > 0:
       return message.content[0].text
@@ -4,120 +4,854 @@ This module provides the brew command group for managing Homebrew packages,
 including the upgrade command that updates packages and backs up the Brewfile.
 """
 
+import difflib
+import logging
+import sqlite3
+import threading
+from collections.abc import Callable
+from concurrent.futures import Future
+from datetime import datetime
+from enum import Enum
+from typing import Optional
+
 import typer
 
+from den.archive import FORMATTED, RAW, ArchiveError, BrewfileArchive
 from den.auth_storage import load_credentials
-from den.brew_logger import setup_brew_logger
-from den.brew_runner import BrewCommandError, generate_brewfile, run_brew_upgrade
-from den.brewfile_formatter import BrewfileFormatterError, format_brewfile
+from den.brew_logger import get_log_file_path, setup_brew_logger
+from den.brew_runner import (
+  BrewCommandError,
+  FetchResult,
+  OutdatedPackage,
+  UpgradeProgress,
+  generate_brewfile,
+  get_prefetch_jobs,
+  list_outdated,
+  prefetch_packages,
+  run_brew_upgrade,
+  update_homebrew,
+)
+from den.brewfile import compare_brewfile
+from den.formatters import (
+  BrewfileFormatterError,
+  FormatterBackend,
+  format_brewfile,
+  get_backend,
+)
 from den.gist_client import GistError, create_gist, update_gist
-from den.hash_utils import compute_hash
+from den.history import (
+  DEFAULT_STATS_WINDOW,
+  HistoryStore,
+  RunRecord,
+  record_run,
+)
+from den.instance_lock import InstanceLock, LockTimeoutError, get_lock_path
+from den.log_reader import RUN_START_MESSAGE, parse_since, query_log
+from den.metrics import set_gauge
+from den.pipeline import Pipeline
+from den.preflight import CredentialCheck, start_preflight
 from den.state_storage import get_brew_state, save_brew_state
+from den.tracing import span
 
 brew_app = typer.Typer(help="Homebrew management commands.")
 
+# Command name runs are recorded under in the history database
+UPGRADE_COMMAND = "brew upgrade"
+
+
+# Name of the lock file that keeps upgrades from overlapping
+UPGRADE_LOCK_NAME = "brew-upgrade"
+
+# Default seconds to wait for an upgrade that is already running
+DEFAULT_LOCK_TIMEOUT_SECONDS = 3600.0
+
+
+class IfRunning(str, Enum):
+  """What `brew upgrade` does when another upgrade is already running."""
+
+  WAIT = "wait"
+  EXIT = "exit"
+  ATTACH = "attach"
+
+
+class LogLevel(str, Enum):
+  """Minimum level shown by `brew logs`."""
+
+  DEBUG = "DEBUG"
+  INFO = "INFO"
+  WARNING = "WARNING"
+  ERROR = "ERROR"
+  CRITICAL = "CRITICAL"
+
 
 @brew_app.command()
 def upgrade(
   force: bool = typer.Option(
     False, "--force", "-f", help="Force backup even if Brewfile unchanged"
   ),
+  if_running: IfRunning = typer.Option(
+    IfRunning.WAIT,
+    "--if-running",
+    help=(
+      "If another upgrade is running: wait for it and then run, exit "
+      "immediately, or attach and report its result"
+    ),
+  ),
+  lock_timeout: float = typer.Option(
+    DEFAULT_LOCK_TIMEOUT_SECONDS,
+    "--lock-timeout",
+    min=0,
+    help="Seconds to wait for an upgrade that is already running",
+  ),
 ) -> None:
   """Upgrade Homebrew packages and backup Brewfile to GitHub Gist."""
   logger = setup_brew_logger()
-  logger.info("Starting brew upgrade process")
+  lock = InstanceLock(get_lock_path(UPGRADE_LOCK_NAME))
+  _acquire_upgrade_lock(lock, if_running, lock_timeout, logger)
 
-  # Step 1: Run brew upgrade
-  typer.echo("Updating Homebrew dependencies...")
-  logger.info("Updating Homebrew dependencies...")
   try:
-    run_brew_upgrade()
-    logger.info("brew upgrade completed successfully")
-  except BrewCommandError as e:
-    logger.error(f"brew upgrade failed: {e}")
-    typer.echo(f"Error: {e}")
+    if lock.previous is not None and not lock.previous.finished:
+      logger.warning(
+        f"Previous brew upgrade (pid {lock.previous.pid}) exited without "
+        "finishing; its lock was stale"
+      )
+    logger.info(RUN_START_MESSAGE)
+
+    with record_run(UPGRADE_COMMAND, logger=logger) as run:
+      summary = _upgrade(force, logger, run)
+    lock.finish(0, summary)
+  except BaseException as e:
+    exit_code = getattr(e, "exit_code", None)
+    lock.finish(exit_code if isinstance(exit_code, int) else 1)
+    raise
+  finally:
+    lock.release()
+
+
+def _acquire_upgrade_lock(
+  lock: InstanceLock,
+  if_running: IfRunning,
+  timeout: float,
+  logger: logging.Logger,
+) -> None:
+  """Take the upgrade lock, handling an upgrade that is already running.
+
+  Returns with the lock held when this invocation should run the upgrade.
+  Otherwise raises typer.Exit: with 0 when exiting because another upgrade
+  is running, with the other run's exit code after attaching to it, and
+  with 1 when the lock could not be taken.
+  """
+  try:
+    lock.acquire(timeout=0)
+    return
+  except LockTimeoutError:
+    pass
+  except OSError as e:
+    logger.error(f"Failed to open lock file: {e}")
+    typer.echo(f"Error: Failed to open lock file - {e}")
     raise typer.Exit(1)
 
-  # Step 2: Generate Brewfile
-  typer.echo("Creating Brewfile...")
-  logger.info("Creating Brewfile...")
+  holder = lock.read()
+  running = "Another brew upgrade is already running"
+  if holder is not None:
+    running += f" (pid {holder.pid})"
+
+  if if_running == IfRunning.EXIT:
+    typer.echo(f"{running}, exiting")
+    logger.info(f"{running}, exiting")
+    raise typer.Exit(0)
+
+  if if_running == IfRunning.ATTACH:
+    typer.echo(f"{running}, waiting for its result...")
+  else:
+    typer.echo(f"{running}, waiting for it to finish...")
+  logger.info(f"{running}, waiting (--if-running {if_running.value})")
+
   try:
-    brewfile_content = generate_brewfile()
-    logger.info("Brewfile generated successfully")
-  except BrewCommandError as e:
-    logger.error(f"Failed to generate Brewfile: {e}")
-    typer.echo(f"Error: {e}")
+    lock.acquire(timeout=timeout)
+  except LockTimeoutError:
+    message = f"Timed out after {timeout:g}s waiting for the running upgrade"
+    logger.error(message)
+    typer.echo(f"Error: {message}")
     raise typer.Exit(1)
 
-  # Step 3: Compute hash and check for changes
-  new_hash = compute_hash(brewfile_content)
-  logger.info(f"Computed Brewfile hash: {new_hash}")
+  if if_running != IfRunning.ATTACH:
+    return
+
+  # The run that released the lock is the one that was running, or one that
+  # started after it if another waiter got the lock first; either way its
+  # result is the latest. An unfinished record means it died mid-run.
+  result = lock.previous
+  if result is not None and result.finished:
+    lock.abandon()
+    if result.summary:
+      typer.echo(result.summary)
+    if result.exit_code:
+      typer.echo(
+        f"Error: The brew upgrade that was running failed "
+        f"(exit code {result.exit_code}); see {get_log_file_path()}"
+      )
+    logger.info(f"Attached to brew upgrade with exit code {result.exit_code}")
+    raise typer.Exit(result.exit_code)
+
+  typer.echo("The running brew upgrade exited without finishing, running upgrade")
+
+
+def _upgrade(force: bool, logger: logging.Logger, run: RunRecord) -> str:
+  """Run the upgrade stages, recording their outcome on the history run.
+
+  Returns:
+    The final status message shown to the user.
+  """
+  stages = _UpgradeStages(force, logger, run)
+  try:
+    stages.pipeline().run()
+  finally:
+    stages.output.release()
+  if stages.gist_url is None:
+    return "Brewfile unchanged, skipping backup"
+
+  summary = f"Brewfile backed up successfully: {stages.gist_url}"
+  typer.echo(summary)
+  logger.info("Brew upgrade process completed successfully")
+  return summary
+
+
+class _HeldOutput:
+  """Console messages held back until brew upgrade has finished.
+
+  The Brewfile branch of an upgrade runs alongside `brew upgrade`. Its
+  messages are collected here and shown after the upgrade's output, in the
+  order a run that upgrades first would show them.
+  """
+
+  def __init__(self) -> None:
+    self._messages: list[str] | None = []
+    self._lock = threading.Lock()
+
+  def echo(self, message: str) -> None:
+    """Show a message, or hold it while brew upgrade is still running."""
+    with self._lock:
+      if self._messages is None:
+        typer.echo(message)
+      else:
+        self._messages.append(message)
+
+  def release(self) -> None:
+    """Show the held messages and stop holding new ones."""
+    with self._lock:
+      for message in self._messages or []:
+        typer.echo(message)
+      self._messages = None
+
+
+class _UpgradeStages:
+  """The stages of one brew upgrade run and the state they pass along.
+
+  Homebrew is upgraded on one branch of the graph while the Brewfile is
+  dumped, hashed and formatted on another: `brew bundle dump` lists
+  installed packages, which upgrading them doesn't change. The Brewfile
+  branch's messages are held in `output` until the upgrade has finished,
+  and the Gist backup and state save wait for it, so a failed upgrade
+  changes nothing and the console reads as if the steps ran in order. A
+  failure on the Brewfile branch cancels only the backup, never the upgrade.
+  Each attribute is written by one stage and only read by the stages
+  after it.
+  """
+
+  def __init__(self, force: bool, logger: logging.Logger, run: RunRecord):
+    self.force = force
+    self.logger = logger
+    self.run = run
+    self.output = _HeldOutput()
+    self.formatter: FormatterBackend | None = None
+    self.credentials: dict[str, str] = {}
+    self.existing_hash: str | None = None
+    self.existing_gist_id: str | None = None
+    self.preflight: Future[dict[str, CredentialCheck]] | None = None
+    self.updated: bool | None = None
+    self.outdated: list[OutdatedPackage] | None = None
+    self.brewfile_content = ""
+    self.new_hash = ""
+    self.legacy_hash = False
+    self.back_up = False
+    self.github_token = ""
+    self.formatter_credential: str | None = None
+    self.formatted_content = ""
+    self.gist_id: str | None = None
+    self.gist_url: str | None = None
+
+  def pipeline(self) -> Pipeline:
+    """Return the stage graph of an upgrade."""
+    pipeline = Pipeline()
+    pipeline.add("setup", self.setup)
+    pipeline.add("outdated", self.list_outdated, after=["setup"])
+    pipeline.add("prefetch", self.prefetch, after=["outdated"])
+    pipeline.add("upgrade", self.upgrade, after=["prefetch"])
+    pipeline.add("dump", self.dump, after=["setup"])
+    pipeline.add("hash", self.hash, after=["dump"])
+    pipeline.add("preflight", self.check_credentials, after=["hash"])
+    pipeline.add("format", self.format, after=["preflight"])
+    pipeline.add("backup", self.backup, after=["format", "upgrade"])
+    pipeline.add("save state", self.save_state, after=["backup"])
+    return pipeline
+
+  def setup(self) -> None:
+    """Select the formatter, read state and start the credential preflight.
+
+    A backup is certain when forced or when nothing was backed up yet, so
+    missing credentials fail before any brew stage starts in that case.
+    """
+    try:
+      self.formatter = get_backend()
+    except BrewfileFormatterError as e:
+      self.logger.error(f"Failed to select Brewfile formatter: {e}")
+      typer.echo(f"Error: {e}")
+      raise typer.Exit(1)
+
+    self.credentials = load_credentials()
+    brew_state = get_brew_state()
+    if brew_state:
+      self.existing_hash = brew_state.get("brewfile_hash")
+      self.existing_gist_id = brew_state.get("gist_id")
+
+    if self.force or self.existing_hash is None:
+      _require_credentials(self.credentials, self.formatter, self.logger)
+    self.preflight = start_preflight(
+      self.credentials, _credential_keys(self.formatter)
+    )
+
+  def list_outdated(self) -> None:
+    """Find out what brew upgrade would upgrade."""
+    typer.echo("Updating Homebrew dependencies...")
+    self.logger.info("Updating Homebrew dependencies...")
+    with span("outdated", "step"):
+      self.updated = _update_homebrew(self.logger)
+      if self.updated is not None:
+        self.outdated = _list_outdated(self.logger)
+
+  def prefetch(self) -> None:
+    """Download the outdated packages concurrently."""
+    upgradable = [package for package in self.outdated or [] if not package.pinned]
+    if upgradable:
+      with span("prefetch", "step"):
+        _prefetch(upgradable, self.logger)
+
+  def upgrade(self) -> None:
+    """Run brew upgrade, unless nothing is outdated."""
+    try:
+      self._upgrade()
+    finally:
+      self.output.release()
+
+  def _upgrade(self) -> None:
+    """Run brew upgrade, showing its output as it arrives."""
+    if self.outdated is not None and all(p.pinned for p in self.outdated):
+      typer.echo("All Homebrew packages are up to date")
+      self.logger.info("No outdated packages, skipping brew upgrade")
+      return
+
+    logger = self.logger
+    with span("upgrade", "step"):
+      try:
+        run_brew_upgrade(
+          on_line=lambda stream, line: _forward_brew_line(stream, line, logger),
+          on_progress=lambda progress: _report_progress(progress, logger),
+          auto_update=not self.updated,
+        )
+        logger.info("brew upgrade completed successfully")
+      except BrewCommandError as e:
+        logger.error(f"brew upgrade failed: {e}")
+        typer.echo(f"Error: {e}")
+        raise typer.Exit(1)
+
+  def dump(self) -> None:
+    """Generate the Brewfile and archive it."""
+    self.output.echo("Creating Brewfile...")
+    self.logger.info("Creating Brewfile...")
+    with span("dump", "step"):
+      try:
+        self.brewfile_content = generate_brewfile()
+        self.logger.info("Brewfile generated successfully")
+      except BrewCommandError as e:
+        self.logger.error(f"Failed to generate Brewfile: {e}")
+        self.output.echo(f"Error: {e}")
+        raise typer.Exit(1)
+
+    _archive_brewfile(self.brewfile_content, RAW, self.logger)
+
+  def hash(self) -> None:
+    """Compare the Brewfile with the last backup and decide whether to back up."""
+    with span("hash", "step"):
+      comparison = compare_brewfile(self.brewfile_content, self.existing_hash)
+      self.new_hash = comparison.hash
+      unchanged = comparison.unchanged
+      self.logger.info(f"Computed Brewfile hash: {self.new_hash}")
+    self.run.brewfile_hash = self.new_hash
+    self.run.changed = not unchanged
+    set_gauge(
+      "den_brewfile_changed",
+      int(not unchanged),
+      "Whether the last brew upgrade produced a changed Brewfile.",
+    )
+
+    self.legacy_hash = comparison.legacy
+
+    if unchanged and not self.force:
+      self.output.echo("Brewfile unchanged, skipping backup")
+      self.logger.info("Brewfile unchanged, skipping backup")
+      self.run.skipped = True
+      return
+
+    if self.force and unchanged:
+      self.logger.info("Force flag set, proceeding despite unchanged Brewfile")
+    self.back_up = True
+
+  def check_credentials(self) -> None:
+    """Check credentials before spending an API call on formatting."""
+    if not self.back_up:
+      return
+    assert self.formatter is not None and self.preflight is not None
+    self.github_token, self.formatter_credential = _require_credentials(
+      self.credentials, self.formatter, self.logger, self.output.echo
+    )
+    with span("preflight", "step"):
+      _check_preflight(self.preflight, self.logger, self.output.echo)
+
+  def format(self) -> None:
+    """Format the Brewfile and archive the result."""
+    if not self.back_up:
+      return
+    assert self.formatter is not None
+    self.output.echo(self.formatter.progress_message)
+    self.logger.info(self.formatter.progress_message)
+    with span("format", "step"):
+      try:
+        self.formatted_content = format_brewfile(
+          self.brewfile_content, self.formatter_credential, self.formatter
+        )
+        self.logger.info("Brewfile formatted successfully")
+      except BrewfileFormatterError as e:
+        self.logger.error(f"Failed to format Brewfile: {e}")
+        self.output.echo(f"Error: {e}")
+        raise typer.Exit(1)
+    _archive_brewfile(self.formatted_content, FORMATTED, self.logger)
+
+  def backup(self) -> None:
+    """Create or update the Gist holding the formatted Brewfile."""
+    if not self.back_up:
+      return
+    typer.echo("Backing up Brewfile to GitHub Gist...")
+    self.logger.info("Backing up Brewfile to GitHub Gist...")
+    with span("backup", "step"):
+      try:
+        if self.existing_gist_id:
+          gist_url = update_gist(
+            self.existing_gist_id, self.formatted_content, self.github_token
+          )
+          self.gist_id = self.existing_gist_id
+          self.logger.info(f"Updated existing Gist: {gist_url}")
+        else:
+          self.gist_id, gist_url = create_gist(
+            self.formatted_content, self.github_token
+          )
+          self.logger.info(f"Created new Gist: {gist_url}")
+      except GistError as e:
+        self.logger.error(f"Failed to backup to Gist: {e}")
+        typer.echo(f"Error: {e}")
+        raise typer.Exit(1)
+    self.gist_url = gist_url
+
+  def save_state(self) -> None:
+    """Record the backed up hash and Gist for the next run."""
+    if self.gist_id is None:
+      if self.legacy_hash and self.existing_gist_id:
+        self._upgrade_legacy_hash(self.existing_gist_id)
+      return
+    with span("save state", "step"):
+      try:
+        save_brew_state(self.new_hash, self.gist_id)
+        self.logger.info(
+          f"Saved brew state: hash={self.new_hash}, gist_id={self.gist_id}"
+        )
+      except OSError as e:
+        self.logger.error(f"Failed to save state: {e}")
+        typer.echo(f"Error: Failed to save state - {e}")
+        raise typer.Exit(1)
+
+  def _upgrade_legacy_hash(self, gist_id: str) -> None:
+    """Replace a raw-text hash stored by older den versions.
+
+    With the canonical hash stored, later cosmetic changes to the dump are
+    ignored too.
+    """
+    try:
+      save_brew_state(self.new_hash, gist_id)
+      self.logger.info(f"Upgraded stored Brewfile hash to canonical: {self.new_hash}")
+    except OSError as e:
+      self.logger.warning(f"Failed to upgrade stored Brewfile hash: {e}")
+
+
+def _update_homebrew(logger: logging.Logger) -> bool | None:
+  """Refresh Homebrew's metadata before listing outdated packages.
+
+  With fresh metadata an empty outdated list means nothing newer has been
+  released, and the prefetched packages are the ones brew upgrade installs.
+
+  Returns:
+    True if brew update ran, False if HOMEBREW_NO_AUTO_UPDATE is set, and
+    None if it failed: outdated packages can't be trusted then, so brew
+    upgrade runs and does its own update.
+  """
+  try:
+    with span("update", "step"):
+      updated = update_homebrew()
+  except BrewCommandError as e:
+    logger.warning(f"Failed to update Homebrew, upgrading anyway: {e}")
+    return None
+  if updated:
+    logger.info("Updated Homebrew metadata")
+  else:
+    logger.info("HOMEBREW_NO_AUTO_UPDATE is set, not running brew update")
+  return updated
+
+
+def _list_outdated(logger: logging.Logger) -> list[OutdatedPackage] | None:
+  """List and log outdated packages, or return None if brew can't tell."""
+  try:
+    outdated = list_outdated()
+  except BrewCommandError as e:
+    logger.warning(f"Failed to list outdated packages, upgrading anyway: {e}")
+    return None
+
+  for package in outdated:
+    pinned = " (pinned, skipped)" if package.pinned else ""
+    typer.echo(f"  {package.describe()}{pinned}")
+    logger.info(f"Outdated {package.kind}: {package.describe()}{pinned}")
+  return outdated
 
-  brew_state = get_brew_state()
-  existing_hash = brew_state.get("brewfile_hash") if brew_state else None
-  existing_gist_id = brew_state.get("gist_id") if brew_state else None
 
-  if existing_hash == new_hash and not force:
-    typer.echo("Brewfile unchanged, skipping backup")
-    logger.info("Brewfile unchanged, skipping backup")
+def _prefetch(packages: list[OutdatedPackage], logger: logging.Logger) -> None:
+  """Download outdated packages concurrently before brew upgrade.
+
+  Failed downloads are only reported: brew upgrade fetches them itself.
+  """
+  jobs = get_prefetch_jobs()
+  if jobs == 0:
     return
+  typer.echo(f"Downloading {len(packages)} packages ({jobs} at a time)...")
+  logger.info(f"Prefetching {len(packages)} packages with {jobs} jobs")
+
+  def report(result: FetchResult) -> None:
+    name = result.package.name
+    if result.ok:
+      typer.echo(f"  {name} downloaded in {result.duration_s:.1f}s")
+      logger.info(f"Fetched {name} in {result.duration_s:.1f}s")
+    else:
+      typer.echo(f"  {name} download failed, brew upgrade will retry: {result.error}")
+      logger.warning(f"Failed to fetch {name}: {result.error}")
 
-  if force and existing_hash == new_hash:
-    logger.info("Force flag set, proceeding despite unchanged Brewfile")
+  results = prefetch_packages(packages, jobs, on_result=report)
+  fetched = sum(result.ok for result in results)
+  logger.info(f"Prefetched {fetched}/{len(packages)} packages")
 
-  # Step 4: Load credentials
-  credentials = load_credentials()
-  anthropic_key = credentials.get("anthropic_api_key")
-  github_token = credentials.get("github_token")
 
-  if not anthropic_key:
-    logger.error("Anthropic API key not configured")
-    typer.echo("Error: Anthropic API key not configured.")
-    typer.echo("Run `den auth login` to configure Anthropic credentials.")
-    raise typer.Exit(1)
+def _forward_brew_line(stream: str, line: str, logger: logging.Logger) -> None:
+  """Show a line of brew output on the console and log it."""
+  typer.echo(line, err=stream == "stderr")
+  if stream == "stderr":
+    logger.warning(f"brew: {line}")
+  else:
+    logger.info(f"brew: {line}")
+
+
+def _report_progress(progress: UpgradeProgress, logger: logging.Logger) -> None:
+  """Show and log which package brew upgrade has reached."""
+  total = f"/{progress.total}" if progress.total else ""
+  message = f"[{progress.index}{total}] Upgrading {progress.name}"
+  typer.secho(message, bold=True)
+  logger.info(message)
+
+
+def _archive_brewfile(content: str, kind: str, logger: logging.Logger) -> None:
+  """Keep a Brewfile version in the local archive; failures only warn."""
+  try:
+    entry = BrewfileArchive().store(content, kind)
+    logger.info(f"Archived {kind} Brewfile: {entry.digest}")
+  except OSError as e:
+    logger.warning(f"Failed to archive {kind} Brewfile: {e}")
+
+
+def _credential_keys(formatter: FormatterBackend) -> list[str]:
+  """Return the auth.json keys an upgrade with this formatter needs."""
+  keys = ["github_token"]
+  if formatter.credential_key:
+    keys.insert(0, formatter.credential_key)
+  return keys
+
+
+def _require_credentials(
+  credentials: dict[str, str],
+  formatter: FormatterBackend,
+  logger: logging.Logger,
+  echo: Callable[[str], None] = typer.echo,
+) -> tuple[str, str | None]:
+  """Exit with an error if a credential needed for the backup is missing.
+
+  Args:
+    credentials: Stored credentials.
+    formatter: Formatter the backup will use.
+    logger: Logger for the error.
+    echo: Function that shows the error on the console.
+
+  Returns:
+    The GitHub token and the formatter's credential (None if it needs none).
+  """
+  formatter_credential = None
+  if formatter.credential_key:
+    formatter_credential = credentials.get(formatter.credential_key)
+    if not formatter_credential:
+      logger.error(f"{formatter.credential_name} not configured")
+      echo(f"Error: {formatter.credential_name} not configured.")
+      echo(
+        f"Run `den auth login` to configure credentials for the "
+        f"'{formatter.name}' formatter."
+      )
+      raise typer.Exit(1)
 
+  github_token = credentials.get("github_token")
   if not github_token:
     logger.error("GitHub token not configured")
-    typer.echo("Error: GitHub token not configured.")
-    typer.echo("Run `den auth login` to configure GitHub authentication.")
+    echo("Error: GitHub token not configured.")
+    echo("Run `den auth login` to configure GitHub authentication.")
     raise typer.Exit(1)
 
-  # Step 5: Format Brewfile with Anthropic
-  typer.echo("Formatting Brewfile with AI...")
-  logger.info("Formatting Brewfile with AI...")
+  return github_token, formatter_credential
+
+
+def _check_preflight(
+  preflight: Future[dict[str, CredentialCheck]],
+  logger: logging.Logger,
+  echo: Callable[[str], None] = typer.echo,
+) -> None:
+  """Exit with an error if the preflight found a rejected credential.
+
+  Credentials that could not be verified only log a warning; the backup
+  itself reports them if they really don't work.
+  """
   try:
-    formatted_content = format_brewfile(brewfile_content, anthropic_key)
-    logger.info("Brewfile formatted successfully")
-  except BrewfileFormatterError as e:
-    logger.error(f"Failed to format Brewfile: {e}")
-    typer.echo(f"Error: {e}")
+    checks = preflight.result()
+  except Exception as e:
+    logger.warning(f"Credential preflight failed: {e}")
+    return
+
+  for check in checks.values():
+    source = " (cached)" if check.cached else ""
+    if check.valid is False:
+      logger.error(f"Credential preflight: {check.message}{source}")
+      echo(f"Error: {check.message}.")
+      echo("Run `den auth login` to update your credentials.")
+      raise typer.Exit(1)
+    if check.valid is None:
+      logger.warning(f"Credential preflight: {check.message}")
+    else:
+      logger.info(f"Credential preflight: {check.message}{source}")
+
+
+def _format_timestamp(timestamp: float) -> str:
+  """Format a Unix time for command output."""
+  return datetime.fromtimestamp(timestamp).strftime("%Y-%m-%d %H:%M:%S")
+
+
+def _run_result(run: RunRecord) -> str:
+  """Describe the outcome of a recorded upgrade run."""
+  if run.exit_code != 0:
+    return f"failed ({run.exit_code})"
+  if run.skipped:
+    return "unchanged"
+  return "backed up"
+
+
+def _format_seconds(seconds: float | None) -> str:
+  """Format a duration for the history tables."""
+  return "-" if seconds is None else f"{seconds:.1f}s"
+
+
+@brew_app.command()
+def history(
+  limit: int = typer.Option(
+    10, "--limit", "-n", min=1, help="Number of recent runs to show"
+  ),
+  window: int = typer.Option(
+    DEFAULT_STATS_WINDOW,
+    "--window",
+    min=1,
+    help="Number of recent runs to compute step percentiles over",
+  ),
+) -> None:
+  """Show recent brew upgrade runs and per-step latency percentiles."""
+  store = HistoryStore()
+  try:
+    runs = store.recent_runs(UPGRADE_COMMAND, limit)
+    stats = store.step_stats(UPGRADE_COMMAND, window)
+  except (OSError, sqlite3.Error) as e:
+    typer.echo(f"Error: Failed to read run history - {e}")
     raise typer.Exit(1)
 
-  # Step 6: Backup to GitHub Gist
-  typer.echo("Backing up Brewfile to GitHub Gist...")
-  logger.info("Backing up Brewfile to GitHub Gist...")
+  if not runs:
+    typer.echo("No brew upgrade runs recorded yet.")
+    return
+
+  typer.echo(f"{'STARTED':<20} {'DURATION':>9}  {'RESULT':<12} TOKENS")
+  for run in runs:
+    started = _format_timestamp(run.started_at)
+    tokens = (
+      f"{run.input_tokens or 0}/{run.output_tokens or 0}"
+      if run.input_tokens is not None or run.output_tokens is not None
+      else "-"
+    )
+    typer.echo(
+      f"{started:<20} {_format_seconds(run.duration_s):>9}  "
+      f"{_run_result(run):<12} {tokens}"
+    )
+
+  if stats:
+    typer.echo("")
+    typer.echo(f"Step durations over the last {window} runs:")
+    typer.echo(f"{'STEP':<12} {'RUNS':>5} {'P50':>8} {'P95':>8} {'MAX':>8}")
+    for stat in stats:
+      typer.echo(
+        f"{stat.step:<12} {stat.count:>5} {_format_seconds(stat.p50):>8} "
+        f"{_format_seconds(stat.p95):>8} {_format_seconds(stat.max):>8}"
+      )
+
+
+@brew_app.command()
+def diff(
+  old: Optional[str] = typer.Argument(
+    None, help="Older version: position (2 = previous) or digest prefix"
+  ),
+  new: Optional[str] = typer.Argument(
+    None, help="Newer version: position (1 = latest) or digest prefix"
+  ),
+  formatted: bool = typer.Option(
+    False, "--formatted", help="Compare formatted Brewfiles instead of raw dumps"
+  ),
+  list_versions: bool = typer.Option(
+    False, "--list", "-l", help="List archived versions instead of diffing"
+  ),
+) -> None:
+  """Compare two archived Brewfiles (by default the last two)."""
+  kind = FORMATTED if formatted else RAW
+  archive = BrewfileArchive()
+  try:
+    entries = archive.entries(kind)
+  except OSError as e:
+    typer.echo(f"Error: Failed to read Brewfile archive - {e}")
+    raise typer.Exit(1)
+
+  if list_versions:
+    if not entries:
+      typer.echo(f"No {kind} Brewfiles archived yet.")
+      return
+    for position, entry in enumerate(reversed(entries), start=1):
+      typer.echo(
+        f"{position:>3}  {_format_timestamp(entry.timestamp)}  {entry.digest[:19]}"
+      )
+    return
+
   try:
-    if existing_gist_id:
-      gist_url = update_gist(existing_gist_id, formatted_content, github_token)
-      gist_id = existing_gist_id
-      logger.info(f"Updated existing Gist: {gist_url}")
+    old_entry = archive.resolve(old or "2", kind)
+    new_entry = archive.resolve(new or "1", kind)
+    old_content = archive.load(old_entry.digest)
+    new_content = archive.load(new_entry.digest)
+  except ArchiveError as e:
+    typer.echo(f"Error: {e}")
+    raise typer.Exit(1)
+
+  lines = difflib.unified_diff(
+    old_content.splitlines(keepends=True),
+    new_content.splitlines(keepends=True),
+    fromfile=f"{old_entry.digest[:19]} ({_format_timestamp(old_entry.timestamp)})",
+    tofile=f"{new_entry.digest[:19]} ({_format_timestamp(new_entry.timestamp)})",
+  )
+  output = "".join(lines)
+  if not output:
+    typer.echo("No differences.")
+    return
+  for line in output.splitlines():
+    if line.startswith(("+++", "---")):
+      typer.secho(line, bold=True)
+    elif line.startswith("+"):
+      typer.secho(line, fg=typer.colors.GREEN)
+    elif line.startswith("-"):
+      typer.secho(line, fg=typer.colors.RED)
+    elif line.startswith("@@"):
+      typer.secho(line, fg=typer.colors.CYAN)
     else:
-      gist_id, gist_url = create_gist(formatted_content, github_token)
-      logger.info(f"Created new Gist: {gist_url}")
-  except GistError as e:
-    logger.error(f"Failed to backup to Gist: {e}")
+      typer.echo(line)
+
+
+def _parse_run(value: str) -> int:
+  """Parse a --run value into a position, 1 being the latest run."""
+  if value == "last":
+    return 1
+  if value.isdigit() and int(value) >= 1:
+    return int(value)
+  typer.echo(f"Error: Invalid run '{value}' (use 'last' or a number, 1 = last)")
+  raise typer.Exit(1)
+
+
+@brew_app.command()
+def logs(
+  tail: Optional[int] = typer.Option(
+    None, "--tail", "-n", min=1, help="Show only the last N matching records"
+  ),
+  since: Optional[str] = typer.Option(
+    None, "--since", help="Only records since a time: 2h, 3d, 2025-01-15 10:30"
+  ),
+  level: Optional[LogLevel] = typer.Option(
+    None,
+    "--level",
+    case_sensitive=False,
+    help="Only records at or above this level",
+  ),
+  run: Optional[str] = typer.Option(
+    None, "--run", help="Only records of one upgrade: last, or N (1 = last)"
+  ),
+) -> None:
+  """Show records from the brew upgrade log."""
+  log_file = get_log_file_path()
+  try:
+    since_time = parse_since(since) if since is not None else None
+  except ValueError as e:
     typer.echo(f"Error: {e}")
     raise typer.Exit(1)
+  position = _parse_run(run) if run is not None else None
+
+  if not log_file.exists():
+    typer.echo("No brew upgrade log yet.")
+    return
 
-  # Step 7: Save state
+  found = False
   try:
-    save_brew_state(new_hash, gist_id)
-    logger.info(f"Saved brew state: hash={new_hash}, gist_id={gist_id}")
+    for entry in query_log(
+      log_file,
+      since=since_time,
+      min_level=logging.getLevelName(level.value) if level else logging.NOTSET,
+      run=position,
+      tail=tail,
+    ):
+      found = True
+      if entry.levelno >= logging.ERROR:
+        typer.secho(entry.text, fg=typer.colors.RED)
+      elif entry.levelno >= logging.WARNING:
+        typer.secho(entry.text, fg=typer.colors.YELLOW)
+      else:
+        typer.echo(entry.text)
   except OSError as e:
-    logger.error(f"Failed to save state: {e}")
-    typer.echo(f"Error: Failed to save state - {e}")
+    typer.echo(f"Error: Failed to read {log_file} - {e}")
     raise typer.Exit(1)
 
-  # Step 8: Display success message
-  typer.echo(f"Brewfile backed up successfully: {gist_url}")
-  logger.info("Brew upgrade process completed successfully")
+  if not found:
+    typer.echo("No matching log records.")
@@ -0,0 +1,64 @@
+"""Shell completion commands.
+
+This module provides the completion command group for generating static
+shell completion scripts that work without starting den.
+"""
+
+import os
+from pathlib import Path
+from typing import Optional
+
+import typer
+
+from den.completion import SCRIPT_FILENAMES, SHELLS, generate_completion_script
+
+completion_app = typer.Typer(help="Shell completion commands.")
+
+
+@completion_app.command()
+def generate(
+  shell: Optional[str] = typer.Option(
+    None, "--shell", "-s", help="Shell to generate for: bash, zsh or fish"
+  ),
+  output_dir: Optional[Path] = typer.Option(
+    None,
+    "--output-dir",
+    "-o",
+    help="Write scripts to this directory instead of printing one",
+  ),
+) -> None:
+  """Generate static completion scripts for bash, zsh and fish.
+
+  Option values such as --org are read from config when the script is
+  generated; re-run this command after changing config.
+  """
+  from den.main import app
+
+  if shell is not None and shell not in SHELLS:
+    typer.echo(
+      f"Error: Unsupported shell '{shell}'. Choose from: {', '.join(SHELLS)}"
+    )
+    raise typer.Exit(1)
+
+  command = typer.main.get_command(app)
+
+  if output_dir is None:
+    target = shell or os.path.basename(os.environ.get("SHELL", ""))
+    if target not in SHELLS:
+      typer.echo("Error: Could not detect your shell. Pass --shell.")
+      raise typer.Exit(1)
+    typer.echo(generate_completion_script(command, target), nl=False)
+    return
+
+  shells = [shell] if shell else list(SHELLS)
+  try:
+    output_dir.mkdir(parents=True, exist_ok=True)
+    for target in shells:
+      script_path = output_dir / SCRIPT_FILENAMES[target]
+      script_path.write_text(
+        generate_completion_script(command, target), encoding="utf-8"
+      )
+      typer.echo(f"Wrote {target} completion to {script_path}")
+  except OSError as e:
+    typer.echo(f"Error: Failed to write completion scripts - {e}")
+    raise typer.Exit(1)
@@ -0,0 +1,52 @@
+"""Daemon commands for the resident den process.
+
+This module provides the daemon command group for starting, stopping and
+inspecting the optional long-lived process that dispatches den commands.
+"""
+
+import time
+
+import typer
+
+from den.daemon import DaemonError, get_socket_path, request_control, serve
+
+daemon_app = typer.Typer(help="Resident daemon for fast command dispatch.")
+
+
+@daemon_app.command()
+def start() -> None:
+  """Run the daemon in the foreground until stopped."""
+  typer.echo(f"Starting den daemon on {get_socket_path()}")
+  try:
+    serve()
+  except DaemonError as e:
+    typer.echo(f"Error: {e}")
+    raise typer.Exit(1)
+  typer.echo("den daemon stopped")
+
+
+@daemon_app.command()
+def stop() -> None:
+  """Stop a running daemon."""
+  try:
+    request_control("stop")
+  except DaemonError as e:
+    typer.echo(f"Error: {e}")
+    raise typer.Exit(1)
+  typer.echo("den daemon stopping")
+
+
+@daemon_app.command()
+def status() -> None:
+  """Show whether a daemon is running."""
+  try:
+    info = request_control("status")
+  except DaemonError:
+    typer.echo("den daemon is not running")
+    raise typer.Exit(1)
+
+  uptime = int(time.time() - info["started_at"])
+  typer.echo(
+    f"den daemon is running (pid {info['pid']}, up {uptime}s, "
+    f"{info['served']} commands served)"
+  )
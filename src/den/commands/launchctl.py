@@ -25,6 +25,7 @@ from den.plist_scanner import (
   get_launch_agents_dir,
   scan_domain_agents,
 )
+from den.tracing import span
 
 # Error message constants
 _ERR_INVALID_INTEGER = "Error: Please enter a valid integer"
@@ -180,23 +181,23 @@ def install() -> None:
   )
 
   # Generate plist content
-  plist_content = generate_plist(config)
-
-  # Ensure LaunchAgents directory exists
-  launch_agents_dir = get_launch_agents_dir()
-  launch_agents_dir.mkdir(parents=True, exist_ok=True)
+  with span("generate plist", "step", label=label):
+    plist_content = generate_plist(config)
 
   # Write plist file
   plist_path = build_plist_path(domain, task_name)
   try:
-    plist_path.write_text(plist_content, encoding="utf-8")
+    with span("write plist", "step", plist=str(plist_path)):
+      get_launch_agents_dir().mkdir(parents=True, exist_ok=True)
+      plist_path.write_text(plist_content, encoding="utf-8")
   except OSError as e:
     typer.echo(f"Error: Failed to write plist file - {e}")
     raise typer.Exit(1)
 
   # Load the agent
   try:
-    load_agent(plist_path)
+    with span("load", "step", label=label):
+      load_agent(plist_path)
     typer.echo(f"LaunchAgent installed successfully: {plist_path}")
   except LaunchctlError as e:
     typer.echo(f"Error: Failed to load agent - {e.stderr}")
@@ -213,7 +214,8 @@ def uninstall() -> None:
   domain = get_domain()
 
   # Scan for matching plist files
-  matching_files = scan_domain_agents(domain)
+  with span("scan", "step", domain=domain):
+    matching_files = scan_domain_agents(domain)
 
   if not matching_files:
     typer.echo(f"No LaunchAgents found for domain '{domain}'")
@@ -242,14 +244,16 @@ def uninstall() -> None:
 
   # Unload the agent
   try:
-    unload_agent(selected_path)
+    with span("unload", "step", label=f"{domain}.{selected_task}"):
+      unload_agent(selected_path)
   except LaunchctlError as e:
     typer.echo(f"Error: Failed to unload agent - {e.stderr}")
     raise typer.Exit(1)
 
   # Delete the plist file
   try:
-    selected_path.unlink()
+    with span("delete plist", "step", plist=str(selected_path)):
+      selected_path.unlink()
     typer.echo(f"LaunchAgent '{selected_task}' uninstalled successfully")
   except OSError as e:
     typer.echo(f"Error: Failed to delete plist file - {e}")
@@ -13,6 +13,7 @@ import typer
 from den.auth_storage import load_credentials
 from den.repo_client import RepoError, create_repo, repo_exists
 from den.repo_config import get_default_org
+from den.tracing import span
 
 repo_app = typer.Typer(help="Repository management commands.")
 
@@ -50,7 +51,9 @@ def create(
     # Check GitHub repository
     typer.echo(f"Checking repository {target_org}/{name}...")
     try:
-        if repo_exists(target_org, name, github_token):
+        with span("check", "step", repo=f"{target_org}/{name}"):
+            exists = repo_exists(target_org, name, github_token)
+        if exists:
             typer.echo(
                 f"Error: Repository {target_org}/{name} already exists on GitHub"
             )
@@ -62,7 +65,8 @@ def create(
     # Create repository
     typer.echo(f"Creating repository {target_org}/{name}...")
     try:
-        clone_url = create_repo(target_org, name, github_token)
+        with span("create", "step", repo=f"{target_org}/{name}"):
+            clone_url = create_repo(target_org, name, github_token)
     except RepoError as e:
         typer.echo(f"Error creating repository: {e}")
         raise typer.Exit(1)
@@ -73,12 +77,13 @@ def create(
         # Ensure parent directory exists
         local_path.parent.mkdir(parents=True, exist_ok=True)
 
-        subprocess.run(
-            ["git", "clone", clone_url, str(local_path)],
-            check=True,
-            capture_output=True,
-            text=True,
-        )
+        with span("clone", "step"), span("git clone", "subprocess"):
+            subprocess.run(
+                ["git", "clone", clone_url, str(local_path)],
+                check=True,
+                capture_output=True,
+                text=True,
+            )
     except subprocess.CalledProcessError as e:
         typer.echo(f"Error cloning repository: {e.stderr}")
         raise typer.Exit(1)
@@ -0,0 +1,395 @@
+"""Static shell completion script generation.
+
+This module walks the den command tree once and renders self-contained
+bash, zsh and fish completion scripts. The scripts contain every command
+group, command and option, plus option values taken from config (such as
+the default `--org`), so pressing TAB never starts Python.
+"""
+
+from collections.abc import Callable
+from dataclasses import dataclass, field
+from typing import Any
+
+import typer
+
+from den.lazy_group import LazyTyperGroup
+from den.repo_config import get_default_org
+
+SHELLS = ("bash", "zsh", "fish")
+
+# File name each shell's completion loader expects
+SCRIPT_FILENAMES = {
+  "bash": "den.bash",
+  "zsh": "_den",
+  "fish": "den.fish",
+}
+
+GENERATED_NOTICE = "Generated by `den completion generate`; do not edit."
+
+
+@dataclass
+class CompletionNode:
+  """Completion data for one command in the tree.
+
+  Attributes:
+    path: Subcommand names leading to this command ("" for the root).
+    subcommands: (name, help) pairs for the command's subcommands.
+    flags: Option strings that take no value.
+    value_options: Option strings that take a value, mapped to the
+      candidate values to complete for them.
+  """
+
+  path: str
+  subcommands: list[tuple[str, str]] = field(default_factory=list)
+  flags: list[str] = field(default_factory=list)
+  value_options: dict[str, list[str]] = field(default_factory=dict)
+
+  @property
+  def options(self) -> list[str]:
+    """Return every option string, flags first."""
+    return self.flags + list(self.value_options)
+
+
+def _default_value_providers() -> dict[str, Callable[[], list[str]]]:
+  """Return the config-backed value providers keyed by option string."""
+
+  def org_values() -> list[str]:
+    org = get_default_org()
+    return [org] if org else []
+
+  return {"--org": org_values}
+
+
+def build_completion_tree(
+  command: Any,
+  value_providers: dict[str, Callable[[], list[str]]] | None = None,
+) -> list[CompletionNode]:
+  """Walk a Click/Typer command tree and collect completion data.
+
+  Lazily registered groups are loaded so the whole tree is visible.
+
+  Args:
+    command: The root command, e.g. `typer.main.get_command(app)`.
+    value_providers: Functions returning candidate values per option
+      string. Defaults to values read from den's config.
+
+  Returns:
+    One node per command, root first, in depth-first order.
+  """
+  if value_providers is None:
+    value_providers = _default_value_providers()
+  provided_values: dict[str, list[str]] = {}
+
+  def values_for(option: str) -> list[str]:
+    if option not in provided_values:
+      provider = value_providers.get(option)
+      provided_values[option] = provider() if provider else []
+    return provided_values[option]
+
+  nodes: list[CompletionNode] = []
+
+  def visit(cmd: Any, path: str) -> None:
+    node = CompletionNode(path=path)
+    nodes.append(node)
+
+    for param in cmd.params:
+      if getattr(param, "param_type_name", "") != "option" or param.hidden:
+        continue
+      option_strings = [*param.opts, *param.secondary_opts]
+      if param.is_flag:
+        node.flags.extend(option_strings)
+      else:
+        for option in option_strings:
+          node.value_options[option] = values_for(option)
+    node.flags.append("--help")
+
+    if not hasattr(cmd, "list_commands"):
+      return
+
+    if isinstance(cmd, LazyTyperGroup):
+      for name in cmd.lazy_groups:
+        cmd.load_command(name)
+
+    ctx = typer.Context(cmd)
+    for name in cmd.list_commands(ctx):
+      sub = cmd.get_command(ctx, name)
+      if sub is None or sub.hidden:
+        continue
+      node.subcommands.append((name, sub.get_short_help_str(limit=80)))
+      visit(sub, f"{path} {name}".strip())
+
+  visit(command, "")
+  return nodes
+
+
+def _sh_quote(value: str) -> str:
+  """Quote a string for bash/zsh single quotes."""
+  return "'" + value.replace("'", "'\\''") + "'"
+
+
+def _fish_quote(value: str) -> str:
+  """Quote a string for fish single quotes."""
+  return "'" + value.replace("\\", "\\\\").replace("'", "\\'") + "'"
+
+
+def _sh_case(
+  function: str,
+  nodes: list[CompletionNode],
+  values: Callable[[CompletionNode], list[str]],
+) -> list[str]:
+  """Render a bash/zsh function that sets `reply` to per-path values."""
+  lines = [f"{function}() {{", '  case "$1" in']
+  for node in nodes:
+    items = values(node)
+    if items:
+      quoted = " ".join(_sh_quote(item) for item in items)
+      lines.append(f"    {_sh_quote(node.path)}) reply=({quoted}) ;;")
+  lines += ["    *) reply=() ;;", "  esac", "}", ""]
+  return lines
+
+
+def _sh_option_values_case(function: str, nodes: list[CompletionNode]) -> list[str]:
+  """Render a bash/zsh function that sets `reply` to values for an option."""
+  lines = [f"{function}() {{", '  case "$1|$2" in']
+  for node in nodes:
+    for option, items in node.value_options.items():
+      if items:
+        quoted = " ".join(_sh_quote(item) for item in items)
+        pattern = _sh_quote(f"{node.path}|{option}")
+        lines.append(f"    {pattern}) reply=({quoted}) ;;")
+  lines += ["    *) reply=() ;;", "  esac", "}", ""]
+  return lines
+
+
+def _shared_sh_functions(nodes: list[CompletionNode], describe: bool) -> list[str]:
+  """Render the data functions shared by the bash and zsh scripts."""
+
+  def subcommands(node: CompletionNode) -> list[str]:
+    if describe:
+      # zsh's _describe splits "name:description" on the first unescaped colon
+      return [
+        name + ":" + help.replace(":", "\\:") for name, help in node.subcommands
+      ]
+    return [name for name, _help in node.subcommands]
+
+  return [
+    *_sh_case("_den_subcommands", nodes, subcommands),
+    *_sh_case("_den_options", nodes, lambda node: node.options),
+    *_sh_case("_den_value_options", nodes, lambda node: [*node.value_options]),
+    *_sh_option_values_case("_den_option_values", nodes),
+  ]
+
+
+def render_bash(nodes: list[CompletionNode]) -> str:
+  """Render a static bash completion script.
+
+  Args:
+    nodes: Completion tree from build_completion_tree.
+
+  Returns:
+    The bash script. Compatible with bash 3.2 (no associative arrays).
+  """
+  lines = [
+    "# bash completion for den",
+    f"# {GENERATED_NOTICE}",
+    "",
+    *_shared_sh_functions(nodes, describe=False),
+    "_den() {",
+    '  local cur="${COMP_WORDS[COMP_CWORD]}" prev="" cmd_path="" word i skip=0',
+    "  local -a reply",
+    '  [ "$COMP_CWORD" -gt 0 ] && prev="${COMP_WORDS[COMP_CWORD-1]}"',
+    "",
+    "  for ((i = 1; i < COMP_CWORD; i++)); do",
+    '    word="${COMP_WORDS[i]}"',
+    '    if [ "$skip" = 1 ]; then skip=0; continue; fi',
+    '    _den_value_options "$cmd_path"',
+    '    if [[ " ${reply[*]} " == *" $word "* ]]; then skip=1; continue; fi',
+    '    _den_subcommands "$cmd_path"',
+    '    if [[ " ${reply[*]} " == *" $word "* ]]; then',
+    '      cmd_path="${cmd_path:+$cmd_path }$word"',
+    "    fi",
+    "  done",
+    "",
+    '  _den_value_options "$cmd_path"',
+    '  if [ -n "$prev" ] && [[ " ${reply[*]} " == *" $prev "* ]]; then',
+    '    _den_option_values "$cmd_path" "$prev"',
+    '  elif [[ "$cur" == -* ]]; then',
+    '    _den_options "$cmd_path"',
+    "  else",
+    '    _den_subcommands "$cmd_path"',
+    "  fi",
+    '  COMPREPLY=($(compgen -W "${reply[*]}" -- "$cur"))',
+    "}",
+    "",
+    "complete -F _den den",
+    "",
+  ]
+  return "\n".join(lines)
+
+
+def render_zsh(nodes: list[CompletionNode]) -> str:
+  """Render a static zsh completion script.
+
+  Args:
+    nodes: Completion tree from build_completion_tree.
+
+  Returns:
+    The zsh script, to be installed as `_den` on $fpath.
+  """
+  lines = [
+    "#compdef den",
+    f"# zsh completion for den. {GENERATED_NOTICE}",
+    "",
+    *_shared_sh_functions(nodes, describe=True),
+    "_den() {",
+    '  local cmd_path="" word prev="${words[CURRENT-1]}" i skip=0',
+    "  local -a reply subs",
+    "",
+    "  for ((i = 2; i < CURRENT; i++)); do",
+    '    word="${words[i]}"',
+    "    if ((skip)); then skip=0; continue; fi",
+    '    _den_value_options "$cmd_path"',
+    "    if ((${reply[(Ie)$word]})); then skip=1; continue; fi",
+    '    _den_subcommands "$cmd_path"',
+    "    if ((${reply[(I)${(b)word}:*]})); then",
+    '      cmd_path="${cmd_path:+$cmd_path }$word"',
+    "    fi",
+    "  done",
+    "",
+    '  _den_value_options "$cmd_path"',
+    "  if ((${reply[(Ie)$prev]})); then",
+    '    _den_option_values "$cmd_path" "$prev"',
+    '    compadd -- "${reply[@]}"',
+    '  elif [[ "${words[CURRENT]}" == -* ]]; then',
+    '    _den_options "$cmd_path"',
+    '    compadd -- "${reply[@]}"',
+    "  else",
+    '    _den_subcommands "$cmd_path"',
+    '    subs=("${reply[@]}")',
+    "    _describe -t commands 'den command' subs",
+    "  fi",
+    "}",
+    "",
+    '_den "$@"',
+    "",
+  ]
+  return "\n".join(lines)
+
+
+def _fish_switch(
+  function: str,
+  nodes: list[CompletionNode],
+  values: Callable[[CompletionNode], list[str]],
+) -> list[str]:
+  """Render a fish function that prints per-path values, one per line."""
+  lines = [f"function {function}", "    switch $argv[1]"]
+  for node in nodes:
+    items = values(node)
+    if items:
+      lines.append(f"        case {_fish_quote(node.path)}")
+      quoted = " ".join(_fish_quote(item) for item in items)
+      lines.append(f"            printf '%s\\n' {quoted}")
+  lines += ["    end", "end", ""]
+  return lines
+
+
+def _fish_option_args(option: str) -> str:
+  """Convert an option string to fish `complete` -l/-s/-o arguments."""
+  if option.startswith("--"):
+    return f"-l {_fish_quote(option[2:])}"
+  if len(option) == 2:
+    return f"-s {_fish_quote(option[1:])}"
+  return f"-o {_fish_quote(option[1:])}"
+
+
+def render_fish(nodes: list[CompletionNode]) -> str:
+  """Render a static fish completion script.
+
+  Args:
+    nodes: Completion tree from build_completion_tree.
+
+  Returns:
+    The fish script, to be installed as `den.fish` in a completions dir.
+  """
+  lines = [
+    "# fish completion for den",
+    f"# {GENERATED_NOTICE}",
+    "",
+    *_fish_switch(
+      "__den_subcommands", nodes, lambda node: [n for n, _h in node.subcommands]
+    ),
+    *_fish_switch(
+      "__den_value_options", nodes, lambda node: [*node.value_options]
+    ),
+    "function __den_cmd_path",
+    "    set -l tokens (commandline -opc)",
+    "    set -e tokens[1]",
+    "    set -l cmd_path",
+    "    set -l skip 0",
+    "    for token in $tokens",
+    "        if test $skip = 1",
+    "            set skip 0",
+    "            continue",
+    "        end",
+    "        set -l current (string join ' ' $cmd_path)",
+    '        if contains -- $token (__den_value_options "$current")',
+    "            set skip 1",
+    '        else if contains -- $token (__den_subcommands "$current")',
+    "            set -a cmd_path $token",
+    "        end",
+    "    end",
+    "    string join ' ' $cmd_path",
+    "end",
+    "",
+    "function __den_path_is",
+    "    set -l current (__den_cmd_path)",
+    '    test "$current" = "$argv[1]"',
+    "end",
+    "",
+    "complete -c den -f",
+  ]
+
+  for node in nodes:
+    condition = _fish_quote(f"__den_path_is {_fish_quote(node.path)}")
+    for name, help in node.subcommands:
+      lines.append(
+        f"complete -c den -n {condition} "
+        f"-a {_fish_quote(name)} -d {_fish_quote(help)}"
+      )
+    for option in node.flags:
+      lines.append(f"complete -c den -n {condition} {_fish_option_args(option)}")
+    for option, values in node.value_options.items():
+      line = f"complete -c den -n {condition} {_fish_option_args(option)} -r"
+      if values:
+        line += f" -a {_fish_quote(' '.join(values))}"
+      lines.append(line)
+
+  lines.append("")
+  return "\n".join(lines)
+
+
+RENDERERS: dict[str, Callable[[list[CompletionNode]], str]] = {
+  "bash": render_bash,
+  "zsh": render_zsh,
+  "fish": render_fish,
+}
+
+
+def generate_completion_script(command: Any, shell: str) -> str:
+  """Generate a static completion script for one shell.
+
+  Args:
+    command: The root command, e.g. `typer.main.get_command(app)`.
+    shell: One of "bash", "zsh" or "fish".
+
+  Returns:
+    The completion script.
+
+  Raises:
+    ValueError: If the shell is not supported.
+  """
+  if shell not in RENDERERS:
+    raise ValueError(
+      f"Unsupported shell '{shell}'. Choose from: {', '.join(SHELLS)}"
+    )
+  return RENDERERS[shell](build_completion_tree(command))
@@ -0,0 +1,113 @@
+"""Configuration loading for den.
+
+This module reads ~/.config/den/config.json into a DenConfig object. Each
+module reads its own top-level section with DenConfig.section() and checks
+the values it uses, falling back to its own defaults.
+
+The parsed result is cached per path and revalidated with a stat() call, so
+a file is only re-read and re-parsed when its modification time or size
+changes. Long-running processes such as the daemon pick up edits without
+re-reading the file on every access.
+
+Example config.json:
+
+  {
+    "repo": {"default_org": "my-org"},
+    "launchctl": {"domain": "com.mycompany"}
+  }
+
+Missing, empty or invalid files, and sections that are not objects, read
+as empty rather than raising.
+"""
+
+import json
+import threading
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any
+
+
+@dataclass(frozen=True)
+class DenConfig:
+  """Parsed contents of config.json.
+
+  Attributes:
+    raw: The parsed JSON object.
+  """
+
+  raw: dict[str, Any] = field(default_factory=dict)
+
+  def section(self, name: str) -> dict[str, Any]:
+    """Return a top-level section of the config, or {} if absent or invalid."""
+    value = self.raw.get(name)
+    return value if isinstance(value, dict) else {}
+
+
+def get_config_file_path() -> Path:
+  """Return the path to the config.json file.
+
+  Returns:
+    Path to ~/.config/den/config.json
+  """
+  return Path.home() / ".config" / "den" / "config.json"
+
+
+# Cached configs by path: (st_mtime_ns, st_size) signature and parsed config.
+# A signature of None records that the file did not exist.
+_cache: dict[Path, tuple[tuple[int, int] | None, DenConfig]] = {}
+_cache_lock = threading.Lock()
+
+
+def load_config(path: Path | None = None) -> DenConfig:
+  """Return the parsed config, re-reading the file only if it changed.
+
+  Args:
+    path: Config file to read (defaults to ~/.config/den/config.json).
+
+  Returns:
+    The parsed configuration, or defaults if the file is missing, empty or
+    invalid.
+  """
+  config_file = path if path is not None else get_config_file_path()
+
+  try:
+    stat = config_file.stat()
+    signature: tuple[int, int] | None = (stat.st_mtime_ns, stat.st_size)
+  except OSError:
+    signature = None
+
+  with _cache_lock:
+    cached = _cache.get(config_file)
+  if cached is not None and cached[0] == signature:
+    return cached[1]
+
+  config = _read_config(config_file) if signature is not None else DenConfig()
+  with _cache_lock:
+    _cache[config_file] = (signature, config)
+  return config
+
+
+def clear_config_cache() -> None:
+  """Forget all cached configs so the next load re-reads the file."""
+  with _cache_lock:
+    _cache.clear()
+
+
+def _read_config(config_file: Path) -> DenConfig:
+  """Read and parse a config file, falling back to defaults on errors."""
+  try:
+    with config_file.open("r", encoding="utf-8") as f:
+      content = f.read()
+  except OSError:
+    return DenConfig()
+  if not content.strip():
+    return DenConfig()
+
+  try:
+    data = json.loads(content)
+  except json.JSONDecodeError:
+    return DenConfig()
+  if not isinstance(data, dict):
+    return DenConfig()
+
+  return DenConfig(raw=data)
@@ -0,0 +1,347 @@
+"""Resident daemon and thin client for fast command dispatch.
+
+The daemon is a long-lived process that keeps den's modules imported. The
+client side sends argv, the working directory and the environment over a
+unix socket at ~/.config/den/daemon.sock, along with its stdin, stdout and
+stderr file descriptors. The daemon forks a worker per request that runs
+the command directly on those descriptors, so output and interactive
+prompts behave exactly as in-process, and returns the exit code.
+
+The client half only uses the standard library so that forwarding a
+command stays cheap; everything heavier is imported by the server.
+"""
+
+import json
+import os
+import signal
+import socket
+import struct
+import sys
+import time
+import traceback
+from typing import Any
+
+DAEMON_DISABLE_ENV = "DEN_NO_DAEMON"
+
+# Length prefix for every message: 4-byte big-endian payload size.
+_HEADER = struct.Struct("!I")
+_MAX_MESSAGE_SIZE = 16 * 1024 * 1024
+_STDIO_FDS = (0, 1, 2)
+
+
+class DaemonError(Exception):
+  """Exception raised when talking to the daemon fails."""
+
+  pass
+
+
+def get_socket_path() -> str:
+  """Return the path to the daemon's unix socket.
+
+  Returns:
+    Path to ~/.config/den/daemon.sock
+  """
+  return os.path.join(os.path.expanduser("~"), ".config", "den", "daemon.sock")
+
+
+def _send_message(
+  sock: socket.socket, message: dict[str, Any], fds: tuple[int, ...] = ()
+) -> None:
+  """Send a length-prefixed JSON message, optionally passing file descriptors."""
+  payload = json.dumps(message).encode("utf-8")
+  data = _HEADER.pack(len(payload)) + payload
+  sent = socket.send_fds(sock, [data], list(fds)) if fds else 0
+  sock.sendall(data[sent:])
+
+
+def _recv_exact(sock: socket.socket, size: int, data: bytes = b"") -> bytes:
+  """Read from sock until data holds exactly size bytes."""
+  while len(data) < size:
+    chunk = sock.recv(size - len(data))
+    if not chunk:
+      raise DaemonError("Connection closed before message was complete")
+    data += chunk
+  return data
+
+
+def _recv_message(
+  sock: socket.socket, max_fds: int = 0
+) -> tuple[dict[str, Any], list[int]]:
+  """Receive a length-prefixed JSON message and any passed file descriptors."""
+  if max_fds:
+    data, fds, _flags, _addr = socket.recv_fds(sock, 65536, max_fds)
+    if not data:
+      raise DaemonError("Connection closed before message was received")
+  else:
+    data, fds = b"", []
+
+  data = _recv_exact(sock, _HEADER.size, data)
+  (size,) = _HEADER.unpack(data[: _HEADER.size])
+  if size > _MAX_MESSAGE_SIZE:
+    raise DaemonError(f"Message too large: {size} bytes")
+  data = _recv_exact(sock, _HEADER.size + size, data)
+  return json.loads(data[_HEADER.size :].decode("utf-8")), fds
+
+
+def _connect(socket_path: str) -> socket.socket | None:
+  """Connect to the daemon socket, returning None if no daemon is listening."""
+  sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+  try:
+    sock.connect(socket_path)
+  except OSError:
+    sock.close()
+    return None
+  return sock
+
+
+# ============================================================================
+# Client
+# ============================================================================
+
+
+def forward_to_daemon(argv: list[str], socket_path: str | None = None) -> int | None:
+  """Run a den command through the daemon if one is running.
+
+  Args:
+    argv: Command line arguments, excluding the program name.
+    socket_path: Optional socket path (defaults to ~/.config/den/daemon.sock).
+
+  Returns:
+    The command's exit code, or None if the command was not forwarded and
+    should run in-process (no daemon, daemon disabled, or a daemon command).
+  """
+  if os.environ.get(DAEMON_DISABLE_ENV) or (argv and argv[0] == "daemon"):
+    return None
+
+  sock = _connect(socket_path or get_socket_path())
+  if sock is None:
+    return None
+
+  with sock:
+    request = {"argv": argv, "cwd": os.getcwd(), "env": dict(os.environ)}
+    try:
+      _send_message(sock, request, _STDIO_FDS)
+    except OSError:
+      # Nothing has run yet (e.g. a closed stdio descriptor), so it is
+      # safe to fall back to in-process execution.
+      return None
+
+    try:
+      worker_pid = _recv_message(sock)[0]["pid"]
+    except (DaemonError, OSError, KeyError):
+      return None
+
+    def forward_signal(signum: int, _frame: Any) -> None:
+      try:
+        os.kill(worker_pid, signum)
+      except ProcessLookupError:
+        pass
+
+    for signum in (signal.SIGINT, signal.SIGTERM, signal.SIGHUP):
+      signal.signal(signum, forward_signal)
+
+    try:
+      return int(_recv_message(sock)[0]["exit_code"])
+    except (DaemonError, OSError, KeyError, ValueError):
+      print("den: lost connection to daemon", file=sys.stderr)
+      return 1
+
+
+def request_control(command: str, socket_path: str | None = None) -> dict[str, Any]:
+  """Send a control command ("status" or "stop") to the daemon.
+
+  Args:
+    command: The control command name.
+    socket_path: Optional socket path (defaults to ~/.config/den/daemon.sock).
+
+  Returns:
+    The daemon's response.
+
+  Raises:
+    DaemonError: If no daemon is running or the request fails.
+  """
+  sock = _connect(socket_path or get_socket_path())
+  if sock is None:
+    raise DaemonError("No daemon is running")
+
+  with sock:
+    try:
+      _send_message(sock, {"control": command})
+      return _recv_message(sock)[0]
+    except OSError as e:
+      raise DaemonError(f"Failed to contact daemon: {e}") from e
+
+
+# ============================================================================
+# Server
+# ============================================================================
+
+
+def _preload() -> None:
+  """Import the CLI and every command group so workers start warm.
+
+  The config is parsed here too. Workers revalidate the cached config with
+  a stat() call, so edits to config.json are still picked up.
+  """
+  import typer
+
+  from den.config import load_config
+  from den.main import DenGroup, app
+
+  load_config()
+
+  group = typer.main.get_command(app)
+  if isinstance(group, DenGroup):
+    for name in DenGroup.lazy_groups:
+      group.load_command(name)
+
+
+def _reap_children(_signum: int, _frame: Any) -> None:
+  """Collect exited worker processes so they don't linger as zombies."""
+  while True:
+    try:
+      pid, _status = os.waitpid(-1, os.WNOHANG)
+    except ChildProcessError:
+      return
+    if pid == 0:
+      return
+
+
+def _run_worker(conn: socket.socket, request: dict[str, Any], fds: list[int]) -> None:
+  """Run one forwarded command inside a forked worker and never return."""
+  exit_code = 1
+  try:
+    for signum in (signal.SIGCHLD, signal.SIGTERM, signal.SIGHUP):
+      signal.signal(signum, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.default_int_handler)
+
+    # Take over the client's stdio, then rebuild the Python streams on top
+    # of them so tty detection and buffering match the client's terminal.
+    for target, fd in zip(_STDIO_FDS, fds):
+      if fd != target:
+        os.dup2(fd, target)
+        os.close(fd)
+    sys.stdin = open(0, "r", encoding="utf-8", closefd=False)
+    sys.stdout = open(1, "w", encoding="utf-8", closefd=False, buffering=1)
+    sys.stderr = open(2, "w", encoding="utf-8", closefd=False, buffering=1)
+
+    os.environ.clear()
+    os.environ.update(request["env"])
+    os.chdir(request["cwd"])
+
+    _send_message(conn, {"pid": os.getpid()})
+
+    from den.main import app
+
+    try:
+      app(args=request["argv"], prog_name="den")
+      exit_code = 0
+    except SystemExit as e:
+      if e.code is None:
+        exit_code = 0
+      elif isinstance(e.code, int):
+        exit_code = e.code
+      else:
+        print(e.code, file=sys.stderr)
+        exit_code = 1
+  except BaseException:
+    traceback.print_exc()
+  finally:
+    try:
+      # os._exit() skips atexit handlers, so flush queued log records here
+      logging_setup = sys.modules.get("den.logging_setup")
+      if logging_setup is not None:
+        logging_setup.stop_queued_logging()
+      sys.stdout.flush()
+      sys.stderr.flush()
+      # Close the client's descriptors before reporting the exit code so
+      # anything reading the client's output sees EOF in order.
+      for fd in _STDIO_FDS:
+        os.close(fd)
+      _send_message(conn, {"exit_code": exit_code})
+    finally:
+      os._exit(0)
+
+
+def serve(socket_path: str | None = None) -> None:
+  """Run the daemon in the foreground until stopped.
+
+  Args:
+    socket_path: Optional socket path (defaults to ~/.config/den/daemon.sock).
+
+  Raises:
+    DaemonError: If another daemon is already listening on the socket.
+  """
+  socket_path = socket_path or get_socket_path()
+
+  existing = _connect(socket_path)
+  if existing is not None:
+    existing.close()
+    raise DaemonError(f"A daemon is already running at {socket_path}")
+  if os.path.exists(socket_path):
+    # Left behind by a daemon that did not shut down cleanly.
+    os.unlink(socket_path)
+
+  _preload()
+
+  os.makedirs(os.path.dirname(socket_path), exist_ok=True)
+  server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+  # Create the socket owner-only, so no other user can connect between bind
+  # and chmod.
+  previous_umask = os.umask(0o077)
+  try:
+    server.bind(socket_path)
+  finally:
+    os.umask(previous_umask)
+  os.chmod(socket_path, 0o600)
+  server.listen(16)
+
+  started_at = time.time()
+  served = 0
+  running = True
+
+  def stop(_signum: int, _frame: Any) -> None:
+    nonlocal running
+    running = False
+    server.close()
+
+  signal.signal(signal.SIGCHLD, _reap_children)
+  signal.signal(signal.SIGTERM, stop)
+  signal.signal(signal.SIGINT, stop)
+
+  try:
+    while running:
+      try:
+        conn, _addr = server.accept()
+      except OSError:
+        if not running:
+          break
+        raise
+
+      with conn:
+        fds: list[int] = []
+        try:
+          request, fds = _recv_message(conn, max_fds=len(_STDIO_FDS))
+          control = request.get("control")
+          if control == "status":
+            _send_message(
+              conn,
+              {"pid": os.getpid(), "started_at": started_at, "served": served},
+            )
+          elif control == "stop":
+            _send_message(conn, {"stopping": True})
+            running = False
+          elif "argv" in request and len(fds) == len(_STDIO_FDS):
+            served += 1
+            if os.fork() == 0:
+              server.close()
+              _run_worker(conn, request, fds)
+        except (DaemonError, OSError, ValueError) as e:
+          print(f"den daemon: dropped request: {e}", file=sys.stderr)
+        finally:
+          for fd in fds:
+            os.close(fd)
+  finally:
+    server.close()
+    if os.path.exists(socket_path):
+      os.unlink(socket_path)
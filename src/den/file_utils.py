@@ -0,0 +1,72 @@
+"""File utilities shared by den's storage modules."""
+
+import os
+import tempfile
+from pathlib import Path
+
+
+def atomic_write_bytes(path: Path, content: bytes, mode: int = 0o644) -> None:
+  """Replace a file's content atomically.
+
+  The content is written to a temporary file in the same directory, flushed
+  to disk with fsync, and renamed over the target with os.replace. Readers
+  see either the old or the new file, never a truncated one, even if den
+  crashes or another den process is writing at the same time.
+
+  Args:
+    path: File to replace. Parent directories are created if needed.
+    content: New file content.
+    mode: Permission bits for the new file.
+
+  Raises:
+    OSError: If the file cannot be written.
+  """
+  path.parent.mkdir(parents=True, exist_ok=True)
+  fd, tmp_name = tempfile.mkstemp(prefix=f".{path.name}.", dir=path.parent)
+  try:
+    with os.fdopen(fd, "wb") as f:
+      f.write(content)
+      f.flush()
+      os.fsync(f.fileno())
+    os.chmod(tmp_name, mode)
+    os.replace(tmp_name, path)
+  except BaseException:
+    try:
+      os.unlink(tmp_name)
+    except FileNotFoundError:
+      pass
+    raise
+
+
+def atomic_write_text(path: Path, content: str, mode: int = 0o644) -> None:
+  """Replace a file's content atomically with UTF-8 text.
+
+  See atomic_write_bytes().
+
+  Raises:
+    OSError: If the file cannot be written.
+  """
+  atomic_write_bytes(path, content.encode("utf-8"), mode)
+
+
+def append_bytes(path: Path, content: bytes, mode: int = 0o644) -> None:
+  """Append to a file in a single O_APPEND write.
+
+  Each call is one write(2) to a descriptor opened with O_APPEND, so
+  appends from concurrent den processes don't interleave within a record.
+
+  Args:
+    path: File to append to. It and its parent directories are created if
+      needed.
+    content: Bytes to append, usually one complete line.
+    mode: Permission bits if the file is created.
+
+  Raises:
+    OSError: If the file cannot be written.
+  """
+  path.parent.mkdir(parents=True, exist_ok=True)
+  fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, mode)
+  try:
+    os.write(fd, content)
+  finally:
+    os.close(fd)
@@ -0,0 +1,206 @@
+"""Pluggable Brewfile formatter backends.
+
+A formatter backend turns the raw output of `brew bundle dump` into the
+Brewfile that is backed up. Backends are registered by name and imported
+only when selected, so builds that leave out a backend's dependencies (for
+example the slim build without the anthropic SDK) still work with the
+others.
+
+Built-in backends:
+
+  anthropic - Categorized and annotated by Claude (requires an Anthropic
+              API key and the anthropic package).
+  plain     - Grouped by entry type and sorted, without any API calls.
+
+The backend is selected in ~/.config/den/config.json:
+
+  {"brew": {"formatter": "plain"}}
+
+Other packages can add backends through the "den.formatters" entry point
+group. Each entry point must load to a FormatterBackend.
+"""
+
+import importlib
+from collections.abc import Callable
+from dataclasses import dataclass
+from importlib.metadata import entry_points
+
+from den.config import load_config
+
+DEFAULT_FORMATTER = "anthropic"
+
+# Entry point group that third-party formatter backends register under
+ENTRY_POINT_GROUP = "den.formatters"
+
+# Signature of a backend's format function: (raw_content, credential) -> str
+FormatFunction = Callable[[str, str | None], str]
+
+
+class BrewfileFormatterError(Exception):
+  """Exception raised for Brewfile formatting errors."""
+
+  pass
+
+
+@dataclass(frozen=True)
+class FormatterBackend:
+  """A registered Brewfile formatter.
+
+  Attributes:
+    name: Name used to select the backend in config.json.
+    import_path: "module:function" path of the backend's format function.
+    description: One-line description of the backend.
+    credential_key: Key in auth.json the backend needs, or None.
+    credential_name: Human-readable name of that credential.
+    progress_message: Message shown while the backend runs.
+  """
+
+  name: str
+  import_path: str
+  description: str
+  credential_key: str | None = None
+  credential_name: str | None = None
+  progress_message: str = "Formatting Brewfile..."
+
+  def load(self) -> FormatFunction:
+    """Import and return the backend's format function.
+
+    Raises:
+      BrewfileFormatterError: If the backend is not included in this build
+        or its dependencies are not installed.
+    """
+    module_name, _, attr = self.import_path.partition(":")
+    try:
+      module = importlib.import_module(module_name)
+    except ImportError as e:
+      raise BrewfileFormatterError(
+        f"Formatter '{self.name}' is not available in this build: {e}"
+      ) from e
+    return getattr(module, attr)
+
+
+BUILTIN_BACKENDS = {
+  "anthropic": FormatterBackend(
+    name="anthropic",
+    import_path="den.brewfile_formatter:format_brewfile",
+    description="Categorized and annotated by Claude.",
+    credential_key="anthropic_api_key",
+    credential_name="Anthropic API key",
+    progress_message="Formatting Brewfile with AI...",
+  ),
+  "plain": FormatterBackend(
+    name="plain",
+    import_path="den.formatters:format_plain",
+    description="Grouped by entry type and sorted, without API calls.",
+  ),
+}
+
+
+def get_formatter_name() -> str:
+  """Return the formatter selected in config.json, or the default."""
+  name = load_config().section("brew").get("formatter", DEFAULT_FORMATTER)
+  return name if isinstance(name, str) else DEFAULT_FORMATTER
+
+
+def get_backend(name: str | None = None) -> FormatterBackend:
+  """Look up a formatter backend by name.
+
+  Built-in backends are checked first, then the "den.formatters" entry
+  point group.
+
+  Args:
+    name: Backend name (defaults to the one selected in config.json).
+
+  Returns:
+    The backend.
+
+  Raises:
+    BrewfileFormatterError: If no backend has that name.
+  """
+  name = name or get_formatter_name()
+  if name in BUILTIN_BACKENDS:
+    return BUILTIN_BACKENDS[name]
+
+  for entry_point in entry_points(group=ENTRY_POINT_GROUP, name=name):
+    backend = entry_point.load()
+    if isinstance(backend, FormatterBackend):
+      return backend
+
+  raise BrewfileFormatterError(f"Unknown Brewfile formatter '{name}'")
+
+
+def format_brewfile(
+  raw_content: str,
+  credential: str | None = None,
+  backend: FormatterBackend | None = None,
+) -> str:
+  """Format a Brewfile with the selected backend.
+
+  Args:
+    raw_content: The raw Brewfile content from brew bundle dump.
+    credential: The credential named by the backend's credential_key.
+    backend: Backend to use (defaults to the one selected in config.json).
+
+  Returns:
+    The formatted Brewfile content.
+
+  Raises:
+    BrewfileFormatterError: If the backend is unavailable or fails.
+  """
+  backend = backend or get_backend()
+  return backend.load()(raw_content, credential)
+
+
+# Section order and titles for the plain formatter, by Brewfile keyword
+_PLAIN_SECTIONS = [
+  ("tap", "Taps"),
+  ("brew", "Formulae"),
+  ("cask", "Casks"),
+  ("mas", "Mac App Store"),
+  ("vscode", "Visual Studio Code Extensions"),
+  ("go", "Go Tools"),
+  ("cargo", "Cargo Packages"),
+]
+
+
+def format_plain(raw_content: str, credential: str | None = None) -> str:
+  """Format a Brewfile by grouping and sorting its entries.
+
+  Entries are grouped by keyword (tap, brew, cask, ...) under decorated
+  section headers and sorted within each group. Lines with unknown keywords
+  are kept in an "Other" section, so no entry is ever dropped.
+
+  Args:
+    raw_content: The raw Brewfile content from brew bundle dump.
+    credential: Unused; plain formatting needs no credentials.
+
+  Returns:
+    The formatted Brewfile content.
+  """
+  groups: dict[str, list[str]] = {}
+  for line in raw_content.splitlines():
+    line = line.strip()
+    if not line or line.startswith("#"):
+      continue
+    keyword = line.split(None, 1)[0]
+    groups.setdefault(keyword, []).append(line)
+
+  sections = [
+    (title, groups.pop(keyword)) for keyword, title in _PLAIN_SECTIONS
+    if keyword in groups
+  ]
+  other = [line for lines in groups.values() for line in lines]
+  if other:
+    sections.append(("Other", other))
+
+  out = [
+    "# Homebrew Brewfile",
+    "# Generated by den - https://github.com/wiscotrashpanda/den",
+    "#",
+    "# Use 'brew bundle' to install all packages, 'brew bundle cleanup' to",
+    "# remove unlisted packages.",
+  ]
+  for title, lines in sections:
+    out.extend(["", "# " + "=" * 44, f"# {title}", "# " + "=" * 44])
+    out.extend(sorted(lines, key=str.lower))
+  return "\n".join(out) + "\n"
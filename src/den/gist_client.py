@@ -5,6 +5,8 @@ This module handles creating and updating GitHub Gists using the GitHub API.
 
 import httpx
 
+from den.tracing import span
+
 GITHUB_API_BASE = "https://api.github.com"
 
 
@@ -47,13 +49,16 @@ def create_gist(
   }
 
   try:
-    with httpx.Client() as client:
+    with httpx.Client() as client, span(
+      "POST /gists", "http", service="github"
+    ) as s:
       response = client.post(
         f"{GITHUB_API_BASE}/gists",
         headers=headers,
         json=payload,
         timeout=30.0,
       )
+      s.set_attribute("status_code", response.status_code)
       response.raise_for_status()
       data = response.json()
       return data["id"], data["html_url"]
@@ -94,13 +99,16 @@ def update_gist(gist_id: str, content: str, token: str) -> str:
   }
 
   try:
-    with httpx.Client() as client:
+    with httpx.Client() as client, span(
+      "PATCH /gists/{id}", "http", service="github"
+    ) as s:
       response = client.patch(
         f"{GITHUB_API_BASE}/gists/{gist_id}",
         headers=headers,
         json=payload,
         timeout=30.0,
       )
+      s.set_attribute("status_code", response.status_code)
       response.raise_for_status()
       data = response.json()
       return data["html_url"]
@@ -1,16 +1,183 @@
-"""Hash utility functions for content hashing."""
+"""Hash utility functions for content hashing.
+
+Digests are tagged with the algorithm that produced them, e.g.
+"sha256:9f86d0..." or "blake2b:a71079...". verify_hash() reads the tag, so
+values stored with one algorithm keep verifying after the default changes.
+
+Content can be hashed in one call with compute_hash(), or incrementally
+with a Hasher fed bytes, memoryviews, files and iterators of chunks without
+holding everything in memory at once.
+"""
 
 import hashlib
+import hmac
+import mmap
+from collections.abc import Iterable
+from pathlib import Path
+
+DEFAULT_ALGORITHM = "sha256"
+
+# Algorithms accepted by Hasher, by digest prefix
+SUPPORTED_ALGORITHMS = ("sha256", "sha512", "blake2b", "blake2s", "sha3_256")
+
+# Read size for hashing files and streams
+CHUNK_SIZE = 1024 * 1024
+
+# Anything accepted by Hasher.update()
+Chunk = str | bytes | bytearray | memoryview
+
+
+class HashError(ValueError):
+  """Raised for unsupported algorithms or malformed digests."""
+
+
+def _check_algorithm(algorithm: str) -> str:
+  """Return the algorithm name, or raise HashError if it is unsupported."""
+  if algorithm not in SUPPORTED_ALGORITHMS:
+    raise HashError(
+      f"Unsupported hash algorithm '{algorithm}' "
+      f"(supported: {', '.join(SUPPORTED_ALGORITHMS)})"
+    )
+  return algorithm
+
+
+class Hasher:
+  """Incremental hasher producing prefix-tagged digests.
+
+  Example:
+    hasher = Hasher("blake2b")
+    hasher.update(b"tap 'homebrew/core'\\n")
+    hasher.update_file(path)
+    hasher.hexdigest()  # "blake2b:..."
+
+  Attributes:
+    algorithm: Name of the hash algorithm, used as the digest prefix.
+  """
+
+  def __init__(self, algorithm: str = DEFAULT_ALGORITHM):
+    self.algorithm = _check_algorithm(algorithm)
+    self._hash = hashlib.new(algorithm)
+
+  def update(self, data: Chunk) -> "Hasher":
+    """Add data to the hash. Strings are encoded as UTF-8.
+
+    Returns:
+      The hasher, so calls can be chained.
+    """
+    if isinstance(data, str):
+      data = data.encode("utf-8")
+    self._hash.update(data)
+    return self
+
+  def update_chunks(self, chunks: Iterable[Chunk]) -> "Hasher":
+    """Add every chunk from an iterable, e.g. a generator of lines."""
+    for chunk in chunks:
+      self.update(chunk)
+    return self
+
+  def update_file(
+    self, path: Path, chunk_size: int = CHUNK_SIZE, use_mmap: bool = False
+  ) -> "Hasher":
+    """Add a file's content to the hash.
 
+    The file is read in chunks into a reused buffer, or mapped into memory
+    with use_mmap, so it is never copied whole.
 
-def compute_hash(content: str) -> str:
-  """Compute SHA-256 hash of content.
+    Raises:
+      OSError: If the file cannot be read.
+    """
+    with path.open("rb") as f:
+      if use_mmap:
+        try:
+          with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            self._hash.update(mapped)
+          return self
+        except ValueError:
+          # Empty files cannot be mapped
+          return self
+
+      buffer = bytearray(chunk_size)
+      view = memoryview(buffer)
+      while size := f.readinto(buffer):
+        self._hash.update(view[:size])
+    return self
+
+  def copy(self) -> "Hasher":
+    """Return an independent hasher with the same state."""
+    clone = Hasher.__new__(Hasher)
+    clone.algorithm = self.algorithm
+    clone._hash = self._hash.copy()
+    return clone
+
+  def hexdigest(self) -> str:
+    """Return the digest as "<algorithm>:<hex>"."""
+    return f"{self.algorithm}:{self._hash.hexdigest()}"
+
+
+def compute_hash(
+  content: Chunk | Iterable[Chunk], algorithm: str = DEFAULT_ALGORITHM
+) -> str:
+  """Compute the hash of content.
 
   Args:
-    content: The string content to hash.
+    content: A string (hashed as UTF-8), bytes-like object, or an iterable
+      of either, hashed as their concatenation.
+    algorithm: Hash algorithm (see SUPPORTED_ALGORITHMS).
+
+  Returns:
+    Hash as hex string with an algorithm prefix, e.g. "sha256:...".
+
+  Raises:
+    HashError: If the algorithm is not supported.
+  """
+  hasher = Hasher(algorithm)
+  if isinstance(content, Chunk):
+    return hasher.update(content).hexdigest()
+  return hasher.update_chunks(content).hexdigest()
+
+
+def hash_file(
+  path: Path, algorithm: str = DEFAULT_ALGORITHM, use_mmap: bool = False
+) -> str:
+  """Compute the hash of a file's content without reading it whole.
+
+  Raises:
+    HashError: If the algorithm is not supported.
+    OSError: If the file cannot be read.
+  """
+  return Hasher(algorithm).update_file(path, use_mmap=use_mmap).hexdigest()
+
+
+def parse_digest(digest: str) -> tuple[str, str]:
+  """Split a prefix-tagged digest into its algorithm and hex value.
+
+  Raises:
+    HashError: If the digest has no prefix, an unsupported algorithm, or a
+      value that is not hexadecimal.
+  """
+  algorithm, sep, value = digest.partition(":")
+  if not sep or not value:
+    raise HashError(f"Malformed digest '{digest}'")
+  _check_algorithm(algorithm)
+  try:
+    bytes.fromhex(value)
+  except ValueError as e:
+    raise HashError(f"Malformed digest '{digest}'") from e
+  return algorithm, value
+
+
+def verify_hash(content: Chunk | Iterable[Chunk], expected: str) -> bool:
+  """Check content against a digest produced by compute_hash().
+
+  The content is hashed with the algorithm named in the digest's prefix, so
+  values stored with an older default algorithm still verify.
 
   Returns:
-    Hash as hex string with "sha256:" prefix.
+    True if the content matches. False if it doesn't, or if the digest is
+    malformed or uses an unsupported algorithm.
   """
-  hash_bytes = hashlib.sha256(content.encode("utf-8")).hexdigest()
-  return f"sha256:{hash_bytes}"
+  try:
+    algorithm, _ = parse_digest(expected)
+  except HashError:
+    return False
+  return hmac.compare_digest(compute_hash(content, algorithm), expected)
@@ -0,0 +1,345 @@
+"""Run history for den commands.
+
+Every `den brew upgrade` run is appended to a SQLite database at
+~/.config/den/history.db (WAL mode) with its start and end time, per-step
+durations, Brewfile hash, whether the Brewfile changed or the backup was
+skipped, Anthropic token usage and exit status. `den brew history` reads it
+back to show recent runs and p50/p95/max durations per step.
+
+Step durations and token usage come from the spans recorded by den.tracing
+while the run is in progress.
+"""
+
+import logging
+import math
+import sqlite3
+import time
+from collections.abc import Iterator, Sequence
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from den.tracing import Span, collect_spans
+
+# Seconds to wait for another process's write lock before failing
+BUSY_TIMEOUT_SECONDS = 30.0
+
+# Default number of recent runs used for step percentiles
+DEFAULT_STATS_WINDOW = 50
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+  id INTEGER PRIMARY KEY,
+  command TEXT NOT NULL,
+  started_at REAL NOT NULL,
+  ended_at REAL NOT NULL,
+  exit_code INTEGER NOT NULL,
+  brewfile_hash TEXT,
+  changed INTEGER,
+  skipped INTEGER NOT NULL DEFAULT 0,
+  input_tokens INTEGER,
+  output_tokens INTEGER
+);
+CREATE INDEX IF NOT EXISTS runs_command_started ON runs (command, started_at);
+CREATE TABLE IF NOT EXISTS run_steps (
+  run_id INTEGER NOT NULL REFERENCES runs (id) ON DELETE CASCADE,
+  step TEXT NOT NULL,
+  position INTEGER NOT NULL,
+  duration_s REAL NOT NULL,
+  PRIMARY KEY (run_id, step)
+) WITHOUT ROWID;
+"""
+
+
+def get_history_db_path() -> Path:
+  """Return the path to the run history database.
+
+  Returns:
+    Path to ~/.config/den/history.db
+  """
+  return Path.home() / ".config" / "den" / "history.db"
+
+
+@dataclass
+class RunRecord:
+  """One recorded command run.
+
+  Attributes:
+    command: Command name, e.g. "brew upgrade".
+    started_at: Unix time the run started.
+    ended_at: Unix time the run ended, or None while running.
+    exit_code: Exit status, or None while running.
+    brewfile_hash: Hash of the generated Brewfile, if one was generated.
+    changed: Whether the Brewfile differed from the last backup, if known.
+    skipped: Whether the backup was skipped because nothing changed.
+    input_tokens: Anthropic input tokens used, if any API call was made.
+    output_tokens: Anthropic output tokens used, if any API call was made.
+    steps: Duration in seconds of each step, by step name.
+  """
+
+  command: str
+  started_at: float
+  ended_at: float | None = None
+  exit_code: int | None = None
+  brewfile_hash: str | None = None
+  changed: bool | None = None
+  skipped: bool = False
+  input_tokens: int | None = None
+  output_tokens: int | None = None
+  steps: dict[str, float] = field(default_factory=dict)
+
+  @property
+  def duration_s(self) -> float | None:
+    """Return the run's wall time in seconds, or None while running."""
+    return None if self.ended_at is None else self.ended_at - self.started_at
+
+  def add_spans(self, spans: Sequence[Span]) -> None:
+    """Add step durations and token usage from finished spans."""
+    for span in spans:
+      if span.category == "step":
+        seconds = span.duration_ns / 1e9
+        self.steps[span.name] = self.steps.get(span.name, 0.0) + seconds
+      for attr in ("input_tokens", "output_tokens"):
+        value = span.attributes.get(attr)
+        if isinstance(value, int):
+          setattr(self, attr, (getattr(self, attr) or 0) + value)
+
+
+@dataclass
+class StepStats:
+  """Duration percentiles of one step over recent runs.
+
+  Attributes:
+    step: Step name.
+    count: Number of runs that included the step.
+    p50: Median duration in seconds.
+    p95: 95th percentile duration in seconds.
+    max: Longest duration in seconds.
+  """
+
+  step: str
+  count: int
+  p50: float
+  p95: float
+  max: float
+
+
+def percentile(values: Sequence[float], pct: float) -> float:
+  """Return the nearest-rank percentile of a non-empty sequence.
+
+  Args:
+    values: Sample values.
+    pct: Percentile between 0 and 100.
+
+  Returns:
+    The smallest value that at least pct percent of values are <= to.
+  """
+  ordered = sorted(values)
+  rank = max(1, math.ceil(pct / 100 * len(ordered)))
+  return ordered[rank - 1]
+
+
+class HistoryStore:
+  """Append-only run history in a SQLite database.
+
+  Attributes:
+    path: The database file (defaults to ~/.config/den/history.db).
+  """
+
+  def __init__(self, path: Path | None = None):
+    self.path = path or get_history_db_path()
+
+  @contextmanager
+  def _connect(self) -> Iterator[sqlite3.Connection]:
+    """Open the database, creating the schema on first use."""
+    self.path.parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(self.path, timeout=BUSY_TIMEOUT_SECONDS)
+    try:
+      conn.execute("PRAGMA journal_mode=WAL")
+      conn.execute("PRAGMA foreign_keys=ON")
+      conn.executescript(SCHEMA)
+      yield conn
+    finally:
+      conn.close()
+
+  def append(self, run: RunRecord) -> int:
+    """Record a finished run.
+
+    Args:
+      run: The run to record. Its ended_at and exit_code must be set.
+
+    Returns:
+      The run's id.
+
+    Raises:
+      sqlite3.Error: If the database cannot be written.
+    """
+    with self._connect() as conn, conn:
+      cursor = conn.execute(
+        """
+        INSERT INTO runs (
+          command, started_at, ended_at, exit_code, brewfile_hash, changed,
+          skipped, input_tokens, output_tokens
+        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """,
+        (
+          run.command,
+          run.started_at,
+          run.ended_at,
+          run.exit_code,
+          run.brewfile_hash,
+          run.changed,
+          run.skipped,
+          run.input_tokens,
+          run.output_tokens,
+        ),
+      )
+      run_id = cursor.lastrowid
+      conn.executemany(
+        "INSERT INTO run_steps (run_id, step, position, duration_s)"
+        " VALUES (?, ?, ?, ?)",
+        [
+          (run_id, step, position, duration)
+          for position, (step, duration) in enumerate(run.steps.items())
+        ],
+      )
+    return run_id
+
+  def recent_runs(self, command: str, limit: int = 10) -> list[RunRecord]:
+    """Return the most recent runs of a command, newest first.
+
+    Raises:
+      sqlite3.Error: If the database cannot be read.
+    """
+    with self._connect() as conn:
+      rows = conn.execute(
+        """
+        SELECT id, started_at, ended_at, exit_code, brewfile_hash, changed,
+               skipped, input_tokens, output_tokens
+        FROM runs WHERE command = ?
+        ORDER BY started_at DESC LIMIT ?
+        """,
+        (command, limit),
+      ).fetchall()
+      steps: dict[int, dict[str, float]] = {}
+      for run_id, step, duration in conn.execute(
+        f"""
+        SELECT run_id, step, duration_s FROM run_steps
+        WHERE run_id IN ({",".join("?" * len(rows))})
+        ORDER BY run_id, position
+        """,
+        [row[0] for row in rows],
+      ):
+        steps.setdefault(run_id, {})[step] = duration
+
+    return [
+      RunRecord(
+        command=command,
+        started_at=started_at,
+        ended_at=ended_at,
+        exit_code=exit_code,
+        brewfile_hash=brewfile_hash,
+        changed=None if changed is None else bool(changed),
+        skipped=bool(skipped),
+        input_tokens=input_tokens,
+        output_tokens=output_tokens,
+        steps=steps.get(run_id, {}),
+      )
+      for (
+        run_id,
+        started_at,
+        ended_at,
+        exit_code,
+        brewfile_hash,
+        changed,
+        skipped,
+        input_tokens,
+        output_tokens,
+      ) in rows
+    ]
+
+  def step_stats(
+    self, command: str, window: int = DEFAULT_STATS_WINDOW
+  ) -> list[StepStats]:
+    """Return p50/p95/max durations per step over a command's recent runs.
+
+    Args:
+      command: Command name.
+      window: Number of most recent runs to include.
+
+    Returns:
+      One entry per step, in order of first appearance.
+
+    Raises:
+      sqlite3.Error: If the database cannot be read.
+    """
+    with self._connect() as conn:
+      rows = conn.execute(
+        """
+        SELECT s.step, s.duration_s
+        FROM (
+          SELECT id FROM runs WHERE command = ?
+          ORDER BY started_at DESC LIMIT ?
+        ) AS recent
+        JOIN run_steps AS s ON s.run_id = recent.id
+        ORDER BY recent.id, s.position
+        """,
+        (command, window),
+      ).fetchall()
+
+    durations: dict[str, list[float]] = {}
+    for step, duration in rows:
+      durations.setdefault(step, []).append(duration)
+    return [
+      StepStats(
+        step=step,
+        count=len(values),
+        p50=percentile(values, 50),
+        p95=percentile(values, 95),
+        max=max(values),
+      )
+      for step, values in durations.items()
+    ]
+
+
+@contextmanager
+def record_run(
+  command: str,
+  store: HistoryStore | None = None,
+  logger: logging.Logger | None = None,
+) -> Iterator[RunRecord]:
+  """Record the enclosed block as one run in the history database.
+
+  The block can set fields such as brewfile_hash and changed on the yielded
+  record. Step durations and token usage are collected from spans. The exit
+  code is taken from a typer.Exit raised by the block (1 for any other
+  exception, 0 if the block completes). Failing to write the history never
+  fails the command; the error is logged instead.
+
+  Args:
+    command: Command name, e.g. "brew upgrade".
+    store: History store (defaults to ~/.config/den/history.db).
+    logger: Logger for history write failures.
+
+  Yields:
+    The run record.
+  """
+  run = RunRecord(command=command, started_at=time.time())
+  with collect_spans() as tracer:
+    first_span = len(tracer.spans)
+    try:
+      yield run
+      run.exit_code = 0
+    except BaseException as e:
+      exit_code = getattr(e, "exit_code", None)
+      run.exit_code = exit_code if isinstance(exit_code, int) else 1
+      raise
+    finally:
+      run.ended_at = time.time()
+      run.add_spans(tracer.spans[first_span:])
+      try:
+        (store or HistoryStore()).append(run)
+      except (OSError, sqlite3.Error) as e:
+        (logger or logging.getLogger(__name__)).warning(
+          f"Failed to record run history: {e}"
+        )
@@ -0,0 +1,191 @@
+"""Single-instance locks for long-running den commands.
+
+A command that must not run twice at once (such as `den brew upgrade`)
+holds an exclusive flock on a lock file under ~/.config/den/ for as long
+as it runs. The kernel releases the flock when the holder exits, even if it
+crashes, so a lock can never be left held by a dead process.
+
+The lock file also records who holds it: the holder's pid, a run id, when
+it started and, once it finishes, its exit code and a one-line summary.
+Another invocation reads this to report which run is in progress, to pick
+up the result of that run after it finishes ("attach"), and to notice that
+the previous holder died without finishing (a stale lock).
+
+The lock file is rewritten in place and never replaced, because replacing
+it would give later invocations a different inode to lock.
+"""
+
+import fcntl
+import json
+import os
+import time
+import uuid
+from dataclasses import asdict, dataclass
+from pathlib import Path
+
+# Seconds between attempts while waiting for a lock with a timeout
+POLL_INTERVAL_SECONDS = 0.2
+
+
+class LockTimeoutError(Exception):
+  """Raised when a lock is not acquired before the timeout."""
+
+
+def get_lock_path(name: str) -> Path:
+  """Return the path of a named lock file.
+
+  Args:
+    name: Lock name, e.g. "brew-upgrade".
+
+  Returns:
+    Path to ~/.config/den/<name>.lock
+  """
+  return Path.home() / ".config" / "den" / f"{name}.lock"
+
+
+@dataclass
+class LockInfo:
+  """Who holds (or last held) a lock, as recorded in the lock file.
+
+  Attributes:
+    run_id: Unique id of the run.
+    pid: Process id of the holder.
+    started_at: Unix time the holder acquired the lock.
+    finished_at: Unix time the holder finished, or None while running.
+    exit_code: Exit code of the run, or None while running.
+    summary: One-line description of the run's outcome, if any.
+  """
+
+  run_id: str
+  pid: int
+  started_at: float
+  finished_at: float | None = None
+  exit_code: int | None = None
+  summary: str | None = None
+
+  @property
+  def finished(self) -> bool:
+    """Whether the run recorded its result."""
+    return self.exit_code is not None
+
+
+class InstanceLock:
+  """An exclusive flock on a lock file.
+
+  Attributes:
+    path: The lock file.
+    info: What this process recorded in the lock file while holding it.
+    previous: What the lock file recorded before this process acquired it.
+  """
+
+  def __init__(self, path: Path):
+    self.path = path
+    self.info: LockInfo | None = None
+    self.previous: LockInfo | None = None
+    self._fd: int | None = None
+
+  @property
+  def held(self) -> bool:
+    """Whether this process holds the lock."""
+    return self._fd is not None
+
+  def read(self) -> LockInfo | None:
+    """Return the information recorded in the lock file, if readable."""
+    try:
+      data = json.loads(self.path.read_text(encoding="utf-8"))
+      return LockInfo(**data)
+    except (OSError, ValueError, TypeError):
+      return None
+
+  def acquire(self, timeout: float | None = None) -> None:
+    """Take the lock and record this process as its holder.
+
+    What the previous holder recorded is kept in `previous`. The record is
+    written straight after the flock is taken, so another invocation that
+    finds the lock held reads the current holder rather than the one before
+    it. A previous holder that has not recorded a result by the time the
+    lock is acquired must have died mid-run (the lock was stale).
+
+    Args:
+      timeout: Seconds to wait for another holder to release the lock.
+        0 fails immediately and None waits indefinitely.
+
+    Raises:
+      LockTimeoutError: If the lock is still held after the timeout.
+      OSError: If the lock file cannot be created.
+    """
+    if self.held:
+      return
+    self.path.parent.mkdir(parents=True, exist_ok=True)
+    fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+      self._flock(fd, timeout)
+    except BaseException:
+      os.close(fd)
+      raise
+    self._fd = fd
+    self.previous = self.read()
+    self.info = LockInfo(
+      run_id=uuid.uuid4().hex, pid=os.getpid(), started_at=time.time()
+    )
+    self._write(self.info)
+
+  def _flock(self, fd: int, timeout: float | None) -> None:
+    """Take an exclusive flock, polling until the timeout expires."""
+    if timeout is None:
+      fcntl.flock(fd, fcntl.LOCK_EX)
+      return
+    deadline = time.monotonic() + timeout
+    while True:
+      try:
+        fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        return
+      except BlockingIOError:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+          raise LockTimeoutError(f"{self.path} is held by another process")
+        time.sleep(min(POLL_INTERVAL_SECONDS, remaining))
+
+  def _write(self, info: LockInfo) -> None:
+    """Rewrite the lock file in place with the given information."""
+    assert self._fd is not None
+    data = json.dumps(asdict(info)).encode("utf-8")
+    os.ftruncate(self._fd, 0)
+    os.pwrite(self._fd, data, 0)
+
+  def finish(self, exit_code: int, summary: str | None = None) -> None:
+    """Record the result of the run for invocations attached to it."""
+    if self.info is None or not self.held:
+      return
+    self.info.finished_at = time.time()
+    self.info.exit_code = exit_code
+    self.info.summary = summary
+    self._write(self.info)
+
+  def abandon(self) -> None:
+    """Release the lock without having run, restoring the previous record.
+
+    Used by an invocation that only waited for another run's result, so
+    invocations still waiting for that result can read it too.
+    """
+    if self.held and self.previous is not None:
+      self._write(self.previous)
+    self.info = None
+    self.release()
+
+  def release(self) -> None:
+    """Release the lock. The lock file is left in place."""
+    if self._fd is None:
+      return
+    fd, self._fd = self._fd, None
+    try:
+      fcntl.flock(fd, fcntl.LOCK_UN)
+    finally:
+      os.close(fd)
+
+  def __enter__(self) -> "InstanceLock":
+    self.acquire()
+    return self
+
+  def __exit__(self, *exc_info: object) -> None:
+    self.release()
@@ -1,24 +1,15 @@
 """LaunchCtl configuration module for reading domain settings.
 
 This module handles reading the domain configuration from the config.json file
-at ~/.config/den/config.json for use in LaunchAgent plist file naming.
+at ~/.config/den/config.json for use in LaunchAgent plist file naming. Parsing
+and caching are handled by den.config.
 """
 
-import json
-from pathlib import Path
+from den.config import get_config_file_path, load_config
 
 DEFAULT_DOMAIN = "com.example"
 
 
-def get_config_file_path() -> Path:
-  """Return the path to the config.json file.
-
-  Returns:
-    Path to ~/.config/den/config.json
-  """
-  return Path.home() / ".config" / "den" / "config.json"
-
-
 def get_domain() -> str:
   """Read domain from ~/.config/den/config.json or return default.
 
@@ -29,21 +20,6 @@ def get_domain() -> str:
   Returns:
     The configured domain string, or 'com.example' if not configured.
   """
-  config_file = get_config_file_path()
-
-  if not config_file.exists():
-    return DEFAULT_DOMAIN
-
-  try:
-    with config_file.open("r", encoding="utf-8") as f:
-      content = f.read()
-      if not content.strip():
-        return DEFAULT_DOMAIN
-      config = json.loads(content)
-  except (json.JSONDecodeError, OSError):
-    return DEFAULT_DOMAIN
-
-  launchctl_config = config.get("launchctl", {})
-  if not isinstance(launchctl_config, dict):
-    return DEFAULT_DOMAIN
-  return launchctl_config.get("domain", DEFAULT_DOMAIN)
+  section = load_config(get_config_file_path()).section("launchctl")
+  domain = section.get("domain", DEFAULT_DOMAIN)
+  return domain if isinstance(domain, str) else DEFAULT_DOMAIN
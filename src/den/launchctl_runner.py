@@ -7,6 +7,8 @@ macOS LaunchAgent plist files.
 import subprocess
 from pathlib import Path
 
+from den.tracing import span
+
 
 class LaunchctlError(Exception):
   """Raised when a launchctl command fails."""
@@ -28,12 +30,14 @@ def load_agent(plist_path: Path) -> None:
     LaunchctlError: If the load command fails.
   """
   try:
-    result = subprocess.run(
-      ["launchctl", "load", str(plist_path)],
-      capture_output=True,
-      text=True,
-      check=False,
-    )
+    with span("launchctl load", "subprocess", plist=str(plist_path)) as s:
+      result = subprocess.run(
+        ["launchctl", "load", str(plist_path)],
+        capture_output=True,
+        text=True,
+        check=False,
+      )
+      s.set_attribute("exit_code", result.returncode)
     if result.returncode != 0:
       raise LaunchctlError(
         f"launchctl load {plist_path}",
@@ -58,12 +62,14 @@ def unload_agent(plist_path: Path) -> None:
     LaunchctlError: If the unload command fails.
   """
   try:
-    result = subprocess.run(
-      ["launchctl", "unload", str(plist_path)],
-      capture_output=True,
-      text=True,
-      check=False,
-    )
+    with span("launchctl unload", "subprocess", plist=str(plist_path)) as s:
+      result = subprocess.run(
+        ["launchctl", "unload", str(plist_path)],
+        capture_output=True,
+        text=True,
+        check=False,
+      )
+      s.set_attribute("exit_code", result.returncode)
     if result.returncode != 0:
       raise LaunchctlError(
         f"launchctl unload {plist_path}",
@@ -0,0 +1,90 @@
+"""Lazy command group for deferring command module imports.
+
+This module provides a Typer group class that registers command groups by
+import path instead of by object. A group's module (and the client modules
+it pulls in, such as anthropic and httpx) is only imported when that group
+is actually invoked, so lightweight commands start quickly.
+"""
+
+import importlib
+from dataclasses import dataclass
+from typing import Any
+
+import typer
+from typer.core import TyperGroup
+
+
+@dataclass(frozen=True)
+class LazyGroupSpec:
+  """Registration for a command group that is imported on first use.
+
+  Attributes:
+    import_path: Location of the Typer sub-app in "module:attribute" form.
+    help: Short help shown in the parent's command list. Must match the
+      sub-app's own help so `--help` output is unchanged by lazy loading.
+  """
+
+  import_path: str
+  help: str
+
+
+class LazyTyperGroup(TyperGroup):
+  """Typer group that resolves registered sub-apps on demand.
+
+  Subclasses declare their lazily loaded groups in `lazy_groups`. Listing
+  commands (e.g. for `--help`) only uses the registered help text; the
+  sub-app module is imported when the group is resolved for invocation.
+  """
+
+  lazy_groups: dict[str, LazyGroupSpec] = {}
+
+  def list_commands(self, ctx: typer.Context) -> list[str]:
+    """Return eagerly registered commands followed by lazy groups."""
+    names = super().list_commands(ctx)
+    return names + [name for name in self.lazy_groups if name not in names]
+
+  def get_command(self, ctx: typer.Context, cmd_name: str) -> Any:
+    """Return a command, using a lightweight placeholder for unloaded groups.
+
+    The placeholder carries only the name and help text, which is all that
+    help formatting and command listing need.
+    """
+    command = super().get_command(ctx, cmd_name)
+    if command is not None:
+      return command
+
+    spec = self.lazy_groups.get(cmd_name)
+    if spec is None:
+      return None
+    return TyperGroup(name=cmd_name, help=spec.help)
+
+  def resolve_command(self, ctx: typer.Context, args: list[str]) -> Any:
+    """Import the requested lazy group before resolving it for invocation."""
+    if args and args[0] in self.lazy_groups:
+      self.load_command(args[0])
+    return super().resolve_command(ctx, args)
+
+  def load_command(self, cmd_name: str) -> Any:
+    """Import a lazy group's sub-app and register it as a real command.
+
+    Args:
+      cmd_name: Name of a group registered in `lazy_groups`.
+
+    Returns:
+      The loaded command group.
+
+    Raises:
+      KeyError: If cmd_name is not a registered lazy group.
+    """
+    if cmd_name in self.commands:
+      return self.commands[cmd_name]
+
+    module_name, attr_name = self.lazy_groups[cmd_name].import_path.split(":")
+    sub_app = getattr(importlib.import_module(module_name), attr_name)
+
+    # get_group always returns a group, even for single-command sub-apps,
+    # matching how add_typer registers them.
+    command = typer.main.get_group(sub_app)
+    command.name = cmd_name
+    self.add_command(command, cmd_name)
+    return command
@@ -0,0 +1,273 @@
+"""Fast queries over the brew-upgrade log.
+
+`den brew logs` reads the log from the end or from a point in time, so the
+cost of a query depends on how much it prints rather than on the size of
+the log:
+
+- --tail and --run read the file backwards in BLOCK_SIZE blocks and stop as
+  soon as they have enough records.
+- --since seeks to the last entry of the sparse timestamp index (kept by
+  den.logging_setup) that is older than the requested time, and reads
+  forward from there.
+
+A record is a "YYYY-MM-DD HH:MM:SS LEVEL: message" line plus any following
+lines that don't start with a timestamp, such as tracebacks. Only the
+current log is searched, not rotated .gz files.
+"""
+
+import logging
+import os
+import re
+from collections.abc import Iterator
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import BinaryIO
+
+from den.logging_setup import LOG_DATE_FORMAT, read_log_index
+
+# Bytes read per seek when reading the log backwards
+BLOCK_SIZE = 64 * 1024
+
+# Message logged at the start of every brew upgrade run
+RUN_START_MESSAGE = "Starting brew upgrade process"
+
+# "2025-01-15 10:30:45 INFO: Message"
+HEADER_PATTERN = re.compile(
+  r"(\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}) ([A-Z]+): (.*)", re.DOTALL
+)
+
+# Relative --since values such as "30m", "2h" or "7d"
+RELATIVE_PATTERN = re.compile(r"(\d+)([smhdw])")
+RELATIVE_UNITS = {
+  "s": "seconds",
+  "m": "minutes",
+  "h": "hours",
+  "d": "days",
+  "w": "weeks",
+}
+
+
+@dataclass(frozen=True)
+class LogEntry:
+  """One record read from the log.
+
+  Attributes:
+    offset: Byte offset of the record in the log file.
+    timestamp: "YYYY-MM-DD HH:MM:SS" time of the record.
+    level: Level name, e.g. "ERROR".
+    message: Message from the first line of the record.
+    text: The whole record, including continuation lines.
+  """
+
+  offset: int
+  timestamp: str
+  level: str
+  message: str
+  text: str
+
+  @property
+  def levelno(self) -> int:
+    """Numeric level, or 0 for an unknown level name."""
+    levelno = logging.getLevelName(self.level)
+    return levelno if isinstance(levelno, int) else 0
+
+
+def parse_since(value: str, now: datetime | None = None) -> datetime:
+  """Parse a --since value.
+
+  Args:
+    value: A relative age such as "30m", "2h", "3d" or "1w", or an ISO date
+      or date and time such as "2025-01-15" or "2025-01-15 10:30".
+    now: Time relative ages are measured from (defaults to now).
+
+  Raises:
+    ValueError: If the value is not recognized.
+  """
+  match = RELATIVE_PATTERN.fullmatch(value.strip())
+  if match:
+    amount, unit = match.groups()
+    delta = timedelta(**{RELATIVE_UNITS[unit]: int(amount)})
+    return (now or datetime.now()) - delta
+  try:
+    return datetime.fromisoformat(value.strip())
+  except ValueError:
+    raise ValueError(
+      f"Invalid time '{value}' (use e.g. 2h, 3d or 2025-01-15 10:30)"
+    ) from None
+
+
+def _parse_entry(offset: int, lines: list[bytes]) -> LogEntry | None:
+  """Build an entry from a header line and its continuation lines."""
+  text = b"\n".join(lines).decode("utf-8", errors="replace")
+  match = HEADER_PATTERN.match(text)
+  if match is None:
+    return None
+  timestamp, level, message = match.groups()
+  return LogEntry(offset, timestamp, level, message.split("\n", 1)[0], text)
+
+
+def _is_header(line: bytes) -> bool:
+  """Return whether a line starts a new record."""
+  prefix = line[:64].decode("utf-8", errors="replace")
+  return HEADER_PATTERN.match(prefix) is not None
+
+
+def _lines_reverse(
+  f: BinaryIO, start: int, end: int
+) -> Iterator[tuple[int, bytes]]:
+  """Yield (offset, line) for the lines between two offsets, last first."""
+  position = end
+  remainder = b""
+  while position > start:
+    size = min(BLOCK_SIZE, position - start)
+    position -= size
+    f.seek(position)
+    block = f.read(size) + remainder
+    lines = block.split(b"\n")
+    line_end = position + len(block)
+    for line in reversed(lines[1:]):
+      line_start = line_end - len(line)
+      if line_start != end:
+        yield line_start, line
+      line_end = line_start - 1
+    remainder = lines[0]
+  if remainder:
+    yield start, remainder
+
+
+def _entries_reverse(f: BinaryIO, start: int, end: int) -> Iterator[LogEntry]:
+  """Yield the records between two offsets, newest first."""
+  continuation: list[bytes] = []
+  for offset, line in _lines_reverse(f, start, end):
+    if not _is_header(line):
+      continuation.append(line)
+      continue
+    entry = _parse_entry(offset, [line, *reversed(continuation)])
+    continuation = []
+    if entry is not None:
+      yield entry
+
+
+def _entries_forward(f: BinaryIO, start: int, end: int) -> Iterator[LogEntry]:
+  """Yield the records between two offsets, oldest first."""
+  f.seek(start)
+  offset = start
+  header_offset = -1
+  lines: list[bytes] = []
+  for line in f:
+    if offset >= end:
+      break
+    line = line.rstrip(b"\n")
+    if _is_header(line):
+      if lines:
+        entry = _parse_entry(header_offset, lines)
+        if entry is not None:
+          yield entry
+      header_offset = offset
+      lines = [line]
+    elif lines:
+      lines.append(line)
+    offset += len(line) + 1
+  if lines:
+    entry = _parse_entry(header_offset, lines)
+    if entry is not None:
+      yield entry
+
+
+def _find_run(f: BinaryIO, end: int, position: int) -> tuple[int, int] | None:
+  """Return the (start, end) offsets of a run, 1 being the latest."""
+  run_end = end
+  found = 0
+  for entry in _entries_reverse(f, 0, end):
+    if entry.message != RUN_START_MESSAGE:
+      continue
+    found += 1
+    if found == position:
+      return entry.offset, run_end
+    run_end = entry.offset
+  return None
+
+
+def _since_offset(f: BinaryIO, log_file: Path, since: str, end: int) -> int:
+  """Return an offset at or before the first record at or after `since`.
+
+  Uses the latest index entry older than `since`, checking that it still
+  points at such a record; otherwise the whole file has to be read.
+  """
+  since_time = datetime.strptime(since, LOG_DATE_FORMAT).timestamp()
+  offset = 0
+  try:
+    index = read_log_index(log_file)
+  except OSError:
+    index = []
+  for created, entry_offset in index:
+    if created >= since_time or entry_offset < offset or entry_offset >= end:
+      break
+    offset = entry_offset
+  if offset == 0:
+    return 0
+
+  f.seek(offset - 1)
+  if f.read(1) != b"\n":
+    return 0
+  entry = _parse_entry(offset, [f.readline().rstrip(b"\n")])
+  if entry is None or entry.timestamp >= since:
+    return 0
+  return offset
+
+
+def query_log(
+  log_file: Path,
+  since: datetime | None = None,
+  min_level: int = logging.NOTSET,
+  run: int | None = None,
+  tail: int | None = None,
+) -> Iterator[LogEntry]:
+  """Yield matching log records, oldest first.
+
+  Args:
+    log_file: Log file to read.
+    since: Only records at or after this time.
+    min_level: Only records at or above this level.
+    run: Only records of this brew upgrade run, 1 being the latest.
+    tail: Only the last this many matching records.
+
+  Raises:
+    OSError: If the log exists but cannot be read.
+  """
+  try:
+    f = log_file.open("rb")
+  except FileNotFoundError:
+    return
+  with f:
+    start, end = 0, os.fstat(f.fileno()).st_size
+    if run is not None:
+      bounds = _find_run(f, end, run)
+      if bounds is None:
+        return
+      start, end = bounds
+    since_text = since.strftime(LOG_DATE_FORMAT) if since is not None else None
+    if since_text is not None:
+      start = max(start, _since_offset(f, log_file, since_text, end))
+
+    def matches(entry: LogEntry) -> bool:
+      if since_text is not None and entry.timestamp < since_text:
+        return False
+      return entry.levelno >= min_level
+
+    if tail is None:
+      for entry in _entries_forward(f, start, end):
+        if matches(entry):
+          yield entry
+      return
+
+    found: list[LogEntry] = []
+    for entry in _entries_reverse(f, start, end):
+      if len(found) >= tail or (
+        since_text is not None and entry.timestamp < since_text
+      ):
+        break
+      if matches(entry):
+        found.append(entry)
+    yield from reversed(found)
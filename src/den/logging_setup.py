@@ -0,0 +1,303 @@
+"""Queued, rotating log files for den commands.
+
+Loggers set up here don't write to their file on the calling thread. Each
+record goes onto an in-memory queue through a QueueHandler, and a
+QueueListener thread writes it to a rotating file. The log file is rotated
+when it exceeds a size limit or when a new day or week starts, and rotated
+files are gzip-compressed (brew-upgrade.log.1.gz, .2.gz, ...) on the
+listener thread.
+
+Next to each log the handler keeps a sparse timestamp index, <log>.idx, with
+one "<Unix time> <byte offset>" line per DEFAULT_INDEX_INTERVAL bytes of log.
+Readers use it to seek close to a point in time without scanning the file
+(see den.log_reader). It is cleared whenever the log is rotated.
+
+Rotation settings can be changed in ~/.config/den/config.json:
+
+  {"logging": {"max_bytes": 5242880, "backup_count": 8, "when": "weekly"}}
+
+"when" is "daily", "weekly" or null (size-based rotation only).
+
+Listeners are stopped, and their queues flushed to disk, when the process
+exits. Forked daemon workers leave with os._exit(), so they call
+stop_queued_logging() themselves.
+"""
+
+import atexit
+import datetime
+import gzip
+import logging
+import logging.handlers
+import os
+import queue
+import shutil
+import threading
+from pathlib import Path
+from typing import Any
+
+from den.file_utils import append_bytes
+
+# Format: "2025-01-15 10:30:45 INFO: Message"
+LOG_FORMAT = "%(asctime)s %(levelname)s: %(message)s"
+LOG_DATE_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+DEFAULT_MAX_BYTES = 5 * 1024 * 1024
+DEFAULT_BACKUP_COUNT = 8
+DEFAULT_WHEN = "weekly"
+
+# Values accepted for "when"
+ROTATION_PERIODS = ("daily", "weekly")
+
+# Bytes of log between entries of the sparse timestamp index
+DEFAULT_INDEX_INTERVAL = 64 * 1024
+
+
+def get_index_path(log_file: Path) -> Path:
+  """Return the path of the sparse timestamp index kept next to a log."""
+  return log_file.with_name(f"{log_file.name}.idx")
+
+
+def read_log_index(log_file: Path) -> list[tuple[int, int]]:
+  """Return the (Unix time, byte offset) entries indexed for a log.
+
+  Entries are in the order they were written. Malformed lines are skipped
+  and a missing index yields no entries.
+
+  Raises:
+    OSError: If the index exists but cannot be read.
+  """
+  try:
+    lines = get_index_path(log_file).read_text(encoding="ascii").splitlines()
+  except (FileNotFoundError, UnicodeDecodeError):
+    return []
+
+  entries = []
+  for line in lines:
+    try:
+      created, offset = (int(field) for field in line.split())
+    except ValueError:
+      continue
+    entries.append((created, offset))
+  return entries
+
+
+def _period(timestamp: float, when: str) -> tuple[int, ...]:
+  """Return the rotation period (local day or ISO week) of a Unix time."""
+  date = datetime.date.fromtimestamp(timestamp)
+  if when == "daily":
+    return (date.year, date.month, date.day)
+  year, week, _ = date.isocalendar()
+  return (year, week)
+
+
+class CompressingRotatingFileHandler(logging.handlers.RotatingFileHandler):
+  """Rotates on size or period change and gzips the rotated files.
+
+  The period of the current file is taken from its modification time when
+  the handler opens it, so short-lived processes rotate correctly on their
+  first write of a new day or week.
+
+  Attributes:
+    when: "daily", "weekly" or None for size-based rotation only.
+    compress: Whether rotated files are gzip-compressed.
+    index_interval: Bytes of log between timestamp index entries, or 0 to
+      keep no index.
+  """
+
+  def __init__(
+    self,
+    filename: Path,
+    max_bytes: int = DEFAULT_MAX_BYTES,
+    backup_count: int = DEFAULT_BACKUP_COUNT,
+    when: str | None = DEFAULT_WHEN,
+    compress: bool = True,
+    index_interval: int = DEFAULT_INDEX_INTERVAL,
+  ):
+    super().__init__(
+      filename,
+      maxBytes=max_bytes,
+      backupCount=backup_count,
+      encoding="utf-8",
+      delay=True,
+    )
+    self.when = when if when in ROTATION_PERIODS else None
+    self.compress = compress
+    self.index_interval = index_interval
+    self.index_path = get_index_path(Path(self.baseFilename))
+    # Offset of the last indexed record, read from the index on first use
+    self._last_indexed: int | None = None
+    self._index_loaded = False
+    self._file_period: tuple[int, ...] | None = None
+    if self.when is not None:
+      try:
+        self._file_period = _period(os.stat(filename).st_mtime, self.when)
+      except OSError:
+        pass
+
+  def rotation_filename(self, default_name: str) -> str:
+    """Name rotated files with a .gz suffix when compressing."""
+    return f"{default_name}.gz" if self.compress else default_name
+
+  def rotate(self, source: str, dest: str) -> None:
+    """Move the current file to its rotated name, compressing it."""
+    if not self.compress:
+      super().rotate(source, dest)
+      return
+    if not os.path.exists(source):
+      return
+    with open(source, "rb") as f_in, gzip.open(dest, "wb") as f_out:
+      shutil.copyfileobj(f_in, f_out)
+    os.remove(source)
+
+  def shouldRollover(self, record: logging.LogRecord) -> bool:
+    """Roll over on size, or on the first record of a new period."""
+    if self.when is not None:
+      period = _period(record.created, self.when)
+      if self._file_period is None:
+        self._file_period = period
+      elif period != self._file_period:
+        self._file_period = period
+        path = self.baseFilename
+        if os.path.exists(path) and os.path.getsize(path) > 0:
+          return True
+    return bool(super().shouldRollover(record))
+
+  def doRollover(self) -> None:
+    """Rotate the log and start a new index for the new file."""
+    super().doRollover()
+    try:
+      self.index_path.unlink(missing_ok=True)
+    except OSError:
+      pass
+    self._last_indexed = None
+    self._index_loaded = True
+
+  def emit(self, record: logging.LogRecord) -> None:
+    """Rotate if needed, index the record's offset and write it."""
+    try:
+      if self.shouldRollover(record):
+        self.doRollover()
+      if self.index_interval > 0:
+        self._index(record)
+      logging.FileHandler.emit(self, record)
+    except Exception:
+      self.handleError(record)
+
+  def _index(self, record: logging.LogRecord) -> None:
+    """Add an index entry if enough log was written since the last one."""
+    if self.stream is None:
+      self.stream = self._open()
+    offset = os.fstat(self.stream.fileno()).st_size
+    if not self._index_loaded:
+      entries = read_log_index(Path(self.baseFilename))
+      self._last_indexed = entries[-1][1] if entries else None
+      self._index_loaded = True
+    if self._last_indexed is not None:
+      if offset < self._last_indexed:
+        # Another process rotated the log under us
+        self._last_indexed = None
+      elif offset - self._last_indexed < self.index_interval:
+        return
+
+    append_bytes(self.index_path, f"{int(record.created)} {offset}\n".encode("ascii"))
+    self._last_indexed = offset
+
+
+# (logger, queue handler, listener) for every queued logger that is running
+_listeners: list[
+  tuple[logging.Logger, logging.Handler, logging.handlers.QueueListener]
+] = []
+_listeners_lock = threading.Lock()
+
+
+def get_logging_settings() -> dict[str, Any]:
+  """Return rotation settings from config.json, with defaults filled in."""
+  from den.config import load_config
+
+  section = load_config().section("logging")
+
+  def non_negative_int(key: str, default: int) -> int:
+    value = section.get(key, default)
+    if isinstance(value, bool) or not isinstance(value, int) or value < 0:
+      return default
+    return value
+
+  # null turns time-based rotation off; anything else unknown is a mistake
+  when = section.get("when", DEFAULT_WHEN)
+  if when is not None and when not in ROTATION_PERIODS:
+    when = DEFAULT_WHEN
+  return {
+    "max_bytes": non_negative_int("max_bytes", DEFAULT_MAX_BYTES),
+    "backup_count": non_negative_int("backup_count", DEFAULT_BACKUP_COUNT),
+    "when": when,
+  }
+
+
+def setup_queued_logger(
+  name: str,
+  log_file: Path,
+  level: int = logging.DEBUG,
+  **rotation: Any,
+) -> logging.Logger:
+  """Configure a logger that writes to a rotating file through a queue.
+
+  Calling it again for a logger that already has handlers returns the
+  logger unchanged.
+
+  Args:
+    name: Logger name, e.g. "den.brew".
+    log_file: Log file path. Its directory is created if needed.
+    level: Minimum level to log.
+    **rotation: max_bytes, backup_count, when, compress and index_interval,
+      overriding the settings from config.json.
+
+  Returns:
+    The configured logger.
+
+  Raises:
+    OSError: If the log directory cannot be created.
+  """
+  logger = logging.getLogger(name)
+  if logger.handlers:
+    return logger
+
+  logger.setLevel(level)
+  log_file.parent.mkdir(parents=True, exist_ok=True)
+
+  file_handler = CompressingRotatingFileHandler(
+    log_file, **{**get_logging_settings(), **rotation}
+  )
+  file_handler.setLevel(level)
+  file_handler.setFormatter(
+    logging.Formatter(fmt=LOG_FORMAT, datefmt=LOG_DATE_FORMAT)
+  )
+
+  log_queue: queue.SimpleQueue[logging.LogRecord] = queue.SimpleQueue()
+  listener = logging.handlers.QueueListener(
+    log_queue, file_handler, respect_handler_level=True
+  )
+  listener.start()
+  queue_handler = logging.handlers.QueueHandler(log_queue)
+  logger.addHandler(queue_handler)
+  with _listeners_lock:
+    _listeners.append((logger, queue_handler, listener))
+  return logger
+
+
+def stop_queued_logging() -> None:
+  """Write out every queued record and stop the listener threads.
+
+  The queue handlers are removed from their loggers, so setting a logger up
+  again starts a new listener.
+  """
+  with _listeners_lock:
+    listeners = list(_listeners)
+    _listeners.clear()
+  for logger, queue_handler, listener in listeners:
+    logger.removeHandler(queue_handler)
+    listener.stop()
+    for handler in listener.handlers:
+      handler.close()
+
+
+atexit.register(stop_queued_logging)
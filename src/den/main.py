@@ -1,30 +1,163 @@
 """Main entry point for the den CLI application.
 
 This module initializes the Typer application and registers all commands.
+Command groups with heavy dependencies are registered lazily so that they
+are only imported when invoked.
 """
 
+from pathlib import Path
+from typing import Any, Optional
+
 import typer
 
 from den import __version__
-from den.commands.auth import auth_app
-from den.commands.brew import brew_app
 from den.commands.hello import hello, hello_again
-from den.commands.launchctl import launchctl_app
-from den.commands.repo import repo_app
+from den.lazy_group import LazyGroupSpec, LazyTyperGroup
+
+# Context meta key holding the arguments the root group resolved its
+# subcommand from. Context meta is shared with all child contexts.
+COMMAND_ARGS_META_KEY = "den.command_args"
+
+# Context meta key holding the exit code of the invoked command, set before
+# close callbacks run.
+EXIT_CODE_META_KEY = "den.exit_code"
+
+
+class DenGroup(LazyTyperGroup):
+    """Root command group for den with lazily imported command groups."""
+
+    lazy_groups = {
+        "auth": LazyGroupSpec(
+            "den.commands.auth:auth_app",
+            "Authentication commands for external services.",
+        ),
+        "brew": LazyGroupSpec(
+            "den.commands.brew:brew_app",
+            "Homebrew management commands.",
+        ),
+        "completion": LazyGroupSpec(
+            "den.commands.completion:completion_app",
+            "Shell completion commands.",
+        ),
+        "daemon": LazyGroupSpec(
+            "den.commands.daemon:daemon_app",
+            "Resident daemon for fast command dispatch.",
+        ),
+        "launchctl": LazyGroupSpec(
+            "den.commands.launchctl:launchctl_app",
+            "LaunchAgent management commands.",
+        ),
+        "repo": LazyGroupSpec(
+            "den.commands.repo:repo_app",
+            "Repository management commands.",
+        ),
+    }
+
+    def resolve_command(self, ctx: typer.Context, args: list[str]) -> Any:
+        """Record the command line so callbacks can name the invoked command."""
+        ctx.meta[COMMAND_ARGS_META_KEY] = list(args)
+        return super().resolve_command(ctx, args)
+
+    def invoke(self, ctx: typer.Context) -> Any:
+        """Record the command's exit code so close callbacks can report it."""
+        try:
+            result = super().invoke(ctx)
+        except BaseException as e:
+            # typer.Exit and Click's usage errors carry their exit code
+            exit_code = getattr(e, "exit_code", None)
+            if not isinstance(exit_code, int):
+                exit_code = 1
+            ctx.meta[EXIT_CODE_META_KEY] = exit_code
+            raise
+        ctx.meta[EXIT_CODE_META_KEY] = 0
+        return result
+
 
 app = typer.Typer(
     name="den",
     help="A CLI utility for local machine automations.",
     add_completion=False,
+    cls=DenGroup,
 )
 
 # Register commands
 app.command()(hello)
 app.command(name="hello-again")(hello_again)
-app.add_typer(auth_app, name="auth")
-app.add_typer(brew_app, name="brew")
-app.add_typer(launchctl_app, name="launchctl")
-app.add_typer(repo_app, name="repo")
+
+
+def invoked_command_name(ctx: typer.Context) -> str:
+    """Return the full name of the command being invoked.
+
+    Args:
+      ctx: The root command context.
+
+    Returns:
+      Space-separated subcommand names, e.g. "brew upgrade".
+    """
+    names: list[str] = []
+    command: Any = ctx.command
+    for token in ctx.meta.get(COMMAND_ARGS_META_KEY, []):
+        if token.startswith("-") or not hasattr(command, "list_commands"):
+            break
+        command = command.get_command(ctx, token)
+        if command is None:
+            break
+        names.append(token)
+    return " ".join(names)
+
+
+def _write_profile(session: Any) -> None:
+    """Stop a profile session and report where its files were written."""
+    try:
+        paths = session.stop()
+    except OSError as e:
+        typer.echo(f"Warning: Failed to write profile - {e}", err=True)
+        return
+    for path in paths:
+        typer.echo(f"Profile written to {path}", err=True)
+
+
+def _finish_tracing(
+    ctx: typer.Context,
+    command_name: str,
+    root_span: Any,
+    trace_path: Optional[Path],
+    metrics_dir: Optional[Path],
+) -> None:
+    """End tracing, then write the trace file and metrics as requested."""
+    from den.tracing import stop_tracing
+
+    root_span.end()
+    tracer = stop_tracing()
+    if tracer is None:
+        return
+
+    if trace_path is not None:
+        try:
+            tracer.write(trace_path)
+            typer.echo(f"Trace written to {trace_path}", err=True)
+        except OSError as e:
+            typer.echo(f"Warning: Failed to write trace - {e}", err=True)
+
+    if metrics_dir is not None:
+        from den.metrics import (
+            stop_metrics,
+            write_command_metrics,
+            write_launchagent_metrics,
+        )
+
+        try:
+            write_command_metrics(
+                metrics_dir,
+                command_name,
+                ctx.meta.get(EXIT_CODE_META_KEY, 0),
+                root_span.duration_ns / 1e9,
+                [span for span in tracer.spans if span is not root_span],
+                stop_metrics(),
+            )
+            write_launchagent_metrics(metrics_dir)
+        except OSError as e:
+            typer.echo(f"Warning: Failed to write metrics - {e}", err=True)
 
 
 def version_callback(value: bool) -> None:
@@ -40,6 +173,7 @@ def version_callback(value: bool) -> None:
 
 @app.callback()
 def main(
+    ctx: typer.Context,
     version: bool = typer.Option(
         False,
         "--version",
@@ -48,6 +182,55 @@ def main(
         callback=version_callback,
         is_eager=True,
     ),
+    profile: bool = typer.Option(
+        False,
+        "--profile",
+        envvar="DEN_PROFILE",
+        help="Profile the command and write a .pstats report to "
+        "~/.config/den/profiles/.",
+    ),
+    profile_memory: bool = typer.Option(
+        False,
+        "--profile-memory",
+        envvar="DEN_PROFILE_MEMORY",
+        help="Also trace memory allocations (implies --profile).",
+    ),
+    trace: Optional[Path] = typer.Option(
+        None,
+        "--trace",
+        envvar="DEN_TRACE",
+        help="Write a Chrome trace-event JSON file of the command's steps, "
+        "subprocesses and HTTP calls.",
+        dir_okay=False,
+    ),
 ) -> None:
     """den - A CLI utility for local machine automations."""
-    pass
+    if profile or profile_memory:
+        from den.profiling import ProfileSession
+
+        session = ProfileSession(invoked_command_name(ctx), memory=profile_memory)
+        session.start()
+        ctx.call_on_close(lambda: _write_profile(session))
+
+    command_name = invoked_command_name(ctx)
+    metrics_dir = None
+    if command_name:
+        from den.metrics import get_metrics_dir
+
+        metrics_dir = get_metrics_dir()
+
+    if trace is not None or metrics_dir is not None:
+        from den.tracing import start_tracing
+
+        root_span = start_tracing().start_span(
+            f"den {command_name}".strip(), "command"
+        )
+        if metrics_dir is not None:
+            from den.metrics import start_metrics
+
+            start_metrics()
+        ctx.call_on_close(
+            lambda: _finish_tracing(
+                ctx, command_name, root_span, trace, metrics_dir
+            )
+        )
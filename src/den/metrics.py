@@ -0,0 +1,265 @@
+"""Prometheus textfile-collector metrics for den runs.
+
+When a metrics directory is configured, den writes a `.prom` file into it
+after each command for node_exporter's textfile collector to pick up. The
+directory is set with the DEN_METRICS_DIR environment variable or in
+~/.config/den/config.json:
+
+  {"metrics": {"textfile_dir": "/usr/local/var/node_exporter/textfile"}}
+
+Each command writes its own file (e.g. den_brew_upgrade.prom), replaced
+atomically so the collector never reads a partial file. Metrics are built
+from the spans recorded by den.tracing (steps, subprocesses and HTTP calls)
+plus gauges that commands set with set_gauge().
+"""
+
+import os
+import re
+import time
+from collections.abc import Iterable
+from pathlib import Path
+
+from den.file_utils import atomic_write_text
+from den.tracing import Span
+
+METRICS_DIR_ENV = "DEN_METRICS_DIR"
+
+# Gauge that keeps its previous value when a run fails
+LAST_SUCCESS_METRIC = "den_command_last_success_timestamp_seconds"
+
+_HELP = {
+  "den_command_duration_seconds": "Wall time of the den command.",
+  "den_command_exit_code": "Exit code of the den command.",
+  "den_command_last_run_timestamp_seconds": "Unix time the command last ran.",
+  LAST_SUCCESS_METRIC: "Unix time the command last exited with code 0.",
+  "den_step_duration_seconds": "Wall time of a command step.",
+  "den_subprocess_duration_seconds": "Wall time of a subprocess.",
+  "den_subprocess_exit_code": "Exit code of a subprocess.",
+  "den_http_request_duration_seconds": "Latency of an HTTP request.",
+  "den_http_request_status_code": "HTTP status code of a request, 0 on error.",
+  "den_launchagents_managed": "Number of LaunchAgents in the configured domain.",
+}
+
+LabelSet = tuple[tuple[str, str], ...]
+
+
+def get_metrics_dir() -> Path | None:
+  """Return the configured textfile directory, or None if metrics are off.
+
+  DEN_METRICS_DIR takes precedence over metrics.textfile_dir in config.json.
+  """
+  env_dir = os.environ.get(METRICS_DIR_ENV)
+  if env_dir:
+    return Path(env_dir).expanduser()
+
+  from den.config import load_config
+
+  configured = load_config().section("metrics").get("textfile_dir")
+  if isinstance(configured, str) and configured:
+    return Path(configured).expanduser()
+  return None
+
+
+class MetricsCollector:
+  """Collects gauge samples for one command run."""
+
+  def __init__(self) -> None:
+    self.samples: dict[str, dict[LabelSet, float]] = {}
+    self.help: dict[str, str] = dict(_HELP)
+
+  def set(
+    self, name: str, value: float, help_text: str | None = None, **labels: str
+  ) -> None:
+    """Set a gauge sample, replacing any sample with the same labels."""
+    if help_text:
+      self.help[name] = help_text
+    key = tuple(sorted((k, str(v)) for k, v in labels.items()))
+    self.samples.setdefault(name, {})[key] = float(value)
+
+  def add_spans(self, command: str, spans: Iterable[Span]) -> None:
+    """Add step, subprocess and HTTP metrics from finished spans."""
+    for span in spans:
+      seconds = span.duration_ns / 1e9
+      if span.category == "step":
+        self.set(
+          "den_step_duration_seconds", seconds, command=command, step=span.name
+        )
+      elif span.category == "subprocess":
+        exit_code = span.attributes.get("exit_code")
+        self.set(
+          "den_subprocess_duration_seconds",
+          seconds,
+          command=command,
+          subprocess=span.name,
+        )
+        if isinstance(exit_code, int):
+          self.set(
+            "den_subprocess_exit_code",
+            exit_code,
+            command=command,
+            subprocess=span.name,
+          )
+      elif span.category == "http":
+        status_code = span.attributes.get("status_code")
+        labels = {
+          "command": command,
+          "service": str(span.attributes.get("service", "")),
+          "endpoint": span.name,
+        }
+        self.set("den_http_request_duration_seconds", seconds, **labels)
+        self.set(
+          "den_http_request_status_code",
+          status_code if isinstance(status_code, int) else 0,
+          **labels,
+        )
+
+  def render(self) -> str:
+    """Return the samples in the Prometheus text exposition format."""
+    lines = []
+    for name in sorted(self.samples):
+      if name in self.help:
+        lines.append(f"# HELP {name} {self.help[name]}")
+      lines.append(f"# TYPE {name} gauge")
+      for labels, value in sorted(self.samples[name].items()):
+        lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+    return "\n".join(lines) + "\n"
+
+
+def _format_labels(labels: LabelSet) -> str:
+  """Format a label set as {key="value",...}, escaping values."""
+  if not labels:
+    return ""
+  parts = []
+  for key, value in labels:
+    escaped = value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+    parts.append(f'{key}="{escaped}"')
+  return "{" + ",".join(parts) + "}"
+
+
+def _format_value(value: float) -> str:
+  """Format a sample value, dropping a trailing .0 from whole numbers."""
+  return str(int(value)) if value.is_integer() else repr(value)
+
+
+def write_textfile(path: Path, content: str) -> None:
+  """Atomically replace a .prom file.
+
+  The collector sees either the old or the new file, never a partial one.
+
+  Raises:
+    OSError: If the file cannot be written.
+  """
+  atomic_write_text(path, content)
+
+
+def _previous_value(path: Path, name: str) -> float | None:
+  """Return the value of a metric in an existing .prom file, if present."""
+  try:
+    content = path.read_text(encoding="utf-8")
+  except OSError:
+    return None
+  match = re.search(rf"^{re.escape(name)}(?:{{[^}}]*}})? (\S+)$", content, re.M)
+  if match is None:
+    return None
+  try:
+    return float(match.group(1))
+  except ValueError:
+    return None
+
+
+def metrics_filename(command: str) -> str:
+  """Return the .prom filename for a command, e.g. den_brew_upgrade.prom."""
+  slug = re.sub(r"[^a-z0-9]+", "_", command.lower()).strip("_")
+  return f"den_{slug}.prom" if slug else "den.prom"
+
+
+def write_command_metrics(
+  metrics_dir: Path,
+  command: str,
+  exit_code: int,
+  duration_s: float,
+  spans: Iterable[Span] = (),
+  collector: "MetricsCollector | None" = None,
+) -> Path:
+  """Write the metrics file for a finished command.
+
+  Args:
+    metrics_dir: Textfile collector directory.
+    command: Full command name, e.g. "brew upgrade".
+    exit_code: Exit code of the command.
+    duration_s: Wall time of the command in seconds.
+    spans: Finished spans recorded during the command.
+    collector: Collector holding gauges set by the command.
+
+  Returns:
+    Path of the written file.
+
+  Raises:
+    OSError: If the file cannot be written.
+  """
+  collector = collector or MetricsCollector()
+  path = metrics_dir / metrics_filename(command)
+  now = time.time()
+
+  collector.set("den_command_duration_seconds", duration_s, command=command)
+  collector.set("den_command_exit_code", exit_code, command=command)
+  collector.set("den_command_last_run_timestamp_seconds", now, command=command)
+  if exit_code == 0:
+    last_success: float | None = now
+  else:
+    last_success = _previous_value(path, LAST_SUCCESS_METRIC)
+  if last_success is not None:
+    collector.set(LAST_SUCCESS_METRIC, last_success, command=command)
+  collector.add_spans(command, spans)
+
+  write_textfile(path, collector.render())
+  return path
+
+
+def write_launchagent_metrics(metrics_dir: Path) -> Path:
+  """Write the number of managed LaunchAgents to den_launchagents.prom.
+
+  Raises:
+    OSError: If the file cannot be written.
+  """
+  from den.launchctl_config import get_domain
+  from den.plist_scanner import scan_domain_agents
+
+  domain = get_domain()
+  collector = MetricsCollector()
+  collector.set(
+    "den_launchagents_managed", len(scan_domain_agents(domain)), domain=domain
+  )
+  path = metrics_dir / "den_launchagents.prom"
+  write_textfile(path, collector.render())
+  return path
+
+
+_active_collector: MetricsCollector | None = None
+
+
+def start_metrics() -> MetricsCollector:
+  """Enable gauge collection for the process and return the collector."""
+  global _active_collector
+  _active_collector = MetricsCollector()
+  return _active_collector
+
+
+def stop_metrics() -> MetricsCollector | None:
+  """Disable gauge collection and return the collector that was active."""
+  global _active_collector
+  collector, _active_collector = _active_collector, None
+  return collector
+
+
+def set_gauge(name: str, value: float, help_text: str, **labels: str) -> None:
+  """Set a gauge for the current command. Does nothing if metrics are off.
+
+  Args:
+    name: Metric name, e.g. "den_brewfile_changed".
+    value: Gauge value.
+    help_text: HELP text for the metric.
+    **labels: Label values.
+  """
+  if _active_collector is not None:
+    _active_collector.set(name, value, help_text, **labels)
@@ -0,0 +1,120 @@
+"""Concurrent execution of a small graph of dependent stages.
+
+A Pipeline runs named stages on worker threads. Each stage starts as soon as
+every stage it runs after has finished, so independent stages overlap and
+the total wall time approaches the longest chain of dependencies (the
+critical path) rather than the sum of all stages.
+
+Stages must be added after the stages they depend on, which keeps the graph
+acyclic. Stages communicate through shared state owned by the caller; a
+stage only reads what its dependencies wrote, and the executor's futures
+order those reads after the writes.
+
+If a stage raises, the stages that depend on it, directly or through other
+stages, are cancelled. Stages that don't depend on it still run, and stages
+that are already running are left to finish, since interrupting a
+subprocess such as `brew upgrade` halfway could leave the system in a worse
+state. Once nothing is left to run, the first exception is re-raised from
+run().
+"""
+
+from collections.abc import Callable, Iterable
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from typing import Any
+
+
+class PipelineError(Exception):
+  """Raised when a stage is added with an invalid name or dependency."""
+
+
+@dataclass(frozen=True)
+class Stage:
+  """A named unit of work in a pipeline.
+
+  Attributes:
+    name: Unique stage name.
+    func: Called with no arguments on a worker thread.
+    after: Names of the stages that must finish first.
+  """
+
+  name: str
+  func: Callable[[], Any]
+  after: tuple[str, ...] = ()
+
+
+class Pipeline:
+  """Runs stages concurrently in dependency order.
+
+  Attributes:
+    stages: The stages in the order they were added.
+    cancelled: Names of the stages that never started because a stage they
+      depend on failed, after run() returns or raises.
+  """
+
+  def __init__(self, max_workers: int | None = None):
+    self.stages: dict[str, Stage] = {}
+    self.cancelled: list[str] = []
+    self._max_workers = max_workers
+
+  def add(
+    self, name: str, func: Callable[[], Any], after: Iterable[str] = ()
+  ) -> None:
+    """Add a stage that runs once the stages in `after` have finished.
+
+    Raises:
+      PipelineError: If the name is taken or a dependency isn't added yet.
+    """
+    if name in self.stages:
+      raise PipelineError(f"Stage '{name}' is already defined")
+    after = tuple(after)
+    for dependency in after:
+      if dependency not in self.stages:
+        raise PipelineError(f"Stage '{name}' runs after unknown stage '{dependency}'")
+    self.stages[name] = Stage(name, func, after)
+
+  def run(self) -> dict[str, Any]:
+    """Run every stage and return their results by name.
+
+    Raises:
+      BaseException: The first exception raised by a stage, once every
+        stage that doesn't depend on a failed stage has finished.
+    """
+    results: dict[str, Any] = {}
+    pending = dict(self.stages)
+    running: dict[Future[Any], str] = {}
+    failed: set[str] = set()
+    failure: BaseException | None = None
+    self.cancelled = []
+
+    with ThreadPoolExecutor(
+      max_workers=self._max_workers or max(len(self.stages), 1),
+      thread_name_prefix="den-stage",
+    ) as executor:
+      while True:
+        # Stages are added after their dependencies, so one pass in order
+        # cancels everything downstream of a failure
+        for name, stage in list(pending.items()):
+          if any(dependency in failed for dependency in stage.after):
+            del pending[name]
+            failed.add(name)
+            self.cancelled.append(name)
+          elif all(dependency in results for dependency in stage.after):
+            del pending[name]
+            running[executor.submit(stage.func)] = name
+        if not running:
+          break
+
+        finished, _ = wait(running, return_when=FIRST_COMPLETED)
+        for future in finished:
+          name = running.pop(future)
+          try:
+            results[name] = future.result()
+          except BaseException as e:
+            failed.add(name)
+            if failure is None:
+              failure = e
+
+    if failure is not None:
+      raise failure
+    return results
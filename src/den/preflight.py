@@ -0,0 +1,244 @@
+"""Credential preflight checks for brew upgrade.
+
+`den brew upgrade` needs a GitHub token to back up the Brewfile and, with
+the default formatter, an Anthropic API key. The preflight checks that both
+are valid while `brew upgrade` runs, so a revoked token is reported before
+the Brewfile is formatted instead of after a full API round trip.
+
+  GitHub    - GET /user, which costs nothing against the gist rate limit.
+              Classic tokens must have the "gist" scope (X-OAuth-Scopes);
+              fine-grained tokens don't report scopes and only need to
+              authenticate.
+  Anthropic - GET /v1/models?limit=1, which authenticates the key without
+              spending tokens.
+
+Results are cached in state.json under the "preflight" key, keyed by a hash
+of the credential (never the credential itself), for a TTL set in
+~/.config/den/config.json:
+
+  {"preflight": {"ttl_seconds": 3600}}
+
+A TTL of 0 disables the cache. Network errors and unexpected responses
+leave a credential unverified rather than invalid, and are not cached, so a
+flaky connection never blocks a backup.
+"""
+
+import threading
+import time
+from collections.abc import Callable, Iterable
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
+
+import httpx
+
+from den.config import load_config
+from den.gist_client import GITHUB_API_BASE
+from den.hash_utils import compute_hash
+from den.state_storage import get_state_store
+from den.tracing import span
+
+ANTHROPIC_API_BASE = "https://api.anthropic.com"
+
+# State key the cached results are stored under
+STATE_KEY = "preflight"
+
+DEFAULT_TTL_SECONDS = 3600.0
+
+# Preflight requests are cheap; don't let a slow network hold up the run
+REQUEST_TIMEOUT_SECONDS = 10.0
+
+
+@dataclass(frozen=True)
+class CredentialCheck:
+  """Result of checking one credential.
+
+  Attributes:
+    key: Credential key in auth.json, e.g. "github_token".
+    valid: True if the credential works, False if it was rejected, None if
+      it could not be verified.
+    message: Human-readable description of the result.
+    cached: Whether the result came from the state cache.
+  """
+
+  key: str
+  valid: bool | None
+  message: str
+  cached: bool = False
+
+
+def get_preflight_ttl() -> float:
+  """Return how long check results are cached, in seconds."""
+  section = load_config().section("preflight")
+  ttl = section.get("ttl_seconds", DEFAULT_TTL_SECONDS)
+  if isinstance(ttl, bool) or not isinstance(ttl, int | float) or ttl < 0:
+    return DEFAULT_TTL_SECONDS
+  return float(ttl)
+
+
+def check_github_token(token: str) -> CredentialCheck:
+  """Check that a GitHub token authenticates and may create Gists."""
+  key = "github_token"
+  headers = {
+    "Authorization": f"Bearer {token}",
+    "Accept": "application/vnd.github+json",
+    "X-GitHub-Api-Version": "2022-11-28",
+  }
+  try:
+    with httpx.Client() as client, span(
+      "GET /user", "http", service="github"
+    ) as s:
+      response = client.get(
+        f"{GITHUB_API_BASE}/user",
+        headers=headers,
+        timeout=REQUEST_TIMEOUT_SECONDS,
+      )
+      s.set_attribute("status_code", response.status_code)
+  except httpx.RequestError as e:
+    return CredentialCheck(key, None, f"Could not verify GitHub token: {e}")
+
+  if response.status_code == 401:
+    return CredentialCheck(key, False, "GitHub token is invalid or revoked")
+  if response.status_code != 200:
+    return CredentialCheck(
+      key, None, f"Could not verify GitHub token: HTTP {response.status_code}"
+    )
+
+  scopes_header = response.headers.get("X-OAuth-Scopes")
+  if scopes_header is not None:
+    scopes = {scope.strip() for scope in scopes_header.split(",")}
+    if "gist" not in scopes:
+      return CredentialCheck(
+        key, False, "GitHub token is missing the 'gist' scope"
+      )
+  return CredentialCheck(key, True, "GitHub token is valid")
+
+
+def check_anthropic_key(api_key: str) -> CredentialCheck:
+  """Check that an Anthropic API key authenticates."""
+  key = "anthropic_api_key"
+  headers = {"x-api-key": api_key, "anthropic-version": "2023-06-01"}
+  try:
+    with httpx.Client() as client, span(
+      "GET /v1/models", "http", service="anthropic"
+    ) as s:
+      response = client.get(
+        f"{ANTHROPIC_API_BASE}/v1/models",
+        params={"limit": 1},
+        headers=headers,
+        timeout=REQUEST_TIMEOUT_SECONDS,
+      )
+      s.set_attribute("status_code", response.status_code)
+  except httpx.RequestError as e:
+    return CredentialCheck(key, None, f"Could not verify Anthropic API key: {e}")
+
+  if response.status_code in (401, 403):
+    return CredentialCheck(key, False, "Anthropic API key is invalid or revoked")
+  if response.status_code != 200:
+    return CredentialCheck(
+      key,
+      None,
+      f"Could not verify Anthropic API key: HTTP {response.status_code}",
+    )
+  return CredentialCheck(key, True, "Anthropic API key is valid")
+
+
+# Validity check for each credential key
+CREDENTIAL_CHECKS: dict[str, Callable[[str], CredentialCheck]] = {
+  "github_token": check_github_token,
+  "anthropic_api_key": check_anthropic_key,
+}
+
+
+def check_credential(key: str, value: str) -> CredentialCheck:
+  """Check a credential with the check registered for its key."""
+  check = CREDENTIAL_CHECKS.get(key)
+  if check is None:
+    return CredentialCheck(key, None, f"No preflight check for {key}")
+  return check(value)
+
+
+def verify_credentials(
+  credentials: dict[str, str], keys: Iterable[str]
+) -> dict[str, CredentialCheck]:
+  """Check credentials concurrently, using cached results within the TTL.
+
+  Args:
+    credentials: Credentials from auth.json.
+    keys: Credential keys to check. Keys missing from credentials are
+      skipped; the caller reports those without a network call.
+
+  Returns:
+    Result for each checked key.
+  """
+  ttl = get_preflight_ttl()
+  now = time.time()
+  store = get_state_store()
+  cache = (store.get(STATE_KEY) or {}) if ttl else {}
+
+  results: dict[str, CredentialCheck] = {}
+  pending: dict[str, str] = {}
+  for key in keys:
+    value = credentials.get(key)
+    if not value:
+      continue
+    fingerprint = compute_hash(value)
+    entry = cache.get(key)
+    if (
+      isinstance(entry, dict)
+      and entry.get("fingerprint") == fingerprint
+      and now - entry.get("checked_at", 0) < ttl
+    ):
+      results[key] = CredentialCheck(
+        key, entry.get("valid"), entry.get("message", ""), cached=True
+      )
+    else:
+      pending[key] = value
+
+  if pending:
+    with ThreadPoolExecutor(max_workers=len(pending)) as executor:
+      futures = {
+        key: executor.submit(check_credential, key, value)
+        for key, value in pending.items()
+      }
+    fresh = {key: future.result() for key, future in futures.items()}
+    results.update(fresh)
+
+    cacheable = {
+      key: check for key, check in fresh.items() if check.valid is not None
+    }
+    if ttl and cacheable:
+      with store.transaction() as state:
+        entries = state.setdefault(STATE_KEY, {})
+        for key, check in cacheable.items():
+          entries[key] = {
+            "fingerprint": compute_hash(pending[key]),
+            "checked_at": now,
+            "valid": check.valid,
+            "message": check.message,
+          }
+  return results
+
+
+def start_preflight(
+  credentials: dict[str, str], keys: Iterable[str]
+) -> Future[dict[str, CredentialCheck]]:
+  """Run verify_credentials() in a background thread.
+
+  The thread is a daemon, so a command that fails before it needs the
+  result doesn't wait for the checks to finish before exiting.
+
+  Returns:
+    A future for the results. Exceptions (such as a failed cache write)
+    are raised from its result().
+  """
+  keys = list(keys)
+  future: Future[dict[str, CredentialCheck]] = Future()
+
+  def run() -> None:
+    try:
+      future.set_result(verify_credentials(credentials, keys))
+    except BaseException as e:
+      future.set_exception(e)
+
+  threading.Thread(target=run, name="den-preflight", daemon=True).start()
+  return future
@@ -0,0 +1,149 @@
+"""Command profiling with cProfile and tracemalloc.
+
+This module wraps a den command in cProfile and, optionally, tracemalloc,
+and writes the results to ~/.config/den/profiles/. Each report is named
+after the command and the time it started, e.g.
+brew-upgrade-20250115-103045.pstats.
+
+Commands such as `den brew upgrade` run their stages on worker threads. From
+Python 3.12 cProfile records every thread; on older versions each thread
+started while profiling gets its own profiler, and their stats are merged
+into the report.
+"""
+
+import cProfile
+import pstats
+import sys
+import threading
+import tracemalloc
+from datetime import datetime
+from pathlib import Path
+
+# Number of allocation sites listed in the memory report
+DEFAULT_TOP_ALLOCATIONS = 25
+
+# Whether cProfile sees calls on threads other than the one that enabled it
+PROFILES_ALL_THREADS = sys.version_info >= (3, 12)
+
+
+def get_profiles_dir() -> Path:
+  """Return the directory profile reports are written to.
+
+  Returns:
+    Path to ~/.config/den/profiles/
+  """
+  return Path.home() / ".config" / "den" / "profiles"
+
+
+class ProfileSession:
+  """Profiles one command invocation.
+
+  Attributes:
+    command_name: Name of the profiled command, e.g. "brew upgrade".
+    memory: Whether allocations are traced with tracemalloc.
+    top_allocations: Number of allocation sites in the memory report.
+  """
+
+  def __init__(
+    self,
+    command_name: str,
+    memory: bool = False,
+    top_allocations: int = DEFAULT_TOP_ALLOCATIONS,
+  ):
+    self.command_name = command_name
+    self.memory = memory
+    self.top_allocations = top_allocations
+    self._profiler = cProfile.Profile()
+    self._thread_profilers: list[tuple[threading.Thread, cProfile.Profile]] = []
+    self._lock = threading.Lock()
+    self._started_at = datetime.now()
+
+  def start(self) -> None:
+    """Start collecting CPU and, if enabled, memory data."""
+    self._started_at = datetime.now()
+    if self.memory:
+      tracemalloc.start()
+    if not PROFILES_ALL_THREADS:
+      threading.setprofile(self._profile_thread)
+    self._profiler.enable()
+
+  def _profile_thread(self, frame: object, event: str, arg: object) -> None:
+    """Start a profiler for a thread on its first profiling event."""
+    profiler = cProfile.Profile()
+    with self._lock:
+      self._thread_profilers.append((threading.current_thread(), profiler))
+    profiler.enable()
+
+  def stop(self) -> list[Path]:
+    """Stop profiling and write the reports.
+
+    Returns:
+      Paths of the written report files.
+
+    Raises:
+      OSError: If the profiles directory or a report cannot be written.
+    """
+    self._profiler.disable()
+    if not PROFILES_ALL_THREADS:
+      threading.setprofile(None)
+
+    snapshot = None
+    traced = (0, 0)
+    if self.memory:
+      snapshot = tracemalloc.take_snapshot()
+      traced = tracemalloc.get_traced_memory()
+      tracemalloc.stop()
+
+    profiles_dir = get_profiles_dir()
+    profiles_dir.mkdir(parents=True, exist_ok=True)
+    slug = "-".join(self.command_name.split()) or "den"
+    base = f"{slug}-{self._started_at:%Y%m%d-%H%M%S}"
+
+    stats_path = profiles_dir / f"{base}.pstats"
+    self._collect_stats().dump_stats(stats_path)
+    written = [stats_path]
+
+    if snapshot is not None:
+      memory_path = profiles_dir / f"{base}.allocations.txt"
+      memory_path.write_text(
+        self._format_allocations(snapshot, traced), encoding="utf-8"
+      )
+      written.append(memory_path)
+
+    return written
+
+  def _collect_stats(self) -> pstats.Stats:
+    """Merge the stats of the main profiler and of finished threads.
+
+    Threads that are still running are left out, since their profiler
+    can't be read safely from another thread.
+    """
+    stats = pstats.Stats(self._profiler)
+    with self._lock:
+      finished = [p for thread, p in self._thread_profilers if not thread.is_alive()]
+    for profiler in finished:
+      profiler.create_stats()
+      if profiler.stats:
+        stats.add(profiler)
+    return stats
+
+  def _format_allocations(
+    self, snapshot: tracemalloc.Snapshot, traced: tuple[int, int]
+  ) -> str:
+    """Format the top allocation sites of a snapshot as text."""
+    current, peak = traced
+    lines = [
+      f"Command: den {self.command_name}",
+      f"Started: {self._started_at:%Y-%m-%d %H:%M:%S}",
+      f"Traced memory: current {current / 1024:.1f} KiB, peak {peak / 1024:.1f} KiB",
+      "",
+      f"Top {self.top_allocations} allocation sites:",
+    ]
+    stats = snapshot.statistics("lineno")[: self.top_allocations]
+    for index, stat in enumerate(stats, 1):
+      frame = stat.traceback[0]
+      lines.append(
+        f"{index:>3}. {frame.filename}:{frame.lineno}: "
+        f"{stat.size / 1024:.1f} KiB in {stat.count} blocks"
+      )
+    return "\n".join(lines) + "\n"
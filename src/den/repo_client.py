@@ -5,6 +5,8 @@ This module handles creating and checking GitHub repositories using the GitHub A
 
 import httpx
 
+from den.tracing import span
+
 GITHUB_API_BASE = "https://api.github.com"
 
 
@@ -35,12 +37,15 @@ def repo_exists(org: str, name: str, token: str) -> bool:
     }
 
     try:
-        with httpx.Client() as client:
+        with httpx.Client() as client, span(
+            "GET /repos/{org}/{name}", "http", service="github"
+        ) as s:
             response = client.get(
                 f"{GITHUB_API_BASE}/repos/{org}/{name}",
                 headers=headers,
                 timeout=30.0,
             )
+            s.set_attribute("status_code", response.status_code)
             if response.status_code == 200:
                 return True
             if response.status_code == 404:
@@ -81,13 +86,16 @@ def create_repo(org: str, name: str, token: str) -> str:
     }
 
     try:
-        with httpx.Client() as client:
+        with httpx.Client() as client, span(
+            "POST /orgs/{org}/repos", "http", service="github"
+        ) as s:
             response = client.post(
                 f"{GITHUB_API_BASE}/orgs/{org}/repos",
                 headers=headers,
                 json=payload,
                 timeout=30.0,
             )
+            s.set_attribute("status_code", response.status_code)
             response.raise_for_status()
             data = response.json()
             return data["clone_url"]
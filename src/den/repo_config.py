@@ -1,21 +1,13 @@
 """Repo configuration module for reading organization settings.
 
 This module handles reading the default organization configuration from the config.json file
-at ~/.config/den/config.json for use in repository creation.
+at ~/.config/den/config.json for use in repository creation. Parsing and caching
+are handled by den.config.
 """
 
-import json
-from pathlib import Path
 from typing import Optional
 
-
-def get_config_file_path() -> Path:
-    """Return the path to the config.json file.
-
-    Returns:
-      Path to ~/.config/den/config.json
-    """
-    return Path.home() / ".config" / "den" / "config.json"
+from den.config import get_config_file_path, load_config
 
 
 def get_default_org() -> Optional[str]:
@@ -28,21 +20,6 @@ def get_default_org() -> Optional[str]:
     Returns:
       The configured organization string, or None if not configured.
     """
-    config_file = get_config_file_path()
-
-    if not config_file.exists():
-        return None
-
-    try:
-        with config_file.open("r", encoding="utf-8") as f:
-            content = f.read()
-            if not content.strip():
-                return None
-            config = json.loads(content)
-    except (json.JSONDecodeError, OSError):
-        return None
-
-    repo_config = config.get("repo", {})
-    if not isinstance(repo_config, dict):
-        return None
-    return repo_config.get("default_org")
+    section = load_config(get_config_file_path()).section("repo")
+    default_org = section.get("default_org")
+    return default_org if isinstance(default_org, str) else None
@@ -0,0 +1,198 @@
+"""SQLite backend for den state.
+
+This module stores the same feature-keyed state as state.json in a SQLite
+database at ~/.config/den/state.db, opened in WAL mode. Each feature key is
+a row in the indexed `state` table, and transactions only write the rows
+they changed, so concurrent den runs that update different features never
+overwrite each other. Read-modify-write transactions take SQLite's write
+lock up front (BEGIN IMMEDIATE), so updates to the same feature are
+serialized instead of lost.
+
+The backend is selected in ~/.config/den/config.json:
+
+  {"state": {"backend": "sqlite"}}
+
+On first use the existing state.json is imported into the database. The
+JSON file is left in place as a backup but is no longer updated.
+"""
+
+import copy
+import json
+import sqlite3
+import threading
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any
+
+# Seconds to wait for another process's write lock before failing
+BUSY_TIMEOUT_SECONDS = 30.0
+
+# Schema migrations, applied in order. PRAGMA user_version records how many
+# have been applied.
+MIGRATIONS: list[str] = [
+  """
+  CREATE TABLE IF NOT EXISTS state (
+    feature TEXT PRIMARY KEY,
+    data TEXT NOT NULL,
+    updated_at REAL NOT NULL
+  ) WITHOUT ROWID
+  """,
+]
+
+
+class StateDatabaseError(OSError):
+  """Raised when the state database cannot be read or written.
+
+  Subclasses OSError so callers handle it like a failed state.json write.
+  """
+
+
+@contextmanager
+def _database_errors() -> Iterator[None]:
+  """Re-raise sqlite3 errors as StateDatabaseError."""
+  try:
+    yield
+  except sqlite3.Error as e:
+    raise StateDatabaseError(f"State database error: {e}") from e
+
+
+class SqliteStateStore:
+  """Feature-keyed state in a SQLite database.
+
+  Provides the same load(), get() and transaction() interface as
+  den.state_storage.StateStore.
+
+  Attributes:
+    path: The database file.
+    json_path: state.json to import on first use, or None.
+  """
+
+  def __init__(self, path: Path, json_path: Path | None = None):
+    self.path = path
+    self.json_path = json_path
+    self._conn: sqlite3.Connection | None = None
+    self._lock = threading.RLock()
+
+  def _connection(self) -> sqlite3.Connection:
+    """Open the database on first use and bring its schema up to date."""
+    if self._conn is None:
+      self.path.parent.mkdir(parents=True, exist_ok=True)
+      conn = sqlite3.connect(
+        self.path,
+        timeout=BUSY_TIMEOUT_SECONDS,
+        isolation_level=None,
+        check_same_thread=False,
+      )
+      conn.execute("PRAGMA journal_mode=WAL")
+      conn.execute("PRAGMA synchronous=NORMAL")
+      self._migrate(conn)
+      self._conn = conn
+    return self._conn
+
+  def _migrate(self, conn: sqlite3.Connection) -> None:
+    """Apply pending schema migrations and import state.json if needed."""
+    if conn.execute("PRAGMA user_version").fetchone()[0] >= len(MIGRATIONS):
+      return
+
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+      # Another process may have migrated while we waited for the lock
+      version = conn.execute("PRAGMA user_version").fetchone()[0]
+      for statement in MIGRATIONS[version:]:
+        conn.execute(statement)
+      if version == 0:
+        self._import_json(conn)
+      conn.execute(f"PRAGMA user_version = {len(MIGRATIONS)}")
+      conn.execute("COMMIT")
+    except BaseException:
+      conn.execute("ROLLBACK")
+      raise
+
+  def _import_json(self, conn: sqlite3.Connection) -> None:
+    """Copy every feature key from state.json into the state table."""
+    if self.json_path is None:
+      return
+    try:
+      with self.json_path.open("r", encoding="utf-8") as f:
+        data = json.load(f)
+    except (OSError, json.JSONDecodeError):
+      return
+    if not isinstance(data, dict):
+      return
+    now = time.time()
+    conn.executemany(
+      "INSERT OR REPLACE INTO state (feature, data, updated_at) VALUES (?, ?, ?)",
+      [(key, json.dumps(value), now) for key, value in data.items()],
+    )
+
+  def close(self) -> None:
+    """Close the database connection."""
+    with self._lock:
+      if self._conn is not None:
+        self._conn.close()
+        self._conn = None
+
+  @staticmethod
+  def _read_all(conn: sqlite3.Connection) -> dict[str, Any]:
+    """Return every feature key and its decoded value."""
+    rows = conn.execute("SELECT feature, data FROM state").fetchall()
+    return {feature: json.loads(data) for feature, data in rows}
+
+  def load(self) -> dict[str, Any]:
+    """Return the whole state."""
+    with self._lock, _database_errors():
+      return self._read_all(self._connection())
+
+  def get(self, key: str, default: Any = None) -> Any:
+    """Return the state stored under a feature key."""
+    with self._lock, _database_errors():
+      row = (
+        self._connection()
+        .execute("SELECT data FROM state WHERE feature = ?", (key,))
+        .fetchone()
+      )
+    return json.loads(row[0]) if row is not None else default
+
+  @contextmanager
+  def transaction(self) -> Iterator[dict[str, Any]]:
+    """Update the state and commit only the feature keys that changed.
+
+    The database write lock is held for the whole block, so concurrent
+    read-modify-write transactions are serialized. If the block raises,
+    the transaction is rolled back.
+
+    Yields:
+      The state dictionary to modify.
+
+    Raises:
+      StateDatabaseError: If the database cannot be written.
+    """
+    with self._lock, _database_errors():
+      conn = self._connection()
+      conn.execute("BEGIN IMMEDIATE")
+      try:
+        state = self._read_all(conn)
+        original = copy.deepcopy(state)
+        yield state
+
+        now = time.time()
+        changed = [
+          (key, json.dumps(value), now)
+          for key, value in state.items()
+          if key not in original or original[key] != value
+        ]
+        conn.executemany(
+          "INSERT OR REPLACE INTO state (feature, data, updated_at)"
+          " VALUES (?, ?, ?)",
+          changed,
+        )
+        conn.executemany(
+          "DELETE FROM state WHERE feature = ?",
+          [(key,) for key in original if key not in state],
+        )
+        conn.execute("COMMIT")
+      except BaseException:
+        conn.execute("ROLLBACK")
+        raise
@@ -2,11 +2,34 @@
 
 This module handles reading and writing application state to the state.json file
 at ~/.config/den/state.json. State is organized by feature keys (e.g., "brew").
+
+All access goes through a StateStore, which parses the file once and keeps
+it in memory for as long as the file is unchanged on disk. Changes are made
+in a transaction and written back with an atomic replace, so a crash or a
+concurrent den run can never leave a truncated state.json behind.
+
+Setting {"state": {"backend": "sqlite"}} in config.json stores state in a
+SQLite database instead (see den.state_sqlite).
 """
 
+import copy
 import json
+import os
+import threading
+from collections.abc import Iterator
+from contextlib import AbstractContextManager, contextmanager
 from pathlib import Path
-from typing import Any
+from typing import Any, Protocol
+
+from den.file_utils import atomic_write_text
+
+# Suffix of the copy kept when a corrupt state.json is replaced
+CORRUPT_SUFFIX = ".corrupt"
+
+# Values of state.backend in config.json
+JSON_BACKEND = "json"
+SQLITE_BACKEND = "sqlite"
+DEFAULT_BACKEND = JSON_BACKEND
 
 
 def get_state_file_path() -> Path:
@@ -18,6 +41,164 @@ def get_state_file_path() -> Path:
   return Path.home() / ".config" / "den" / "state.json"
 
 
+def get_state_db_path() -> Path:
+  """Return the path to the SQLite state database.
+
+  Returns:
+    Path to state.db next to state.json
+  """
+  return get_state_file_path().with_name("state.db")
+
+
+def get_state_backend() -> str:
+  """Return the state backend selected in config.json.
+
+  Returns:
+    "json" or "sqlite". Unknown values fall back to "json".
+  """
+  from den.config import load_config
+
+  backend = load_config().section("state").get("backend", DEFAULT_BACKEND)
+  return backend if backend in (JSON_BACKEND, SQLITE_BACKEND) else DEFAULT_BACKEND
+
+
+class StateBackend(Protocol):
+  """Interface shared by the JSON and SQLite state stores."""
+
+  def load(self) -> dict[str, Any]: ...
+
+  def get(self, key: str, default: Any = None) -> Any: ...
+
+  def transaction(self) -> AbstractContextManager[dict[str, Any]]: ...
+
+
+def _file_signature(path: Path) -> tuple[int, int] | None:
+  """Return (st_mtime_ns, st_size) for a file, or None if it doesn't exist."""
+  try:
+    stat = path.stat()
+  except OSError:
+    return None
+  return (stat.st_mtime_ns, stat.st_size)
+
+
+class StateStore:
+  """In-memory view of a state file with transactional, atomic updates.
+
+  The file is parsed on first access and again only when its modification
+  time or size changes, so a command that reads and then updates state
+  parses the file once and writes it once.
+
+  Attributes:
+    path: The state file.
+  """
+
+  def __init__(self, path: Path):
+    self.path = path
+    self._state: dict[str, Any] = {}
+    self._signature: tuple[int, int] | None = None
+    self._loaded = False
+    self._corrupt = False
+    self._lock = threading.RLock()
+
+  def _refresh(self) -> None:
+    """Parse the file if it has not been read yet or changed on disk."""
+    signature = _file_signature(self.path)
+    if self._loaded and signature == self._signature:
+      return
+
+    self._state, self._corrupt = {}, False
+    if signature is not None:
+      try:
+        with self.path.open("r", encoding="utf-8") as f:
+          data = json.load(f)
+      except json.JSONDecodeError:
+        # Per error handling spec: treat invalid JSON as empty state
+        data, self._corrupt = {}, True
+      if isinstance(data, dict):
+        self._state = data
+      else:
+        self._corrupt = True
+    self._signature = signature
+    self._loaded = True
+
+  def load(self) -> dict[str, Any]:
+    """Return a copy of the whole state.
+
+    Returns:
+      Dictionary of state, or empty dict if the file doesn't exist or
+      contains invalid JSON.
+    """
+    with self._lock:
+      self._refresh()
+      return copy.deepcopy(self._state)
+
+  def get(self, key: str, default: Any = None) -> Any:
+    """Return a copy of the state stored under a feature key."""
+    with self._lock:
+      self._refresh()
+      return copy.deepcopy(self._state.get(key, default))
+
+  @contextmanager
+  def transaction(self) -> Iterator[dict[str, Any]]:
+    """Update the state in memory and write it back atomically.
+
+    Yields a working copy of the state. When the block exits normally, the
+    copy is written to a temporary file, fsynced and renamed over the state
+    file. If the block raises, nothing is written.
+
+    If the existing file contained invalid JSON, it is kept next to the new
+    file with a .corrupt suffix instead of being overwritten.
+
+    Yields:
+      The state dictionary to modify.
+
+    Raises:
+      OSError: If directory or file cannot be created/written.
+    """
+    with self._lock:
+      self._refresh()
+      working = copy.deepcopy(self._state)
+      yield working
+
+      content = json.dumps(working, indent=2)
+      if self._corrupt:
+        os.replace(self.path, self.path.with_name(self.path.name + CORRUPT_SUFFIX))
+      atomic_write_text(self.path, content)
+      self._state = working
+      self._signature = _file_signature(self.path)
+      self._corrupt = False
+
+
+_stores: dict[tuple[str, Path], StateBackend] = {}
+_stores_lock = threading.Lock()
+
+
+def get_state_store(backend: str | None = None) -> StateBackend:
+  """Return the process-wide store for the configured backend.
+
+  The SQLite store imports state.json into the database the first time it
+  is opened.
+
+  Args:
+    backend: "json" or "sqlite" (defaults to state.backend in config.json).
+
+  Returns:
+    The store, shared by all callers in the process.
+  """
+  backend = backend or get_state_backend()
+  state_file = get_state_file_path()
+  key = (backend, state_file)
+  with _stores_lock:
+    if key not in _stores:
+      if backend == SQLITE_BACKEND:
+        from den.state_sqlite import SqliteStateStore
+
+        _stores[key] = SqliteStateStore(get_state_db_path(), json_path=state_file)
+      else:
+        _stores[key] = StateStore(state_file)
+    return _stores[key]
+
+
 def load_state() -> dict[str, Any]:
   """Load existing state from state.json.
 
@@ -25,16 +206,7 @@ def load_state() -> dict[str, Any]:
     Dictionary of state, or empty dict if file doesn't exist.
     If the file contains invalid JSON, returns empty dict.
   """
-  state_file = get_state_file_path()
-  if not state_file.exists():
-    return {}
-
-  try:
-    with state_file.open("r", encoding="utf-8") as f:
-      return json.load(f)
-  except json.JSONDecodeError:
-    # Per error handling spec: treat invalid JSON as empty state
-    return {}
+  return get_state_store().load()
 
 
 def save_state(state: dict[str, Any]) -> None:
@@ -49,15 +221,8 @@ def save_state(state: dict[str, Any]) -> None:
   Raises:
     OSError: If directory or file cannot be created/written.
   """
-  state_file = get_state_file_path()
-  state_file.parent.mkdir(parents=True, exist_ok=True)
-
-  # Load existing state and merge
-  existing_state = load_state()
-  existing_state.update(state)
-
-  with state_file.open("w", encoding="utf-8") as f:
-    json.dump(existing_state, f, indent=2)
+  with get_state_store().transaction() as existing_state:
+    existing_state.update(state)
 
 
 def get_brew_state() -> dict[str, str] | None:
@@ -67,8 +232,7 @@ def get_brew_state() -> dict[str, str] | None:
     Dictionary with brew state containing 'brewfile_hash' and/or 'gist_id',
     or None if no brew state exists.
   """
-  state = load_state()
-  return state.get("brew")
+  return get_state_store().get("brew")
 
 
 def save_brew_state(brewfile_hash: str, gist_id: str) -> None:
@@ -0,0 +1,233 @@
+"""Span-based tracing with Chrome trace-event export.
+
+This module provides named, timed spans with attributes. Commands wrap
+their steps, subprocess calls and HTTP calls in spans; when tracing is
+enabled (with `den --trace FILE`), the finished spans are written as Chrome
+trace-event JSON that opens in Perfetto (https://ui.perfetto.dev) or
+chrome://tracing. When tracing is disabled, spans cost almost nothing.
+"""
+
+import json
+import os
+import threading
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any
+
+DEFAULT_CATEGORY = "den"
+
+
+class Span:
+  """A named, timed operation with attributes.
+
+  Attributes:
+    name: Display name of the span, e.g. "brew upgrade".
+    category: Trace category, e.g. "step", "subprocess" or "http".
+    attributes: Extra key/value data shown with the span.
+    start_ns: Start time from time.perf_counter_ns().
+    end_ns: End time, or None while the span is open.
+    thread_id: Identifier of the thread the span started on.
+  """
+
+  def __init__(
+    self,
+    tracer: "Tracer | None",
+    name: str,
+    category: str = DEFAULT_CATEGORY,
+    attributes: dict[str, Any] | None = None,
+  ):
+    self.name = name
+    self.category = category
+    self.attributes: dict[str, Any] = dict(attributes or {})
+    self.start_ns = time.perf_counter_ns()
+    self.end_ns: int | None = None
+    self.thread_id = threading.get_ident()
+    self._tracer = tracer
+
+  @property
+  def duration_ns(self) -> int:
+    """Return the span's duration so far in nanoseconds."""
+    end_ns = self.end_ns if self.end_ns is not None else time.perf_counter_ns()
+    return end_ns - self.start_ns
+
+  def set_attribute(self, key: str, value: Any) -> None:
+    """Set an attribute on the span."""
+    self.attributes[key] = value
+
+  def end(self) -> None:
+    """End the span and hand it to its tracer. Ending twice has no effect."""
+    if self.end_ns is not None:
+      return
+    self.end_ns = time.perf_counter_ns()
+    if self._tracer is not None:
+      self._tracer.record(self)
+
+
+class Tracer:
+  """Collects finished spans from all threads."""
+
+  def __init__(self) -> None:
+    self.spans: list[Span] = []
+    self.start_ns = time.perf_counter_ns()
+    self._thread_names: dict[int, str] = {}
+    self._lock = threading.Lock()
+
+  def start_span(
+    self, name: str, category: str = DEFAULT_CATEGORY, **attributes: Any
+  ) -> Span:
+    """Start a span that is recorded when its end() method is called."""
+    return Span(self, name, category, attributes)
+
+  def record(self, span: Span) -> None:
+    """Record a finished span."""
+    with self._lock:
+      self.spans.append(span)
+      self._thread_names.setdefault(
+        span.thread_id, threading.current_thread().name
+      )
+
+  def to_chrome_trace(self, process_name: str = "den") -> dict[str, Any]:
+    """Return the spans as a Chrome trace-event document.
+
+    Args:
+      process_name: Name shown for the process track.
+
+    Returns:
+      A dict with "traceEvents" in the Chrome trace-event format. Spans are
+      complete ("X") events with microsecond timestamps relative to the
+      tracer's start.
+    """
+    pid = os.getpid()
+    with self._lock:
+      spans = sorted(self.spans, key=lambda span: span.start_ns)
+      thread_names = dict(self._thread_names)
+
+    events: list[dict[str, Any]] = [
+      {
+        "name": "process_name",
+        "ph": "M",
+        "pid": pid,
+        "args": {"name": process_name},
+      }
+    ]
+    for thread_id, thread_name in thread_names.items():
+      events.append(
+        {
+          "name": "thread_name",
+          "ph": "M",
+          "pid": pid,
+          "tid": thread_id,
+          "args": {"name": thread_name},
+        }
+      )
+    for span in spans:
+      events.append(
+        {
+          "name": span.name,
+          "cat": span.category,
+          "ph": "X",
+          "ts": (span.start_ns - self.start_ns) / 1000,
+          "dur": span.duration_ns / 1000,
+          "pid": pid,
+          "tid": span.thread_id,
+          "args": {
+            key: _json_value(value) for key, value in span.attributes.items()
+          },
+        }
+      )
+    return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+  def write(self, path: Path, process_name: str = "den") -> None:
+    """Write the spans to a Chrome trace-event JSON file.
+
+    Args:
+      path: Destination file.
+      process_name: Name shown for the process track.
+
+    Raises:
+      OSError: If the file cannot be written.
+    """
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with path.open("w", encoding="utf-8") as f:
+      json.dump(self.to_chrome_trace(process_name), f)
+
+
+def _json_value(value: Any) -> Any:
+  """Return value if it is a JSON primitive, otherwise its string form."""
+  if value is None or isinstance(value, (bool, int, float, str)):
+    return value
+  return str(value)
+
+
+_active_tracer: Tracer | None = None
+
+
+def start_tracing() -> Tracer:
+  """Enable tracing for the process and return the new active tracer."""
+  global _active_tracer
+  _active_tracer = Tracer()
+  return _active_tracer
+
+
+def stop_tracing() -> Tracer | None:
+  """Disable tracing and return the tracer that was active, if any."""
+  global _active_tracer
+  tracer, _active_tracer = _active_tracer, None
+  return tracer
+
+
+def get_tracer() -> Tracer | None:
+  """Return the active tracer, or None when tracing is disabled."""
+  return _active_tracer
+
+
+@contextmanager
+def collect_spans() -> Iterator[Tracer]:
+  """Make sure spans are recorded for the enclosed block.
+
+  Uses the active tracer if tracing is already enabled; otherwise enables
+  tracing for the duration of the block. Callers that need the spans of
+  just this block should note len(tracer.spans) on entry.
+
+  Yields:
+    The tracer the block's spans are recorded in.
+  """
+  if _active_tracer is not None:
+    yield _active_tracer
+    return
+
+  tracer = start_tracing()
+  try:
+    yield tracer
+  finally:
+    if _active_tracer is tracer:
+      stop_tracing()
+
+
+@contextmanager
+def span(
+  name: str, category: str = DEFAULT_CATEGORY, **attributes: Any
+) -> Iterator[Span]:
+  """Trace the enclosed block as a span.
+
+  When tracing is disabled the yielded span is still usable (attributes can
+  be set on it) but is not recorded anywhere.
+
+  Args:
+    name: Display name of the span.
+    category: Trace category, e.g. "step", "subprocess" or "http".
+    **attributes: Initial span attributes.
+
+  Yields:
+    The open span.
+  """
+  current = Span(_active_tracer, name, category, attributes)
+  try:
+    yield current
+  except BaseException as e:
+    current.set_attribute("error", type(e).__name__)
+    raise
+  finally:
+    current.end()
@@ -0,0 +1,119 @@
+"""Shared pytest fixtures."""
+
+from collections.abc import Iterator
+from pathlib import Path
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from den.brew_runner import FetchResult, OutdatedPackage
+from den.preflight import CredentialCheck
+from den.state_storage import StateStore
+
+
+@pytest.fixture
+def history_db(tmp_path: Path) -> Iterator[Path]:
+  """Keep run history out of the real ~/.config/den/history.db."""
+  path = tmp_path / "history.db"
+  with patch("den.history.get_history_db_path", return_value=path):
+    yield path
+
+
+@pytest.fixture
+def lock_dir(tmp_path: Path) -> Iterator[Path]:
+  """Keep single-instance lock files out of the real ~/.config/den."""
+  with patch(
+    "den.commands.brew.get_lock_path",
+    side_effect=lambda name: tmp_path / f"{name}.lock",
+  ):
+    yield tmp_path
+
+
+@pytest.fixture
+def preflight_store(tmp_path: Path) -> Iterator[StateStore]:
+  """Keep credential preflight checks off the network and out of state.json.
+
+  Every credential is reported valid unless a test patches check_credential.
+  """
+  store = StateStore(tmp_path / "preflight-state.json")
+  with (
+    patch("den.preflight.get_state_store", return_value=store),
+    patch(
+      "den.preflight.check_credential",
+      side_effect=lambda key, value: CredentialCheck(key, True, "ok"),
+    ),
+  ):
+    yield store
+
+
+@pytest.fixture
+def state_file(tmp_path: Path) -> Iterator[Path]:
+  """Keep state writes out of the real ~/.config/den/state.json."""
+  path = tmp_path / "state.json"
+  with patch("den.state_storage.get_state_file_path", return_value=path):
+    yield path
+
+
+@pytest.fixture
+def archive_dir(tmp_path: Path) -> Iterator[Path]:
+  """Keep archived Brewfiles out of the real ~/.config/den/archive."""
+  path = tmp_path / "archive"
+  with patch("den.archive.get_archive_dir", return_value=path):
+    yield path
+
+
+@pytest.fixture
+def outdated_packages() -> Iterator[list[OutdatedPackage]]:
+  """Keep `brew update` and `brew outdated` from running, reporting one
+  outdated formula.
+
+  Tests can clear or extend the returned list to change what is outdated.
+  """
+  packages = [OutdatedPackage("git", "formula", ("2.42.0",), "2.43.0")]
+  with (
+    patch("den.commands.brew.update_homebrew", return_value=True),
+    patch("den.commands.brew.list_outdated", return_value=packages),
+  ):
+    yield packages
+
+
+@pytest.fixture
+def prefetch() -> Iterator[MagicMock]:
+  """Keep `brew fetch` from running; every package downloads instantly."""
+
+  def fetch(packages, jobs, on_result=None):
+    results = [FetchResult(package, 0.0) for package in packages]
+    for result in results:
+      if on_result is not None:
+        on_result(result)
+    return results
+
+  with patch("den.commands.brew.prefetch_packages", side_effect=fetch) as mock:
+    yield mock
+
+
+@pytest.fixture
+def homebrew_prefix(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> Path:
+  """Point native Brewfile dumps at an empty prefix instead of Homebrew's.
+
+  Tests that build a fake prefix tree create its Cellar here.
+  """
+  prefix = tmp_path / "homebrew"
+  monkeypatch.setenv("HOMEBREW_PREFIX", str(prefix))
+  monkeypatch.delenv("HOMEBREW_REPOSITORY", raising=False)
+  return prefix
+
+
+@pytest.fixture
+def isolated_upgrade_env(
+  history_db: Path,
+  lock_dir: Path,
+  preflight_store: StateStore,
+  state_file: Path,
+  archive_dir: Path,
+  outdated_packages: list[OutdatedPackage],
+  prefetch: MagicMock,
+) -> None:
+  """Everything `den brew upgrade` needs to run without touching ~/.config/den,
+  the network or Homebrew, apart from the steps a test patches itself.
+  """
@@ -0,0 +1,151 @@
+"""Unit tests for the Brewfile archive and `den brew diff`."""
+
+import gzip
+from unittest.mock import MagicMock, patch
+
+import pytest
+from typer.testing import CliRunner
+
+from den.archive import FORMATTED, RAW, ArchiveError, BrewfileArchive
+from den.hash_utils import compute_hash
+from den.main import app
+
+runner = CliRunner()
+
+
+def test_store_deduplicates_and_compresses(archive_dir):
+  """Test that identical content is stored once, compressed."""
+  archive = BrewfileArchive()
+  first = archive.store("brew 'git'\n", RAW, timestamp=1.0)
+  again = archive.store("brew 'git'\n", RAW, timestamp=2.0)
+
+  assert again == first
+  assert first.digest == compute_hash("brew 'git'\n")
+  objects = list((archive_dir / "objects").rglob("*.gz"))
+  assert len(objects) == 1
+  assert gzip.decompress(objects[0].read_bytes()) == b"brew 'git'\n"
+  assert archive.load(first.digest) == "brew 'git'\n"
+
+
+@pytest.mark.usefixtures("archive_dir")
+def test_index_records_changes_per_kind():
+  """Test that the index only grows when a kind's content changes."""
+  archive = BrewfileArchive()
+  archive.store("a\n", RAW, timestamp=1.0)
+  archive.store("formatted a\n", FORMATTED, timestamp=1.0)
+  archive.store("b\n", RAW, timestamp=2.0)
+  archive.store("b\n", RAW, timestamp=3.0)
+  archive.store("a\n", RAW, timestamp=4.0)
+
+  raw = archive.entries(RAW)
+  assert [entry.timestamp for entry in raw] == [1.0, 2.0, 4.0]
+  assert raw[0].digest == raw[2].digest
+  assert len(archive.entries(FORMATTED)) == 1
+
+
+def test_torn_index_line_is_skipped(archive_dir):
+  """Test that a partial index line from a crash is ignored."""
+  archive = BrewfileArchive()
+  archive.store("a\n", RAW, timestamp=1.0)
+  with archive.index_path.open("a") as f:
+    f.write('{"timestamp": 2.0, "ki')
+
+  assert len(archive.entries()) == 1
+
+
+@pytest.mark.usefixtures("archive_dir")
+def test_resolve_references():
+  """Test positions, full digests and prefixes."""
+  archive = BrewfileArchive()
+  old = archive.store("a\n", RAW, timestamp=1.0)
+  new = archive.store("b\n", RAW, timestamp=2.0)
+
+  assert archive.resolve("1", RAW) == new
+  assert archive.resolve("2", RAW) == old
+  assert archive.resolve(old.digest, RAW) == old
+  assert archive.resolve(old.digest.split(":")[1][:8], RAW) == old
+  assert archive.resolve(old.digest[:15], RAW) == old
+  with pytest.raises(ArchiveError):
+    archive.resolve("3", RAW)
+  with pytest.raises(ArchiveError):
+    archive.resolve("abc", RAW)
+  with pytest.raises(ArchiveError):
+    archive.resolve("blake2b:" + old.digest.split(":")[1][:8], RAW)
+
+
+def test_corrupt_object_is_detected(archive_dir):
+  """Test that content not matching its digest is rejected."""
+  archive = BrewfileArchive()
+  entry = archive.store("a\n", RAW)
+  archive.object_path(entry.digest).write_bytes(gzip.compress(b"b\n"))
+
+  with pytest.raises(ArchiveError, match="corrupt"):
+    archive.load(entry.digest)
+
+
+@pytest.mark.usefixtures("archive_dir")
+def test_diff_command_shows_changes():
+  """Test diffing the last two raw versions."""
+  archive = BrewfileArchive()
+  archive.store('brew "git"\n', RAW, timestamp=1.0)
+  archive.store('brew "git"\nbrew "wget"\n', RAW, timestamp=2.0)
+
+  result = runner.invoke(app, ["brew", "diff"])
+
+  assert result.exit_code == 0
+  assert '+brew "wget"' in result.output
+  assert '-brew "git"' not in result.output
+
+
+@pytest.mark.usefixtures("archive_dir")
+def test_diff_command_list_and_errors():
+  """Test --list and a diff with too few versions."""
+  result = runner.invoke(app, ["brew", "diff", "--list"])
+  assert "No raw Brewfiles archived yet." in result.output
+
+  BrewfileArchive().store("a\n", FORMATTED, timestamp=1.0)
+  result = runner.invoke(app, ["brew", "diff", "--formatted", "--list"])
+  assert "  1  " in result.output
+
+  result = runner.invoke(app, ["brew", "diff", "--formatted"])
+  assert result.exit_code == 1
+  assert "There are 1 archived formatted Brewfiles" in result.output
+
+
+@pytest.mark.usefixtures("isolated_upgrade_env")
+@patch("den.commands.brew.run_brew_upgrade")
+@patch("den.commands.brew.generate_brewfile")
+@patch("den.commands.brew.load_credentials")
+@patch("den.commands.brew.format_brewfile")
+@patch("den.commands.brew.create_gist")
+@patch("den.commands.brew.get_brew_state")
+@patch("den.commands.brew.save_brew_state")
+@patch("den.commands.brew.setup_brew_logger")
+def test_upgrade_archives_raw_and_formatted(
+  mock_logger: MagicMock,
+  mock_save_state: MagicMock,
+  mock_get_state: MagicMock,
+  mock_create_gist: MagicMock,
+  mock_format: MagicMock,
+  mock_credentials: MagicMock,
+  mock_generate: MagicMock,
+  mock_upgrade: MagicMock,
+) -> None:
+  """Test that brew upgrade archives both Brewfiles it produces."""
+  mock_logger.return_value = MagicMock()
+  mock_get_state.return_value = None
+  mock_generate.return_value = "brew 'git'\n"
+  mock_credentials.return_value = {
+    "anthropic_api_key": "key",
+    "github_token": "token",
+  }
+  mock_format.return_value = "# Formatted\nbrew 'git'\n"
+  mock_create_gist.return_value = ("gist123", "https://gist.github.com/gist123")
+
+  assert runner.invoke(app, ["brew", "upgrade"]).exit_code == 0
+
+  archive = BrewfileArchive()
+  assert archive.load(archive.resolve("1", RAW).digest) == "brew 'git'\n"
+  assert archive.load(archive.resolve("1", FORMATTED).digest) == (
+    "# Formatted\nbrew 'git'\n"
+  )
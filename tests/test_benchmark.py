@@ -0,0 +1,101 @@
+"""Unit tests for the cold-start benchmark harness.
+
+Tests import time parsing, budget loading and the regression report.
+"""
+
+import json
+
+import pytest
+
+from den.benchmark import (
+  BenchmarkError,
+  BenchmarkResult,
+  ImportTiming,
+  create_fake_home,
+  format_report,
+  load_budgets,
+  parse_importtime,
+  top_imports,
+)
+
+IMPORTTIME_OUTPUT = """\
+import time: self [us] | cumulative | imported package
+import time:       657 |       1607 |   json.decoder
+import time:      1489 |       1489 |   json.encoder
+import time:       416 |       3511 | json
+some other stderr line
+"""
+
+
+def test_parse_importtime():
+  """Test that -X importtime lines are parsed and the header skipped."""
+  timings = parse_importtime(IMPORTTIME_OUTPUT)
+
+  assert timings == [
+    ImportTiming("json.decoder", 657, 1607),
+    ImportTiming("json.encoder", 1489, 1489),
+    ImportTiming("json", 416, 3511),
+  ]
+
+
+def test_top_imports_sorts_by_self_time():
+  """Test that the slowest imports by self time come first."""
+  timings = parse_importtime(IMPORTTIME_OUTPUT)
+
+  assert [t.module for t in top_imports(timings, 2)] == [
+    "json.encoder",
+    "json.decoder",
+  ]
+
+
+def test_load_budgets(tmp_path):
+  """Test that budgets are read as milliseconds per command."""
+  path = tmp_path / "budgets.json"
+  path.write_text(json.dumps({"den hello": {"wall_ms": 120}}))
+
+  assert load_budgets(path) == {"den hello": 120.0}
+
+
+def test_load_budgets_rejects_malformed_entry(tmp_path):
+  """Test that a budget without wall_ms raises BenchmarkError."""
+  path = tmp_path / "budgets.json"
+  path.write_text(json.dumps({"den hello": 120}))
+
+  with pytest.raises(BenchmarkError):
+    load_budgets(path)
+
+
+def test_fake_home_contains_agents(tmp_path):
+  """Test that the fake home has LaunchAgents for the default domain."""
+  home = create_fake_home(tmp_path, agent_count=3)
+
+  agents = list((home / "Library" / "LaunchAgents").glob("com.example.*.plist"))
+  assert len(agents) == 3
+
+
+def test_report_flags_regressions():
+  """Test that commands over budget are reported as regressions."""
+  results = [
+    BenchmarkResult("den hello", [100.0, 110.0, 120.0], budget_ms=150.0),
+    BenchmarkResult(
+      "den --version",
+      [200.0, 210.0, 220.0],
+      budget_ms=150.0,
+      imports=[ImportTiming("den.main", 2000, 42000)],
+    ),
+  ]
+
+  report = format_report(results)
+
+  assert results[1].over_budget
+  assert "REGRESSION (+60 ms)" in report
+  assert "den.main" in report
+  assert "1 command(s) over budget: den --version" in report
+
+
+def test_report_without_budget():
+  """Test that unbudgeted commands are reported but never regress."""
+  report = format_report([BenchmarkResult("den hello", [100.0])])
+
+  assert "no budget" in report
+  assert "All commands within budget." in report
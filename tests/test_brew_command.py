@@ -3,8 +3,10 @@
 Tests for the full workflow with mocked external services.
 """
 
+import time
 from unittest.mock import MagicMock, patch
 
+import pytest
 from typer.testing import CliRunner
 
 from den.main import app
@@ -12,6 +14,7 @@ from den.main import app
 runner = CliRunner()
 
 
+@pytest.mark.usefixtures("isolated_upgrade_env")
 class TestBrewUpgradeCommand:
   """Tests for the brew upgrade command."""
 
@@ -295,3 +298,402 @@ class TestBrewUpgradeCommand:
     assert "Brewfile unchanged, skipping backup" not in result.output
     assert "Formatting Brewfile with AI..." in result.output
     mock_format.assert_called_once()
+
+  @patch("den.commands.brew.run_brew_upgrade")
+  @patch("den.commands.brew.generate_brewfile")
+  @patch("den.commands.brew.load_credentials")
+  @patch("den.commands.brew.get_backend")
+  @patch("den.commands.brew.create_gist")
+  @patch("den.commands.brew.get_brew_state")
+  @patch("den.commands.brew.save_brew_state")
+  @patch("den.commands.brew.setup_brew_logger")
+  def test_plain_formatter_needs_no_anthropic_key(
+    self,
+    mock_logger: MagicMock,
+    mock_save_state: MagicMock,
+    mock_get_state: MagicMock,
+    mock_create_gist: MagicMock,
+    mock_get_backend: MagicMock,
+    mock_credentials: MagicMock,
+    mock_generate: MagicMock,
+    mock_upgrade: MagicMock,
+  ) -> None:
+    """Test that the plain formatter backs up without an Anthropic key."""
+    from den.formatters import BUILTIN_BACKENDS
+
+    mock_logger.return_value = MagicMock()
+    mock_get_state.return_value = None
+    mock_generate.return_value = 'brew "git"\ntap "homebrew/core"'
+    mock_get_backend.return_value = BUILTIN_BACKENDS["plain"]
+    mock_credentials.return_value = {"github_token": "test-github-token"}
+    mock_create_gist.return_value = ("gist123", "https://gist.github.com/gist123")
+
+    result = runner.invoke(app, ["brew", "upgrade"])
+
+    assert result.exit_code == 0
+    assert "Formatting Brewfile..." in result.output
+    content = mock_create_gist.call_args[0][0]
+    assert content.index('tap "homebrew/core"') < content.index('brew "git"')
+
+  @patch("den.commands.brew.run_brew_upgrade")
+  @patch("den.commands.brew.generate_brewfile")
+  @patch("den.commands.brew.get_brew_state")
+  @patch("den.commands.brew.setup_brew_logger")
+  def test_brew_output_is_forwarded(
+    self,
+    mock_logger: MagicMock,
+    mock_get_state: MagicMock,
+    mock_generate: MagicMock,
+    mock_upgrade: MagicMock,
+  ) -> None:
+    """Test that brew output and progress reach the console and the log."""
+    from den.brew_runner import UpgradeProgress
+    from den.brewfile import compute_brewfile_hash
+
+    def upgrade(on_line, on_progress, auto_update):
+      on_line("stdout", "==> Upgrading git")
+      on_progress(UpgradeProgress("git", 1, 2))
+      on_line("stderr", "Warning: git is pinned")
+
+    logger = MagicMock()
+    mock_logger.return_value = logger
+    mock_upgrade.side_effect = upgrade
+    mock_generate.return_value = "brew 'git'"
+    mock_get_state.return_value = {
+      "brewfile_hash": compute_brewfile_hash("brew 'git'"),
+      "gist_id": "existing-gist-id",
+    }
+
+    result = runner.invoke(app, ["brew", "upgrade"])
+
+    assert result.exit_code == 0
+    assert "==> Upgrading git" in result.output
+    assert "[1/2] Upgrading git" in result.output
+    assert "Warning: git is pinned" in result.output
+    logger.warning.assert_any_call("brew: Warning: git is pinned")
+
+  @patch("den.commands.brew.run_brew_upgrade")
+  @patch("den.commands.brew.generate_brewfile")
+  @patch("den.commands.brew.get_brew_state")
+  @patch("den.commands.brew.setup_brew_logger")
+  def test_upgrade_skipped_when_nothing_outdated(
+    self,
+    mock_logger: MagicMock,
+    mock_get_state: MagicMock,
+    mock_generate: MagicMock,
+    mock_upgrade: MagicMock,
+    outdated_packages: list,
+  ) -> None:
+    """Test that brew upgrade doesn't run when only pinned formulae are
+    outdated."""
+    from den.brew_runner import OutdatedPackage
+    from den.brewfile import compute_brewfile_hash
+
+    outdated_packages[:] = [
+      OutdatedPackage("node", "formula", ("20.1.0",), "21.0.0", pinned=True)
+    ]
+    mock_logger.return_value = MagicMock()
+    mock_generate.return_value = "brew 'node'"
+    mock_get_state.return_value = {
+      "brewfile_hash": compute_brewfile_hash("brew 'node'"),
+      "gist_id": "existing-gist-id",
+    }
+
+    result = runner.invoke(app, ["brew", "upgrade"])
+
+    assert "node 20.1.0 -> 21.0.0 (pinned, skipped)" in result.output
+    assert "All Homebrew packages are up to date" in result.output
+    mock_upgrade.assert_not_called()
+    mock_generate.assert_called_once()
+
+  @patch("den.commands.brew.run_brew_upgrade")
+  @patch("den.commands.brew.generate_brewfile")
+  @patch("den.commands.brew.list_outdated", return_value=[])
+  @patch("den.commands.brew.update_homebrew")
+  @patch("den.commands.brew.get_brew_state")
+  @patch("den.commands.brew.setup_brew_logger")
+  def test_skip_decision_uses_updated_metadata(
+    self,
+    mock_logger: MagicMock,
+    mock_get_state: MagicMock,
+    mock_update: MagicMock,
+    mock_outdated: MagicMock,
+    mock_generate: MagicMock,
+    mock_upgrade: MagicMock,
+  ) -> None:
+    """Test that brew update runs before brew outdated, that a failed update
+    means brew upgrade runs even though nothing looks outdated, and that brew
+    upgrade only updates again when den's own update didn't run."""
+    from den.brew_runner import OutdatedPackage
+    from den.brew_runner import BrewCommandError
+    from den.brewfile import compute_brewfile_hash
+
+    calls = []
+    mock_update.side_effect = lambda: calls.append("update") or True
+    mock_outdated.side_effect = lambda: calls.append("outdated") or []
+    mock_logger.return_value = MagicMock()
+    mock_generate.return_value = "brew 'git'"
+    mock_get_state.return_value = {
+      "brewfile_hash": compute_brewfile_hash("brew 'git'"),
+      "gist_id": "existing-gist-id",
+    }
+
+    result = runner.invoke(app, ["brew", "upgrade"])
+
+    assert result.exit_code == 0
+    assert calls == ["update", "outdated"]
+    assert "All Homebrew packages are up to date" in result.output
+    mock_upgrade.assert_not_called()
+
+    mock_update.side_effect = BrewCommandError("brew update", 1, "offline")
+    result = runner.invoke(app, ["brew", "upgrade"])
+
+    assert result.exit_code == 0
+    assert "All Homebrew packages are up to date" not in result.output
+    mock_upgrade.assert_called_once()
+    assert mock_upgrade.call_args.kwargs["auto_update"] is True
+
+    mock_update.side_effect = None
+    mock_update.return_value = True
+    mock_outdated.side_effect = None
+    mock_outdated.return_value = [
+      OutdatedPackage("git", "formula", ("2.42.0",), "2.43.0")
+    ]
+    mock_upgrade.reset_mock()
+    result = runner.invoke(app, ["brew", "upgrade"])
+
+    assert result.exit_code == 0
+    assert mock_upgrade.call_args.kwargs["auto_update"] is False
+
+  @patch("den.commands.brew.run_brew_upgrade")
+  @patch("den.commands.brew.generate_brewfile")
+  @patch("den.commands.brew.list_outdated")
+  @patch("den.commands.brew.get_brew_state")
+  @patch("den.commands.brew.setup_brew_logger")
+  def test_upgrade_runs_when_precheck_fails(
+    self,
+    mock_logger: MagicMock,
+    mock_get_state: MagicMock,
+    mock_outdated: MagicMock,
+    mock_generate: MagicMock,
+    mock_upgrade: MagicMock,
+  ) -> None:
+    """Test that a failing brew outdated falls back to brew upgrade."""
+    from den.brew_runner import BrewCommandError
+    from den.brewfile import compute_brewfile_hash
+
+    mock_logger.return_value = MagicMock()
+    mock_outdated.side_effect = BrewCommandError("brew outdated", 1, "offline")
+    mock_generate.return_value = "brew 'git'"
+    mock_get_state.return_value = {
+      "brewfile_hash": compute_brewfile_hash("brew 'git'"),
+      "gist_id": "existing-gist-id",
+    }
+
+    result = runner.invoke(app, ["brew", "upgrade"])
+
+    assert result.exit_code == 0
+    mock_upgrade.assert_called_once()
+
+  @patch("den.commands.brew.run_brew_upgrade")
+  @patch("den.commands.brew.generate_brewfile")
+  @patch("den.commands.brew.get_brew_state")
+  @patch("den.commands.brew.setup_brew_logger")
+  def test_failed_prefetch_still_upgrades(
+    self,
+    mock_logger: MagicMock,
+    mock_get_state: MagicMock,
+    mock_generate: MagicMock,
+    mock_upgrade: MagicMock,
+    prefetch: MagicMock,
+  ) -> None:
+    """Test that download times and failures are reported, then brew
+    upgrade runs."""
+    from den.brew_runner import FetchResult
+    from den.brewfile import compute_brewfile_hash
+
+    def fetch(packages, jobs, on_result):
+      on_result(FetchResult(packages[0], 2.5, "Error: timed out"))
+      return []
+
+    prefetch.side_effect = fetch
+    mock_logger.return_value = MagicMock()
+    mock_generate.return_value = "brew 'git'"
+    mock_get_state.return_value = {
+      "brewfile_hash": compute_brewfile_hash("brew 'git'"),
+      "gist_id": "existing-gist-id",
+    }
+
+    result = runner.invoke(app, ["brew", "upgrade"])
+
+    assert result.exit_code == 0
+    assert "Downloading 1 packages" in result.output
+    assert "git download failed, brew upgrade will retry" in result.output
+    mock_upgrade.assert_called_once()
+
+  @patch("den.commands.brew.run_brew_upgrade")
+  @patch("den.commands.brew.generate_brewfile")
+  @patch("den.commands.brew.load_credentials")
+  @patch("den.commands.brew.format_brewfile")
+  @patch("den.commands.brew.update_gist")
+  @patch("den.commands.brew.get_brew_state")
+  @patch("den.commands.brew.save_brew_state")
+  @patch("den.commands.brew.setup_brew_logger")
+  def test_backup_overlaps_brew_upgrade(
+    self,
+    mock_logger: MagicMock,
+    mock_save_state: MagicMock,
+    mock_get_state: MagicMock,
+    mock_update_gist: MagicMock,
+    mock_format: MagicMock,
+    mock_credentials: MagicMock,
+    mock_generate: MagicMock,
+    mock_upgrade: MagicMock,
+  ) -> None:
+    """Test that the Brewfile is dumped and formatted while brew upgrade
+    runs, but shown and backed up only once it has finished."""
+    import threading
+
+    formatted = threading.Event()
+    upgrading = threading.Event()
+
+    def upgrade(on_line, on_progress, auto_update):
+      # Deadlocks (and times out) if formatting waited for the upgrade
+      assert formatted.wait(timeout=5)
+      on_line("stdout", "==> Upgrading git")
+      upgrading.set()
+
+    def format_brewfile(content, credential, formatter):
+      formatted.set()
+      return "# Formatted\nbrew 'git'"
+
+    def update_gist(gist_id, content, token):
+      assert upgrading.is_set()
+      return "https://gist.github.com/existing-gist-id"
+
+    mock_logger.return_value = MagicMock()
+    mock_upgrade.side_effect = upgrade
+    mock_update_gist.side_effect = update_gist
+    mock_get_state.return_value = {
+      "brewfile_hash": "sha256:old",
+      "gist_id": "existing-gist-id",
+    }
+    mock_generate.return_value = "brew 'git'"
+    mock_credentials.return_value = {
+      "anthropic_api_key": "test-anthropic-key",
+      "github_token": "test-github-token",
+    }
+    mock_format.side_effect = format_brewfile
+
+    result = runner.invoke(app, ["brew", "upgrade"])
+
+    assert result.exit_code == 0
+    lines = result.output.splitlines()
+    assert lines.index("==> Upgrading git") < lines.index("Creating Brewfile...")
+    assert lines[-1] == (
+      "Brewfile backed up successfully: https://gist.github.com/existing-gist-id"
+    )
+    mock_save_state.assert_called_once()
+
+  @patch("den.commands.brew.run_brew_upgrade")
+  @patch("den.commands.brew.generate_brewfile")
+  @patch("den.commands.brew.load_credentials")
+  @patch("den.commands.brew.format_brewfile")
+  @patch("den.commands.brew.update_gist")
+  @patch("den.commands.brew.get_brew_state")
+  @patch("den.commands.brew.save_brew_state")
+  @patch("den.commands.brew.setup_brew_logger")
+  def test_failed_upgrade_skips_backup(
+    self,
+    mock_logger: MagicMock,
+    mock_save_state: MagicMock,
+    mock_get_state: MagicMock,
+    mock_update_gist: MagicMock,
+    mock_format: MagicMock,
+    mock_credentials: MagicMock,
+    mock_generate: MagicMock,
+    mock_upgrade: MagicMock,
+  ) -> None:
+    """Test that a failed brew upgrade leaves the Gist and state alone."""
+    from den.brew_runner import BrewCommandError
+
+    mock_logger.return_value = MagicMock()
+    mock_upgrade.side_effect = BrewCommandError("brew upgrade", 1, "boom")
+    mock_get_state.return_value = {
+      "brewfile_hash": "sha256:old",
+      "gist_id": "existing-gist-id",
+    }
+    mock_generate.return_value = "brew 'git'"
+    mock_credentials.return_value = {
+      "anthropic_api_key": "test-anthropic-key",
+      "github_token": "test-github-token",
+    }
+    mock_format.return_value = "# Formatted\nbrew 'git'"
+
+    result = runner.invoke(app, ["brew", "upgrade"])
+
+    assert result.exit_code == 1
+    mock_update_gist.assert_not_called()
+    mock_save_state.assert_not_called()
+    lines = result.output.splitlines()
+    error = next(i for i, line in enumerate(lines) if line.startswith("Error:"))
+    assert lines.index("Creating Brewfile...") > error
+
+  @patch("den.commands.brew.run_brew_upgrade")
+  @patch("den.commands.brew.generate_brewfile")
+  @patch("den.commands.brew.load_credentials")
+  @patch("den.commands.brew.format_brewfile")
+  @patch("den.commands.brew.update_gist")
+  @patch("den.commands.brew.get_brew_state")
+  @patch("den.commands.brew.save_brew_state")
+  @patch("den.commands.brew.setup_brew_logger")
+  def test_failed_format_still_upgrades(
+    self,
+    mock_logger: MagicMock,
+    mock_save_state: MagicMock,
+    mock_get_state: MagicMock,
+    mock_update_gist: MagicMock,
+    mock_format: MagicMock,
+    mock_credentials: MagicMock,
+    mock_generate: MagicMock,
+    mock_upgrade: MagicMock,
+    prefetch: MagicMock,
+  ) -> None:
+    """Test that a Brewfile failure during prefetch doesn't cancel brew
+    upgrade, but does cancel the backup."""
+    import threading
+
+    from den.formatters import BrewfileFormatterError
+
+    format_failed = threading.Event()
+
+    def fetch(packages, jobs, on_result):
+      assert format_failed.wait(timeout=5)
+      time.sleep(0.1)
+      return []
+
+    def format_brewfile(content, credential, formatter):
+      format_failed.set()
+      raise BrewfileFormatterError("API error")
+
+    prefetch.side_effect = fetch
+    mock_format.side_effect = format_brewfile
+    mock_logger.return_value = MagicMock()
+    mock_get_state.return_value = {
+      "brewfile_hash": "sha256:old",
+      "gist_id": "existing-gist-id",
+    }
+    mock_generate.return_value = "brew 'git'"
+    mock_credentials.return_value = {
+      "anthropic_api_key": "test-anthropic-key",
+      "github_token": "test-github-token",
+    }
+
+    result = runner.invoke(app, ["brew", "upgrade"])
+
+    assert result.exit_code == 1
+    assert "Error: API error" in result.output
+    mock_upgrade.assert_called_once()
+    mock_update_gist.assert_not_called()
+    mock_save_state.assert_not_called()
+
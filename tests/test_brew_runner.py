@@ -3,6 +3,9 @@
 These tests verify Homebrew command execution with mocked subprocess calls.
 """
 
+import sys
+import threading
+import time
 from unittest.mock import patch, MagicMock
 
 import pytest
@@ -10,39 +13,128 @@ import pytest
 from den.brew_runner import (
   run_brew_upgrade,
   generate_brewfile,
+  list_outdated,
+  parse_outdated,
+  stream_command,
+  fetch_package,
+  prefetch_packages,
+  update_homebrew,
   BrewCommandError,
+  FetchResult,
+  OutdatedPackage,
+  UpgradeProgress,
 )
 
 
+UPGRADE_OUTPUT = [
+  ("stdout", "==> Upgrading 2 outdated packages:"),
+  ("stdout", "git 2.42.0 -> 2.43.0"),
+  ("stdout", "wget 1.21.3 -> 1.21.4"),
+  ("stdout", "==> Upgrading git"),
+  ("stderr", "Warning: git was installed from a tap"),
+  ("stdout", "==> Upgrading wget 1.21.3 -> 1.21.4"),
+]
+
+
+def _fake_stream(returncode: int, stderr: str = ""):
+  """Return a stream_command replacement that replays UPGRADE_OUTPUT."""
+
+  def stream(args, on_line, env=None):
+    for stream_name, line in UPGRADE_OUTPUT:
+      on_line(stream_name, line)
+    return returncode, stderr
+
+  return stream
+
+
+class TestStreamCommand:
+  """Tests for stream_command."""
+
+  def test_lines_are_passed_as_printed(self) -> None:
+    """Test that both pipes are read, including a line without newline."""
+    script = (
+      "import sys\n"
+      "print('out 1', flush=True)\n"
+      "print('err 1', file=sys.stderr, flush=True)\n"
+      "sys.stdout.write('out 2')\n"
+    )
+    lines = []
+
+    returncode, stderr = stream_command(
+      [sys.executable, "-c", script], lambda *line: lines.append(line)
+    )
+
+    assert returncode == 0
+    assert stderr == "err 1"
+    assert sorted(lines) == [
+      ("stderr", "err 1"),
+      ("stdout", "out 1"),
+      ("stdout", "out 2"),
+    ]
+
+  def test_large_output_on_both_pipes_keeps_bounded_tail(self) -> None:
+    """Test that filling both pipe buffers doesn't deadlock."""
+    script = (
+      "import sys\n"
+      "for i in range(20000):\n"
+      "  print('x' * 50, i)\n"
+      "  print('e', i, file=sys.stderr)\n"
+      "sys.exit(3)\n"
+    )
+    counts = {"stdout": 0, "stderr": 0}
+
+    def count(stream: str, line: str) -> None:
+      counts[stream] += 1
+
+    returncode, stderr = stream_command(
+      [sys.executable, "-c", script], count, stderr_tail_lines=3
+    )
+
+    assert returncode == 3
+    assert counts == {"stdout": 20000, "stderr": 20000}
+    assert stderr == "e 19997\ne 19998\ne 19999"
+
+
 class TestRunBrewUpgrade:
   """Tests for run_brew_upgrade function."""
 
-  def test_successful_upgrade(self) -> None:
-    """Test successful brew upgrade execution."""
-    mock_result = MagicMock()
-    mock_result.returncode = 0
-    mock_result.stdout = "Updated packages"
-    mock_result.stderr = ""
+  def test_successful_upgrade_streams_lines_and_progress(self) -> None:
+    """Test that output and per-package progress are reported."""
+    lines = []
+    progress = []
 
     with patch(
-      "den.brew_runner.subprocess.run", return_value=mock_result
-    ) as mock_run:
+      "den.brew_runner.stream_command", side_effect=_fake_stream(0)
+    ) as mock_stream:
+      run_brew_upgrade(
+        on_line=lambda *line: lines.append(line), on_progress=progress.append
+      )
+
+    assert mock_stream.call_args.args[0] == ["brew", "upgrade"]
+    assert lines == UPGRADE_OUTPUT
+    assert progress == [
+      UpgradeProgress("git", 1, 2),
+      UpgradeProgress("wget", 2, 2),
+    ]
+
+  def test_auto_update_can_be_turned_off(self, monkeypatch) -> None:
+    """Test that brew upgrade skips its own update when asked to."""
+    monkeypatch.delenv("HOMEBREW_NO_AUTO_UPDATE", raising=False)
+    with patch(
+      "den.brew_runner.stream_command", side_effect=_fake_stream(0)
+    ) as mock_stream:
       run_brew_upgrade()
+      assert mock_stream.call_args.kwargs["env"] is None
 
-      mock_run.assert_called_once_with(
-        ["brew", "upgrade"],
-        capture_output=True,
-        text=True,
-        check=False,
-      )
+      run_brew_upgrade(auto_update=False)
+      assert mock_stream.call_args.kwargs["env"]["HOMEBREW_NO_AUTO_UPDATE"] == "1"
 
   def test_upgrade_failure_raises_error(self) -> None:
     """Test that failed brew upgrade raises BrewCommandError."""
-    mock_result = MagicMock()
-    mock_result.returncode = 1
-    mock_result.stderr = "Error: some packages failed"
-
-    with patch("den.brew_runner.subprocess.run", return_value=mock_result):
+    with patch(
+      "den.brew_runner.stream_command",
+      side_effect=_fake_stream(1, "Error: some packages failed"),
+    ):
       with pytest.raises(BrewCommandError) as exc_info:
         run_brew_upgrade()
 
@@ -53,7 +145,7 @@ class TestRunBrewUpgrade:
   def test_brew_not_found_raises_error(self) -> None:
     """Test that missing brew command raises BrewCommandError."""
     with patch(
-      "den.brew_runner.subprocess.run",
+      "den.brew_runner.subprocess.Popen",
       side_effect=FileNotFoundError("brew not found"),
     ):
       with pytest.raises(BrewCommandError) as exc_info:
@@ -64,6 +156,7 @@ class TestRunBrewUpgrade:
       assert "brew command not found" in exc_info.value.stderr
 
 
+@pytest.mark.usefixtures("homebrew_prefix")
 class TestGenerateBrewfile:
   """Tests for generate_brewfile function."""
 
@@ -114,3 +207,128 @@ class TestGenerateBrewfile:
       assert "brew bundle dump" in exc_info.value.command
       assert exc_info.value.returncode == -1
       assert "brew command not found" in exc_info.value.stderr
+
+
+OUTDATED_JSON = """{
+  "formulae": [
+    {"name": "git", "installed_versions": ["2.42.0"], "current_version": "2.43.0",
+     "pinned": false, "pinned_version": null},
+    {"name": "node", "installed_versions": ["20.1.0", "20.2.0"],
+     "current_version": "21.0.0", "pinned": true, "pinned_version": "20.2.0"}
+  ],
+  "casks": [
+    {"name": "firefox", "installed_versions": "120.0", "current_version": "121.0"}
+  ]
+}"""
+
+
+class TestListOutdated:
+  """Tests for list_outdated and parse_outdated."""
+
+  def test_parses_formulae_and_casks(self) -> None:
+    """Test the structured model built from brew outdated --json=v2."""
+    mock_result = MagicMock(returncode=0, stdout=OUTDATED_JSON, stderr="")
+
+    with patch(
+      "den.brew_runner.subprocess.run", return_value=mock_result
+    ) as mock_run:
+      packages = list_outdated()
+
+    assert mock_run.call_args.args[0] == ["brew", "outdated", "--json=v2"]
+    assert packages == [
+      OutdatedPackage("git", "formula", ("2.42.0",), "2.43.0"),
+      OutdatedPackage("node", "formula", ("20.1.0", "20.2.0"), "21.0.0", True),
+      OutdatedPackage("firefox", "cask", ("120.0",), "121.0"),
+    ]
+    assert packages[0].describe() == "git 2.42.0 -> 2.43.0"
+
+  def test_nothing_outdated(self) -> None:
+    """Test empty lists."""
+    assert parse_outdated('{"formulae": [], "casks": []}') == []
+
+  def test_invalid_output_raises_error(self) -> None:
+    """Test that unexpected JSON is reported as a command error."""
+    mock_result = MagicMock(returncode=0, stdout='{"formulae": [{}]}', stderr="")
+
+    with patch("den.brew_runner.subprocess.run", return_value=mock_result):
+      with pytest.raises(BrewCommandError, match="Invalid output"):
+        list_outdated()
+
+
+class TestUpdateHomebrew:
+  """Tests for update_homebrew function."""
+
+  def test_runs_brew_update(self, monkeypatch) -> None:
+    """Test that brew update runs unless auto-update is turned off."""
+    monkeypatch.delenv("HOMEBREW_NO_AUTO_UPDATE", raising=False)
+    with patch("den.brew_runner.subprocess.run") as mock_run:
+      mock_run.return_value = MagicMock(returncode=0, stderr="")
+      assert update_homebrew() is True
+      assert mock_run.call_args[0][0] == ["brew", "update"]
+
+      monkeypatch.setenv("HOMEBREW_NO_AUTO_UPDATE", "1")
+      mock_run.reset_mock()
+      assert update_homebrew() is False
+      mock_run.assert_not_called()
+
+  def test_update_failure_raises_error(self, monkeypatch) -> None:
+    """Test that a failing brew update raises BrewCommandError."""
+    monkeypatch.delenv("HOMEBREW_NO_AUTO_UPDATE", raising=False)
+    with patch("den.brew_runner.subprocess.run") as mock_run:
+      mock_run.return_value = MagicMock(returncode=1, stderr="offline")
+      with pytest.raises(BrewCommandError, match="offline"):
+        update_homebrew()
+
+
+class TestPrefetch:
+  """Tests for fetch_package and prefetch_packages."""
+
+  def test_fetch_package_success_and_failure(self) -> None:
+    """Test the brew fetch command line and failure reporting."""
+    cask = OutdatedPackage("firefox", "cask", ("120.0",), "121.0")
+    ok = MagicMock(returncode=0, stdout="", stderr="")
+    failed = MagicMock(returncode=1, stdout="", stderr="==> x\nError: timed out\n")
+
+    with patch("den.brew_runner.subprocess.run", return_value=ok) as mock_run:
+      result = fetch_package(cask)
+
+    assert mock_run.call_args.args[0] == ["brew", "fetch", "--cask", "firefox"]
+    assert mock_run.call_args.kwargs["env"]["HOMEBREW_NO_AUTO_UPDATE"] == "1"
+    assert result.ok
+    assert result.duration_s >= 0
+
+    with patch("den.brew_runner.subprocess.run", return_value=failed):
+      result = fetch_package(cask)
+
+    assert not result.ok
+    assert result.error == "Error: timed out"
+
+  def test_prefetch_is_bounded_and_reports_each_result(self) -> None:
+    """Test that no more than `jobs` fetches run at once."""
+    packages = [
+      OutdatedPackage(f"pkg{i}", "formula", ("1",), "2") for i in range(6)
+    ]
+    lock = threading.Lock()
+    running = 0
+    peak = 0
+
+    def fetch(package):
+      nonlocal running, peak
+      with lock:
+        running += 1
+        peak = max(peak, running)
+      time.sleep(0.05)
+      with lock:
+        running -= 1
+      return FetchResult(package, 0.05)
+
+    reported = []
+    with patch("den.brew_runner.fetch_package", side_effect=fetch):
+      results = prefetch_packages(packages, jobs=2, on_result=reported.append)
+
+    assert peak == 2
+    assert sorted(result.package.name for result in results) == [
+      f"pkg{i}" for i in range(6)
+    ]
+    assert reported == results
+    assert prefetch_packages(packages, jobs=0) == []
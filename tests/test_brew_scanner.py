@@ -0,0 +1,178 @@
+"""Unit tests for native Brewfile generation from a fake Homebrew prefix."""
+
+import json
+from pathlib import Path
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from den.brew_runner import generate_brewfile
+from den.brew_scanner import NativeDumpUnsupported, dump_brewfile
+
+pytestmark = pytest.mark.usefixtures("homebrew_prefix")
+
+EXPECTED = """tap "acme/tools", "git@example.com:acme/homebrew-tools.git"
+tap "homebrew/services"
+brew "zzz"
+brew "aaa"
+brew "git"
+brew "postgresql@14"
+brew "wget", link: false
+brew "acme/tools/widget"
+cask "acme/tools/gadget"
+cask "firefox"
+"""
+
+
+def _tap(prefix: Path, user: str, repo: str, remote: str) -> None:
+  git_dir = prefix / "Library" / "Taps" / user / f"homebrew-{repo}" / ".git"
+  git_dir.mkdir(parents=True)
+  config = "[core]\n\tbare = false\n"
+  if remote:
+    config += f'[remote "origin"]\n\turl = {remote}\n'
+  (git_dir / "config").write_text(config)
+
+
+def _formula(
+  prefix: Path,
+  name: str,
+  tap: str = "homebrew/core",
+  requested: bool = True,
+  dependencies: tuple[str, ...] = (),
+  keg_only: bool = False,
+  linked: bool = True,
+  **receipt: object,
+) -> None:
+  keg = prefix / "Cellar" / name / "1.0"
+  (keg / ".brew").mkdir(parents=True)
+  (keg / "INSTALL_RECEIPT.json").write_text(
+    json.dumps(
+      {
+        "installed_on_request": requested,
+        "installed_as_dependency": not requested,
+        "used_options": [],
+        "runtime_dependencies": [
+          {"full_name": dep, "version": "1", "declared_directly": True}
+          for dep in dependencies
+        ],
+        "source": {"tap": tap, "spec": "stable"},
+        **receipt,
+      }
+    )
+  )
+  body = "  keg_only :versioned_formula\n" if keg_only else ""
+  (keg / ".brew" / f"{name}.rb").write_text(
+    f"class Formula < Formula\n{body}end\n"
+  )
+  if linked:
+    linked_dir = prefix / "var" / "homebrew" / "linked"
+    linked_dir.mkdir(parents=True, exist_ok=True)
+    (linked_dir / name).symlink_to(keg)
+
+
+def _cask(prefix: Path, token: str, tap: str | None = "homebrew/cask") -> None:
+  metadata = prefix / "Caskroom" / token / ".metadata"
+  metadata.mkdir(parents=True)
+  if tap is not None:
+    (metadata / "INSTALL_RECEIPT.json").write_text(
+      json.dumps({"source": {"tap": tap}})
+    )
+
+
+@pytest.fixture
+def prefix(homebrew_prefix: Path) -> Path:
+  """Build a prefix with taps, formulae and casks."""
+  _tap(
+    homebrew_prefix,
+    "homebrew",
+    "services",
+    "https://github.com/Homebrew/homebrew-services",
+  )
+  _tap(
+    homebrew_prefix, "acme", "tools", "git@example.com:acme/homebrew-tools.git"
+  )
+  _formula(homebrew_prefix, "aaa", dependencies=("zzz",))
+  _formula(homebrew_prefix, "zzz")
+  _formula(homebrew_prefix, "git", dependencies=("pcre2",))
+  _formula(homebrew_prefix, "pcre2", requested=False)
+  _formula(homebrew_prefix, "postgresql@14", keg_only=True, linked=False)
+  _formula(homebrew_prefix, "wget", linked=False)
+  _formula(homebrew_prefix, "widget", tap="acme/tools")
+  _cask(homebrew_prefix, "firefox")
+  _cask(homebrew_prefix, "gadget", tap="acme/tools")
+  return homebrew_prefix
+
+
+@pytest.fixture(autouse=True)
+def no_vscode():
+  """Hide a VS Code `code` command on the machine running the tests."""
+  with patch("den.brew_scanner.shutil.which", return_value=None):
+    yield
+
+
+def test_dump_matches_brew_bundle_dump(prefix):
+  """Test taps, formulae, casks, link options and dependency order."""
+  assert dump_brewfile() == EXPECTED
+
+
+@pytest.mark.parametrize(
+  "change",
+  [
+    lambda p: _formula(p, "vim", used_options=["--with-lua"]),
+    lambda p: _formula(p, "mas"),
+    lambda p: _formula(p, "tool", tap=None),
+    lambda p: _cask(p, "docker", tap=None),
+    lambda p: (p / "Cellar" / "git" / "1.0" / ".brew" / "git.rb").unlink(),
+    lambda p: _tap(p, "acme", "empty", ""),
+  ],
+  ids=["options", "mas", "unknown-tap", "cask-receipt", "keg-only", "tap-remote"],
+)
+def test_unsure_cases_are_unsupported(prefix, change):
+  """Test that anything the scan can't reproduce exactly falls back."""
+  change(prefix)
+
+  with pytest.raises(NativeDumpUnsupported):
+    dump_brewfile()
+
+
+def test_service_is_unsupported(prefix, tmp_path, monkeypatch):
+  """Test that a formula with an installed service falls back."""
+  agents = tmp_path / "home" / "Library" / "LaunchAgents"
+  agents.mkdir(parents=True)
+  (agents / "homebrew.mxcl.postgresql@14.plist").write_text("")
+  monkeypatch.setenv("HOME", str(tmp_path / "home"))
+
+  with pytest.raises(NativeDumpUnsupported, match="service"):
+    dump_brewfile()
+
+
+def test_missing_prefix_is_unsupported():
+  """Test that no Homebrew installation means falling back."""
+  with pytest.raises(NativeDumpUnsupported, match="No Homebrew prefix"):
+    dump_brewfile()
+
+
+def test_generate_brewfile_uses_native_dump(prefix):
+  """Test that brew bundle dump isn't run when the scan succeeds."""
+  with patch("den.brew_runner.subprocess.run") as mock_run:
+    assert generate_brewfile() == EXPECTED
+
+  mock_run.assert_not_called()
+
+
+def test_generate_brewfile_falls_back(prefix):
+  """Test fallback to brew bundle dump, and turning the scan off."""
+  _formula(prefix, "vim", used_options=["--with-lua"])
+  result = MagicMock(returncode=0, stdout='brew "vim"\n', stderr="")
+
+  with patch("den.brew_runner.subprocess.run", return_value=result) as mock_run:
+    assert generate_brewfile() == 'brew "vim"\n'
+  mock_run.assert_called_once()
+
+  with (
+    patch("den.brew_runner.native_dump_enabled", return_value=False),
+    patch("den.brew_runner.dump_brewfile") as mock_dump,
+    patch("den.brew_runner.subprocess.run", return_value=result),
+  ):
+    generate_brewfile()
+  mock_dump.assert_not_called()
@@ -0,0 +1,159 @@
+"""Unit tests for Brewfile parsing and canonical hashing."""
+
+from unittest.mock import MagicMock, patch
+
+import pytest
+from hypothesis import given, settings, strategies as st
+from typer.testing import CliRunner
+
+from den.brewfile import (
+  BrewfileEntry,
+  canonicalize_brewfile,
+  compare_brewfile,
+  compute_brewfile_hash,
+  parse_entry,
+)
+from den.hash_utils import compute_hash
+from den.main import app
+
+runner = CliRunner()
+
+DUMP = """tap "homebrew/bundle"
+tap "homebrew/services"
+brew "git"
+brew "postgresql@14", restart_service: :changed, link: false
+cask "firefox"
+mas "Xcode", id: 497799835
+vscode "ms-python.python"
+"""
+
+
+def test_parse_entry_with_options():
+  """Test that options are parsed and sorted by key."""
+  entry = parse_entry('brew "postgresql@14", restart_service: :changed, link: false')
+
+  assert entry == BrewfileEntry(
+    "brew", "postgresql@14", (("link", "false"), ("restart_service", ":changed"))
+  )
+
+
+def test_parse_entry_skips_comments_and_keeps_unknown_lines():
+  """Test comments, blank lines and unparseable lines."""
+  assert parse_entry("# Distributed revision control system") is None
+  assert parse_entry("   ") is None
+  assert parse_entry("cask_args  appdir:  '~/Apps'") == BrewfileEntry(
+    "raw", "cask_args appdir: '~/Apps'"
+  )
+
+
+def test_cosmetic_differences_hash_the_same():
+  """Test that order, quoting, whitespace, option order and comments are
+  ignored."""
+  cosmetic = """# Added by brew bundle dump --describe
+vscode 'ms-python.python'
+cask "firefox"
+mas "Xcode",   id: 497799835
+brew "postgresql@14", link: false, restart_service: :changed
+brew  'git'
+tap "homebrew/services"
+tap "homebrew/bundle"
+brew "git"
+"""
+  assert compute_brewfile_hash(cosmetic) == compute_brewfile_hash(DUMP)
+
+
+def test_option_arrays_are_normalized():
+  """Test that whitespace and quotes inside option arrays are ignored."""
+  a = 'brew "vim", args: ["with-lua", "HEAD"]'
+  b = "brew \"vim\", args: [ 'with-lua' ,'HEAD' ]"
+
+  assert canonicalize_brewfile(a) == canonicalize_brewfile(b)
+
+
+def test_semantic_changes_change_the_hash():
+  """Test that added packages and changed options are detected."""
+  base = compute_brewfile_hash(DUMP)
+
+  assert compute_brewfile_hash(DUMP + 'brew "wget"\n') != base
+  assert compute_brewfile_hash(DUMP.replace("link: false", "link: true")) != base
+  assert compute_brewfile_hash(DUMP.replace('cask "firefox"', 'brew "firefox"')) != base
+
+
+@settings(max_examples=100)
+@given(st.permutations(DUMP.splitlines()))
+def test_property_hash_is_order_insensitive(lines: list[str]):
+  """*For any* reordering of Brewfile lines, the canonical hash SHALL be
+  unchanged."""
+  assert compute_brewfile_hash("\n".join(lines)) == compute_brewfile_hash(DUMP)
+
+
+def test_compare_brewfile():
+  """Test comparison against canonical, legacy raw and missing hashes."""
+  canonical = compute_brewfile_hash(DUMP)
+
+  assert compare_brewfile(DUMP, None).unchanged is False
+  assert compare_brewfile(DUMP, canonical).unchanged is True
+  legacy = compare_brewfile(DUMP, compute_hash(DUMP))
+  assert legacy.unchanged is True
+  assert legacy.legacy is True
+  assert legacy.hash == canonical
+  assert compare_brewfile(DUMP + 'brew "wget"\n', canonical).unchanged is False
+
+
+@pytest.mark.usefixtures("isolated_upgrade_env")
+@patch("den.commands.brew.run_brew_upgrade")
+@patch("den.commands.brew.generate_brewfile")
+@patch("den.commands.brew.get_brew_state")
+@patch("den.commands.brew.save_brew_state")
+@patch("den.commands.brew.format_brewfile")
+@patch("den.commands.brew.setup_brew_logger")
+def test_upgrade_migrates_legacy_hash_without_backup(
+  mock_logger: MagicMock,
+  mock_format: MagicMock,
+  mock_save_state: MagicMock,
+  mock_get_state: MagicMock,
+  mock_generate: MagicMock,
+  mock_upgrade: MagicMock,
+) -> None:
+  """Test that a raw hash from older versions is replaced in place."""
+  mock_logger.return_value = MagicMock()
+  mock_generate.return_value = DUMP
+  mock_get_state.return_value = {
+    "brewfile_hash": compute_hash(DUMP),
+    "gist_id": "gist123",
+  }
+
+  result = runner.invoke(app, ["brew", "upgrade"])
+
+  assert result.exit_code == 0
+  assert "Brewfile unchanged, skipping backup" in result.output
+  mock_format.assert_not_called()
+  mock_save_state.assert_called_once_with(compute_brewfile_hash(DUMP), "gist123")
+
+
+@pytest.mark.usefixtures("isolated_upgrade_env")
+@patch("den.commands.brew.run_brew_upgrade")
+@patch("den.commands.brew.generate_brewfile")
+@patch("den.commands.brew.get_brew_state")
+@patch("den.commands.brew.format_brewfile")
+@patch("den.commands.brew.setup_brew_logger")
+def test_upgrade_skips_reordered_dump(
+  mock_logger: MagicMock,
+  mock_format: MagicMock,
+  mock_get_state: MagicMock,
+  mock_generate: MagicMock,
+  mock_upgrade: MagicMock,
+) -> None:
+  """Test that a reordered dump does not trigger formatting or a backup."""
+  mock_logger.return_value = MagicMock()
+  mock_generate.return_value = "\n".join(reversed(DUMP.splitlines()))
+  mock_get_state.return_value = {
+    "brewfile_hash": compute_brewfile_hash(DUMP),
+    "gist_id": "gist123",
+  }
+
+  result = runner.invoke(app, ["brew", "upgrade"])
+
+  assert result.exit_code == 0
+  assert "Brewfile unchanged, skipping backup" in result.output
+  mock_format.assert_not_called()
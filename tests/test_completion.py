@@ -0,0 +1,107 @@
+"""Unit tests for static shell completion generation.
+
+Tests that the command tree walk covers every group and that the generated
+scripts complete commands, options and config-backed option values.
+"""
+
+import shutil
+import subprocess
+from unittest.mock import patch
+
+import pytest
+import typer
+from typer.testing import CliRunner
+
+from den.completion import build_completion_tree, generate_completion_script
+from den.main import app
+
+runner = CliRunner()
+
+
+def _root_command():
+  return typer.main.get_command(app)
+
+
+def test_tree_covers_all_command_groups():
+  """Test that the tree includes every lazily registered group."""
+  nodes = {node.path: node for node in build_completion_tree(_root_command())}
+
+  for group in ("auth", "brew", "launchctl", "repo"):
+    assert group in nodes
+  assert "brew upgrade" in nodes
+  assert "--force" in nodes["brew upgrade"].flags
+  assert "--org" in nodes["repo create"].value_options
+
+
+def test_org_values_come_from_config():
+  """Test that --org completion values use the configured default org."""
+  with patch("den.completion.get_default_org", return_value="my-org"):
+    nodes = {node.path: node for node in build_completion_tree(_root_command())}
+
+  assert nodes["repo create"].value_options["--org"] == ["my-org"]
+
+
+def test_unsupported_shell_raises():
+  """Test that unknown shells are rejected."""
+  with pytest.raises(ValueError):
+    generate_completion_script(_root_command(), "tcsh")
+
+
+@pytest.mark.parametrize("shell", ["bash", "zsh", "fish"])
+def test_scripts_mention_every_group(shell):
+  """Test that each shell's script lists all command groups."""
+  script = generate_completion_script(_root_command(), shell)
+
+  for group in ("auth", "brew", "launchctl", "repo"):
+    assert group in script
+
+
+@pytest.mark.skipif(shutil.which("bash") is None, reason="bash not installed")
+def test_bash_script_completes(tmp_path):
+  """Test the generated bash script by running its completion function."""
+  with patch("den.completion.get_default_org", return_value="my-org"):
+    script = generate_completion_script(_root_command(), "bash")
+  script_path = tmp_path / "den.bash"
+  script_path.write_text(script)
+
+  harness = f"""
+source {script_path}
+complete_words() {{
+  COMP_WORDS=("$@"); COMP_CWORD=$((${{#COMP_WORDS[@]}} - 1)); _den
+  echo "${{COMPREPLY[*]}}"
+}}
+complete_words den br
+complete_words den brew upgrade --f
+complete_words den repo create name --org ""
+complete_words den launchctl ""
+"""
+  result = subprocess.run(
+    ["bash", "-c", harness], capture_output=True, text=True, check=True
+  )
+
+  assert result.stdout.splitlines() == [
+    "brew",
+    "--force",
+    "my-org",
+    "install uninstall",
+  ]
+
+
+def test_generate_command_writes_scripts(tmp_path):
+  """Test that den completion generate writes one script per shell."""
+  result = runner.invoke(
+    app, ["completion", "generate", "--output-dir", str(tmp_path)]
+  )
+
+  assert result.exit_code == 0
+  assert (tmp_path / "den.bash").exists()
+  assert (tmp_path / "_den").exists()
+  assert (tmp_path / "den.fish").exists()
+
+
+def test_generate_command_prints_single_shell():
+  """Test that den completion generate --shell prints the script."""
+  result = runner.invoke(app, ["completion", "generate", "--shell", "bash"])
+
+  assert result.exit_code == 0
+  assert "complete -F _den den" in result.output
@@ -0,0 +1,106 @@
+"""Unit tests for the unified config loader.
+
+Tests parsing of config.json, section access and the (mtime, size) cache.
+"""
+
+import json
+import os
+from unittest.mock import patch
+
+import pytest
+
+from den.config import (
+  DenConfig,
+  _read_config,
+  clear_config_cache,
+  load_config,
+)
+
+
+@pytest.fixture(autouse=True)
+def _clear_cache():
+  clear_config_cache()
+  yield
+  clear_config_cache()
+
+
+def test_missing_file_returns_defaults(tmp_path):
+  """Test that a missing config file yields the default config."""
+  config = load_config(tmp_path / "config.json")
+
+  assert config == DenConfig()
+  assert config.section("repo") == {}
+
+
+def test_sections(tmp_path):
+  """Test that top-level sections are returned as parsed."""
+  config_file = tmp_path / "config.json"
+  config_file.write_text(
+    json.dumps(
+      {
+        "repo": {"default_org": "my-org"},
+        "launchctl": {"domain": "com.mycompany"},
+        "brew": {"extra": True},
+      }
+    )
+  )
+
+  config = load_config(config_file)
+
+  assert config.section("repo") == {"default_org": "my-org"}
+  assert config.section("launchctl") == {"domain": "com.mycompany"}
+  assert config.section("brew") == {"extra": True}
+
+
+def test_non_object_section_is_empty():
+  """Test that a section that is not an object reads as empty."""
+  config = DenConfig(raw={"launchctl": ["x"]})
+
+  assert config.section("launchctl") == {}
+
+
+def test_non_object_json_returns_defaults(tmp_path):
+  """Test that a JSON document that is not an object yields defaults."""
+  config_file = tmp_path / "config.json"
+  config_file.write_text("[1, 2, 3]")
+
+  assert load_config(config_file) == DenConfig()
+
+
+def test_unchanged_file_is_not_reread(tmp_path):
+  """Test that the file is parsed once while its mtime and size are unchanged."""
+  config_file = tmp_path / "config.json"
+  config_file.write_text(json.dumps({"repo": {"default_org": "my-org"}}))
+
+  with patch("den.config._read_config", wraps=_read_config) as mock_read:
+    first = load_config(config_file)
+    second = load_config(config_file)
+
+  assert first is second
+  assert mock_read.call_count == 1
+
+
+def test_edited_file_is_reloaded(tmp_path):
+  """Test that a change in mtime or size makes the next load re-read."""
+  config_file = tmp_path / "config.json"
+  config_file.write_text(json.dumps({"repo": {"default_org": "old"}}))
+  assert load_config(config_file).section("repo") == {"default_org": "old"}
+
+  config_file.write_text(json.dumps({"repo": {"default_org": "newer"}}))
+  assert load_config(config_file).section("repo") == {"default_org": "newer"}
+
+  config_file.write_text(json.dumps({"repo": {"default_org": "other"}}))
+  stat = config_file.stat()
+  os.utime(config_file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+  assert load_config(config_file).section("repo") == {"default_org": "other"}
+
+
+def test_deleted_file_returns_defaults(tmp_path):
+  """Test that deleting the file after a load returns defaults."""
+  config_file = tmp_path / "config.json"
+  config_file.write_text(json.dumps({"launchctl": {"domain": "com.mycompany"}}))
+  assert load_config(config_file).section("launchctl") == {"domain": "com.mycompany"}
+
+  config_file.unlink()
+
+  assert load_config(config_file) == DenConfig()
@@ -0,0 +1,143 @@
+"""Tests for the den daemon and its forwarding client.
+
+Unit tests cover the client's fallback behavior; integration tests start a
+real daemon in a temporary home directory and forward commands to it.
+"""
+
+import os
+import stat
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import pytest
+
+import den
+from den.daemon import (
+  DAEMON_DISABLE_ENV,
+  DaemonError,
+  forward_to_daemon,
+  get_socket_path,
+  request_control,
+  serve,
+)
+
+SRC_DIR = str(Path(den.__file__).resolve().parents[1])
+
+
+def test_socket_path_returns_expected_location():
+  """Test that get_socket_path returns ~/.config/den/daemon.sock."""
+  expected = Path.home() / ".config" / "den" / "daemon.sock"
+  assert get_socket_path() == str(expected)
+
+
+def test_forward_returns_none_without_daemon(tmp_path):
+  """Test that commands run in-process when no daemon is listening."""
+  assert forward_to_daemon(["hello"], str(tmp_path / "missing.sock")) is None
+
+
+def test_forward_returns_none_when_disabled(tmp_path, monkeypatch):
+  """Test that DEN_NO_DAEMON disables forwarding."""
+  monkeypatch.setenv(DAEMON_DISABLE_ENV, "1")
+  assert forward_to_daemon(["hello"], str(tmp_path / "den.sock")) is None
+
+
+def test_forward_skips_daemon_commands(tmp_path):
+  """Test that daemon management commands are never forwarded."""
+  assert forward_to_daemon(["daemon", "status"], str(tmp_path / "den.sock")) is None
+
+
+def test_request_control_raises_without_daemon(tmp_path):
+  """Test that control requests fail cleanly when no daemon is running."""
+  with pytest.raises(DaemonError):
+    request_control("status", str(tmp_path / "missing.sock"))
+
+
+def test_socket_is_private_when_bound(tmp_path, monkeypatch):
+  """Test that the socket is owner-only from bind, not just after chmod."""
+  modes = []
+
+  def chmod(path, mode):
+    modes.append(stat.S_IMODE(os.stat(path).st_mode))
+    raise OSError("stop before serving")
+
+  monkeypatch.setattr("den.daemon._preload", lambda: None)
+  monkeypatch.setattr("den.daemon.os.chmod", chmod)
+  with pytest.raises(OSError, match="stop before serving"):
+    serve(str(tmp_path / "den.sock"))
+
+  assert len(modes) == 1
+  assert modes[0] & 0o077 == 0
+
+
+@pytest.fixture
+def daemon_home(tmp_path):
+  """Start a daemon with HOME set to a temporary directory."""
+  env = {**os.environ, "HOME": str(tmp_path), "PYTHONPATH": SRC_DIR}
+  env.pop(DAEMON_DISABLE_ENV, None)
+  process = subprocess.Popen(
+    [sys.executable, "-m", "den", "daemon", "start"],
+    env=env,
+    stdout=subprocess.DEVNULL,
+    stderr=subprocess.DEVNULL,
+  )
+  socket_path = tmp_path / ".config" / "den" / "daemon.sock"
+  deadline = time.monotonic() + 30
+  while not socket_path.exists():
+    if time.monotonic() > deadline or process.poll() is not None:
+      process.kill()
+      pytest.fail("daemon did not start")
+    time.sleep(0.05)
+
+  yield env
+
+  process.terminate()
+  process.wait(timeout=10)
+
+
+def _run_den(
+  env: dict[str, str], *args: str, stdin: str = ""
+) -> subprocess.CompletedProcess:
+  """Run den through the module entry point."""
+  return subprocess.run(
+    [sys.executable, "-m", "den", *args],
+    env=env,
+    input=stdin,
+    capture_output=True,
+    text=True,
+    timeout=30,
+  )
+
+
+def test_daemon_forwards_output_and_exit_code(daemon_home):
+  """Test that output and exit codes pass through the daemon."""
+  result = _run_den(daemon_home, "hello", "--name", "Daemon")
+  assert result.returncode == 0
+  assert "Hello, Daemon!" in result.stdout
+
+  result = _run_den(daemon_home, "no-such-command")
+  assert result.returncode == 2
+
+  status = _run_den(daemon_home, "daemon", "status")
+  assert "2 commands served" in status.stdout
+
+
+def test_daemon_forwards_prompts(daemon_home):
+  """Test that interactive prompts read the client's stdin."""
+  result = _run_den(daemon_home, "auth", "login", stdin="9\n")
+
+  assert result.returncode == 1
+  assert "Select an authentication provider" in result.stdout
+  assert "Invalid choice" in result.stdout
+
+
+def test_daemon_stop(daemon_home):
+  """Test that den daemon stop shuts the daemon down."""
+  result = _run_den(daemon_home, "daemon", "stop")
+  assert result.returncode == 0
+
+  deadline = time.monotonic() + 10
+  while _run_den(daemon_home, "daemon", "status").returncode == 0:
+    assert time.monotonic() < deadline
+    time.sleep(0.05)
@@ -0,0 +1,114 @@
+"""Unit tests for Brewfile formatter backends.
+
+Tests backend selection from config, lazy loading, and the plain formatter.
+"""
+
+import json
+import sys
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from den.config import clear_config_cache
+from den.formatters import (
+  BUILTIN_BACKENDS,
+  DEFAULT_FORMATTER,
+  BrewfileFormatterError,
+  FormatterBackend,
+  format_brewfile,
+  format_plain,
+  get_backend,
+)
+
+RAW_BREWFILE = """\
+cask "firefox"
+brew "git"
+tap "homebrew/bundle"
+vscode "ms-python.python"
+brew "Awk"
+whalebrew "whalebrew/wget"
+"""
+
+
+@pytest.fixture
+def config_file(tmp_path):
+  config_file = tmp_path / "config.json"
+  clear_config_cache()
+  with patch("den.config.get_config_file_path", return_value=config_file):
+    yield config_file
+  clear_config_cache()
+
+
+def test_default_backend_is_anthropic(config_file):
+  """Test that the anthropic backend is used without configuration."""
+  assert get_backend().name == DEFAULT_FORMATTER == "anthropic"
+  assert get_backend().credential_key == "anthropic_api_key"
+
+
+def test_backend_selected_in_config(config_file):
+  """Test that brew.formatter in config.json selects the backend."""
+  config_file.write_text(json.dumps({"brew": {"formatter": "plain"}}))
+
+  assert get_backend().name == "plain"
+  assert get_backend().credential_key is None
+
+
+def test_unknown_backend_raises(config_file):
+  """Test that an unknown backend name raises BrewfileFormatterError."""
+  with pytest.raises(BrewfileFormatterError, match="Unknown Brewfile formatter"):
+    get_backend("nonexistent")
+
+
+def test_entry_point_backend(config_file):
+  """Test that backends registered as entry points are found."""
+  backend = FormatterBackend("custom", "custom_pkg:format", "Custom.")
+  entry_point = MagicMock()
+  entry_point.load.return_value = backend
+
+  with patch("den.formatters.entry_points", return_value=[entry_point]):
+    assert get_backend("custom") is backend
+
+
+def test_missing_backend_module_raises():
+  """Test that a backend whose module is missing reports it is unavailable."""
+  backend = FormatterBackend("ai", "den_missing_module:format", "Missing.")
+
+  with pytest.raises(BrewfileFormatterError, match="not available in this build"):
+    format_brewfile('brew "git"', None, backend)
+
+
+def test_anthropic_backend_is_imported_lazily():
+  """Test that selecting a backend does not import the anthropic SDK."""
+  with patch.dict(sys.modules):
+    sys.modules.pop("den.brewfile_formatter", None)
+    get_backend("anthropic")
+    assert "den.brewfile_formatter" not in sys.modules
+
+
+def test_format_brewfile_dispatches_to_backend():
+  """Test that format_brewfile calls the backend with the credential."""
+  with patch("den.brewfile_formatter.format_brewfile", return_value="ok") as mock:
+    result = format_brewfile('brew "git"', "key", BUILTIN_BACKENDS["anthropic"])
+
+  assert result == "ok"
+  mock.assert_called_once_with('brew "git"', "key")
+
+
+def test_plain_formatter_groups_and_sorts():
+  """Test that the plain formatter groups entries by keyword and sorts them."""
+  formatted = format_plain(RAW_BREWFILE)
+  lines = formatted.splitlines()
+
+  assert lines[0] == "# Homebrew Brewfile"
+  assert lines.index("# Taps") < lines.index("# Formulae") < lines.index("# Casks")
+  formulae = lines.index("# Formulae")
+  assert lines[formulae + 2 : formulae + 4] == ['brew "Awk"', 'brew "git"']
+  assert "# Other" in lines
+
+
+def test_plain_formatter_preserves_all_entries():
+  """Test that no package entry is dropped by the plain formatter."""
+  formatted = format_plain(RAW_BREWFILE)
+
+  for line in RAW_BREWFILE.splitlines():
+    assert line in formatted.splitlines()
@@ -3,9 +3,18 @@
 These tests use hypothesis to verify universal properties across all inputs.
 """
 
+import pytest
 from hypothesis import given, settings, strategies as st
 
-from den.hash_utils import compute_hash
+from den.hash_utils import (
+  SUPPORTED_ALGORITHMS,
+  Hasher,
+  HashError,
+  compute_hash,
+  hash_file,
+  parse_digest,
+  verify_hash,
+)
 
 
 @settings(max_examples=100)
@@ -45,3 +54,75 @@ def test_property_hash_format_compliance(content: str):
 
   # Should be valid hexadecimal
   assert all(c in "0123456789abcdef" for c in hex_part)
+
+
+@settings(max_examples=100)
+@given(
+  chunks=st.lists(st.binary(max_size=64), max_size=8),
+  algorithm=st.sampled_from(SUPPORTED_ALGORITHMS),
+)
+def test_property_streaming_matches_one_shot(chunks: list[bytes], algorithm: str):
+  """*For any* split of content into chunks, hashing the chunks SHALL give
+  the same digest as hashing the concatenation in one call."""
+  whole = compute_hash(b"".join(chunks), algorithm)
+
+  assert compute_hash(iter(chunks), algorithm) == whole
+  assert compute_hash(memoryview(b"".join(chunks)), algorithm) == whole
+  assert whole.startswith(f"{algorithm}:")
+
+
+@settings(max_examples=100)
+@given(content=st.text())
+def test_property_str_and_utf8_bytes_agree(content: str):
+  """*For any* string, hashing it SHALL equal hashing its UTF-8 bytes."""
+  assert compute_hash(content) == compute_hash(content.encode("utf-8"))
+
+
+def test_sha256_digest_is_unchanged():
+  """Test that sha256 digests match values stored by earlier versions."""
+  assert compute_hash("abc") == (
+    "sha256:ba7816bf8f01cfea414140de5dae2223b00361a396177a9cb410ff61f20015ad"
+  )
+
+
+@pytest.mark.parametrize("use_mmap", [False, True])
+def test_hash_file_matches_content(tmp_path, use_mmap):
+  """Test that files hash like their content, in chunks or mapped."""
+  path = tmp_path / "Brewfile"
+  content = b"brew 'git'\n" * 100_000
+  path.write_bytes(content)
+  empty = tmp_path / "empty"
+  empty.write_bytes(b"")
+
+  assert hash_file(path, "blake2b", use_mmap=use_mmap) == compute_hash(
+    content, "blake2b"
+  )
+  assert hash_file(empty, use_mmap=use_mmap) == compute_hash(b"")
+
+
+def test_hasher_copy_is_independent():
+  """Test that a copied hasher continues separately."""
+  hasher = Hasher("blake2b").update("brew ")
+  clone = hasher.copy()
+  hasher.update("git")
+
+  assert clone.hexdigest() == compute_hash("brew ", "blake2b")
+  assert hasher.hexdigest() == compute_hash("brew git", "blake2b")
+
+
+def test_verify_hash_uses_digest_algorithm():
+  """Test that digests verify with the algorithm named in their prefix."""
+  assert verify_hash("brew 'git'", compute_hash("brew 'git'"))
+  assert verify_hash("brew 'git'", compute_hash("brew 'git'", "blake2b"))
+  assert not verify_hash("brew 'wget'", compute_hash("brew 'git'", "blake2b"))
+  assert not verify_hash("brew 'git'", "md5:abcd")
+  assert not verify_hash("brew 'git'", "no-prefix")
+
+
+def test_unsupported_algorithm_raises():
+  """Test that unknown algorithms and malformed digests are rejected."""
+  with pytest.raises(HashError):
+    compute_hash("x", "md5")
+  with pytest.raises(HashError):
+    parse_digest("sha256:not-hex")
+  assert parse_digest("blake2s:00ff") == ("blake2s", "00ff")
@@ -0,0 +1,161 @@
+"""Unit tests for the run history store and `den brew history`."""
+
+import logging
+from unittest.mock import MagicMock, patch
+
+import pytest
+import typer
+from typer.testing import CliRunner
+
+from den.history import HistoryStore, RunRecord, percentile, record_run
+from den.main import app
+from den.tracing import span, stop_tracing
+
+runner = CliRunner()
+
+
+@pytest.fixture(autouse=True)
+def _reset_tracing():
+  """Make sure no tracer leaks between tests."""
+  stop_tracing()
+  yield
+  stop_tracing()
+
+
+def _run(started_at: float, steps: dict[str, float], **fields) -> RunRecord:
+  """Build a finished run record."""
+  return RunRecord(
+    command="brew upgrade",
+    started_at=started_at,
+    ended_at=started_at + sum(steps.values()),
+    exit_code=fields.pop("exit_code", 0),
+    steps=steps,
+    **fields,
+  )
+
+
+def test_percentile_nearest_rank():
+  """Test nearest-rank percentiles."""
+  values = [float(v) for v in range(1, 21)]
+  assert percentile(values, 50) == 10.0
+  assert percentile(values, 95) == 19.0
+  assert percentile(values, 100) == 20.0
+  assert percentile([3.0], 95) == 3.0
+
+
+def test_append_and_recent_runs(history_db):
+  """Test that runs round-trip newest first with their steps in order."""
+  store = HistoryStore()
+  store.append(_run(100.0, {"upgrade": 2.0, "dump": 1.0}, brewfile_hash="a"))
+  store.append(
+    _run(200.0, {"upgrade": 3.0}, skipped=True, changed=False, input_tokens=5)
+  )
+
+  runs = store.recent_runs("brew upgrade", limit=10)
+
+  assert history_db.exists()
+  assert [run.started_at for run in runs] == [200.0, 100.0]
+  assert runs[0].skipped is True
+  assert runs[0].changed is False
+  assert runs[0].input_tokens == 5
+  assert list(runs[1].steps) == ["upgrade", "dump"]
+  assert runs[1].brewfile_hash == "a"
+  assert runs[1].duration_s == 3.0
+  assert store.recent_runs("brew upgrade", limit=1)[0].started_at == 200.0
+  assert store.recent_runs("other") == []
+
+
+@pytest.mark.usefixtures("history_db")
+def test_step_stats_over_window():
+  """Test that step percentiles only cover the most recent runs."""
+  store = HistoryStore()
+  store.append(_run(0.0, {"upgrade": 100.0}))
+  for i in range(1, 11):
+    store.append(_run(float(i), {"upgrade": float(i), "dump": 0.5}))
+
+  stats = {stat.step: stat for stat in store.step_stats("brew upgrade", 10)}
+
+  assert stats["upgrade"].count == 10
+  assert stats["upgrade"].p50 == 5.0
+  assert stats["upgrade"].p95 == 10.0
+  assert stats["upgrade"].max == 10.0
+  assert stats["dump"].count == 10
+
+
+@pytest.mark.usefixtures("history_db")
+def test_record_run_collects_steps_and_tokens():
+  """Test that step spans and token attributes end up in the record."""
+  with record_run("brew upgrade") as run:
+    with span("upgrade", "step"):
+      pass
+    with span("POST /v1/messages", "http", input_tokens=10, output_tokens=4):
+      pass
+    run.brewfile_hash = "abc"
+
+  (recorded,) = HistoryStore().recent_runs("brew upgrade")
+  assert recorded.exit_code == 0
+  assert recorded.brewfile_hash == "abc"
+  assert list(recorded.steps) == ["upgrade"]
+  assert (recorded.input_tokens, recorded.output_tokens) == (10, 4)
+
+
+@pytest.mark.usefixtures("history_db")
+def test_record_run_records_exit_code():
+  """Test that a typer.Exit is recorded with its exit code and re-raised."""
+  with pytest.raises(typer.Exit), record_run("brew upgrade"):
+    raise typer.Exit(3)
+
+  assert HistoryStore().recent_runs("brew upgrade")[0].exit_code == 3
+
+
+def test_record_run_write_failure_is_logged(tmp_path, caplog):
+  """Test that a history write failure does not fail the command."""
+  blocker = tmp_path / "file"
+  blocker.write_text("")
+  store = HistoryStore(blocker / "history.db")
+
+  with caplog.at_level(logging.WARNING), record_run("brew upgrade", store):
+    pass
+
+  assert "Failed to record run history" in caplog.text
+
+
+@pytest.mark.usefixtures("isolated_upgrade_env")
+@patch("den.commands.brew.run_brew_upgrade")
+@patch("den.commands.brew.generate_brewfile")
+@patch("den.commands.brew.get_brew_state")
+@patch("den.commands.brew.setup_brew_logger")
+def test_brew_upgrade_is_recorded_and_shown(
+  mock_logger: MagicMock,
+  mock_get_state: MagicMock,
+  mock_generate: MagicMock,
+  mock_upgrade: MagicMock,
+) -> None:
+  """Test that an unchanged upgrade is recorded and listed by history."""
+  from den.hash_utils import compute_hash
+
+  mock_logger.return_value = MagicMock()
+  mock_generate.return_value = "brew 'git'"
+  mock_get_state.return_value = {"brewfile_hash": compute_hash("brew 'git'")}
+
+  assert runner.invoke(app, ["brew", "upgrade"]).exit_code == 0
+
+  (run,) = HistoryStore().recent_runs("brew upgrade")
+  assert run.skipped is True
+  assert run.changed is False
+  assert set(run.steps) == {"update", "outdated", "prefetch", "upgrade", "dump", "hash"}
+
+  result = runner.invoke(app, ["brew", "history"])
+  assert result.exit_code == 0
+  assert "unchanged" in result.output
+  assert "upgrade" in result.output
+  assert "P95" in result.output
+
+
+@pytest.mark.usefixtures("history_db")
+def test_history_without_runs():
+  """Test the message shown before any run is recorded."""
+  result = runner.invoke(app, ["brew", "history"])
+
+  assert result.exit_code == 0
+  assert "No brew upgrade runs recorded yet." in result.output
@@ -0,0 +1,194 @@
+"""Unit tests for single-instance locks and overlapping brew upgrade runs."""
+
+import json
+import threading
+from unittest.mock import MagicMock, patch
+
+import pytest
+from typer.testing import CliRunner
+
+from den.instance_lock import InstanceLock, LockTimeoutError
+from den.main import app
+
+runner = CliRunner()
+
+
+def test_second_lock_times_out(tmp_path):
+  """Test that a held lock cannot be taken by another open file."""
+  path = tmp_path / "test.lock"
+  with InstanceLock(path):
+    other = InstanceLock(path)
+    with pytest.raises(LockTimeoutError):
+      other.acquire(timeout=0)
+    with pytest.raises(LockTimeoutError):
+      other.acquire(timeout=0.05)
+    assert not other.held
+
+  other.acquire(timeout=0)
+  assert other.held
+  other.release()
+
+
+def test_wait_acquires_after_release(tmp_path):
+  """Test that a waiting acquire succeeds once the holder releases."""
+  path = tmp_path / "test.lock"
+  holder = InstanceLock(path)
+  holder.acquire()
+  threading.Timer(0.1, holder.release).start()
+
+  waiter = InstanceLock(path)
+  waiter.acquire(timeout=5)
+
+  assert waiter.held
+  waiter.release()
+
+
+def test_lock_file_records_holder_and_result(tmp_path):
+  """Test that the holder and its result are readable by other processes."""
+  path = tmp_path / "test.lock"
+  with InstanceLock(path) as lock:
+    info = InstanceLock(path).read()
+    assert info is not None
+    assert info.run_id == lock.info.run_id
+    assert not info.finished
+    lock.finish(0, "done")
+
+  info = InstanceLock(path).read()
+  assert info.exit_code == 0
+  assert info.summary == "done"
+
+
+def test_unfinished_previous_holder_is_reported(tmp_path):
+  """Test that a run that died while holding the lock is detected."""
+  path = tmp_path / "test.lock"
+  path.write_text(json.dumps({"run_id": "dead", "pid": 999999, "started_at": 1.0}))
+
+  lock = InstanceLock(path)
+  lock.acquire(timeout=0)
+
+  assert lock.previous.run_id == "dead"
+  assert not lock.previous.finished
+  lock.release()
+
+
+def test_unreadable_lock_file(tmp_path):
+  """Test that garbage in the lock file is ignored."""
+  path = tmp_path / "test.lock"
+  path.write_text("not json")
+
+  assert InstanceLock(path).read() is None
+
+
+@pytest.fixture
+def upgrade_mocks():
+  """Mock an upgrade run whose Brewfile is unchanged."""
+  from den.hash_utils import compute_hash
+
+  with (
+    patch("den.commands.brew.setup_brew_logger", return_value=MagicMock()),
+    patch("den.commands.brew.run_brew_upgrade") as mock_upgrade,
+    patch("den.commands.brew.generate_brewfile", return_value="brew 'git'"),
+    patch(
+      "den.commands.brew.get_brew_state",
+      return_value={"brewfile_hash": compute_hash("brew 'git'")},
+    ),
+  ):
+    yield mock_upgrade
+
+
+def test_upgrade_exits_when_running(lock_dir, upgrade_mocks):
+  """Test that --if-running exit skips the upgrade."""
+  with InstanceLock(lock_dir / "brew-upgrade.lock"):
+    result = runner.invoke(app, ["brew", "upgrade", "--if-running", "exit"])
+
+  assert result.exit_code == 0
+  assert "Another brew upgrade is already running" in result.output
+  upgrade_mocks.assert_not_called()
+
+
+def test_upgrade_wait_times_out(lock_dir, upgrade_mocks):
+  """Test that waiting for a running upgrade gives up after the timeout."""
+  with InstanceLock(lock_dir / "brew-upgrade.lock"):
+    result = runner.invoke(app, ["brew", "upgrade", "--lock-timeout", "0.1"])
+
+  assert result.exit_code == 1
+  assert "Timed out" in result.output
+  upgrade_mocks.assert_not_called()
+
+
+@pytest.mark.usefixtures("isolated_upgrade_env")
+def test_upgrade_waits_then_runs(lock_dir, upgrade_mocks):
+  """Test that the default mode runs the upgrade after the other finishes."""
+  holder = InstanceLock(lock_dir / "brew-upgrade.lock")
+  holder.acquire()
+
+  def finish() -> None:
+    holder.finish(0, "Brewfile unchanged, skipping backup")
+    holder.release()
+
+  threading.Timer(0.2, finish).start()
+  result = runner.invoke(app, ["brew", "upgrade"])
+
+  assert result.exit_code == 0
+  assert "waiting for it to finish" in result.output
+  upgrade_mocks.assert_called_once()
+
+
+def test_upgrade_attaches_to_running_result(lock_dir, upgrade_mocks):
+  """Test that --if-running attach reports the running upgrade's result."""
+  holder = InstanceLock(lock_dir / "brew-upgrade.lock")
+  holder.acquire()
+
+  def finish() -> None:
+    holder.finish(1)
+    holder.release()
+
+  threading.Timer(0.2, finish).start()
+  result = runner.invoke(app, ["brew", "upgrade", "--if-running", "attach"])
+
+  assert result.exit_code == 1
+  assert "failed (exit code 1)" in result.output
+  upgrade_mocks.assert_not_called()
+
+
+@pytest.mark.usefixtures("isolated_upgrade_env")
+def test_upgrade_attach_runs_when_holder_died(lock_dir, upgrade_mocks):
+  """Test that attaching to a run that died runs the upgrade instead."""
+  holder = InstanceLock(lock_dir / "brew-upgrade.lock")
+  holder.acquire()
+  threading.Timer(0.2, holder.release).start()
+
+  result = runner.invoke(app, ["brew", "upgrade", "--if-running", "attach"])
+
+  assert result.exit_code == 0
+  assert "exited without finishing" in result.output
+  upgrade_mocks.assert_called_once()
+
+
+@pytest.mark.usefixtures("isolated_upgrade_env")
+def test_upgrade_records_result_in_lock_file(lock_dir, upgrade_mocks):
+  """Test that a finished upgrade leaves its result in the lock file."""
+  result = runner.invoke(app, ["brew", "upgrade"])
+
+  info = InstanceLock(lock_dir / "brew-upgrade.lock").read()
+  assert result.exit_code == 0
+  assert info.exit_code == 0
+  assert info.summary == "Brewfile unchanged, skipping backup"
+  assert info.finished_at >= info.started_at
+
+
+def test_holder_is_recorded_on_acquire(tmp_path):
+  """Test that the lock file names the holder as soon as it has the lock."""
+  path = tmp_path / "test.lock"
+  with InstanceLock(path) as first:
+    first.finish(0, "done")
+
+  second = InstanceLock(path)
+  second.acquire(timeout=0)
+  info = InstanceLock(path).read()
+  assert second.previous.run_id == first.info.run_id
+  assert info.run_id == second.info.run_id
+  assert not info.finished
+
+  second.abandon()
+  assert InstanceLock(path).read().run_id == first.info.run_id
@@ -135,3 +135,16 @@ def test_get_domain_returns_default_when_launchctl_not_dict():
     ):
       result = get_domain()
       assert result == DEFAULT_DOMAIN
+
+
+def test_get_domain_returns_default_when_domain_not_string():
+  """Test that get_domain returns default when domain is not a string."""
+  with tempfile.TemporaryDirectory() as tmpdir:
+    config_file = Path(tmpdir) / "config.json"
+    config_file.write_text(json.dumps({"launchctl": {"domain": 42}}))
+
+    with patch(
+      "den.launchctl_config.get_config_file_path", return_value=config_file
+    ):
+      result = get_domain()
+      assert result == DEFAULT_DOMAIN
@@ -0,0 +1,93 @@
+"""Unit tests for lazy command group loading.
+
+Tests that heavy command groups are only imported when invoked while
+help output still lists every group.
+"""
+
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import typer
+from typer.testing import CliRunner
+
+import den
+from den.main import DenGroup, app
+
+runner = CliRunner()
+
+
+def _imported_modules_after(args: list[str]) -> set[str]:
+  """Run den in a fresh interpreter and return the imported module names."""
+  script = (
+    "import sys\n"
+    "from den.main import app\n"
+    "try:\n"
+    f"  app({args!r})\n"
+    "except SystemExit:\n"
+    "  pass\n"
+    "print('\\n'.join(sys.modules), file=sys.stderr)\n"
+  )
+  src_dir = str(Path(den.__file__).resolve().parents[1])
+  result = subprocess.run(
+    [sys.executable, "-c", script],
+    capture_output=True,
+    text=True,
+    check=True,
+    env={**os.environ, "PYTHONPATH": src_dir},
+  )
+  return set(result.stderr.split())
+
+
+def test_hello_does_not_import_heavy_dependencies():
+  """Test that den hello skips anthropic, httpx and command group modules."""
+  modules = _imported_modules_after(["hello"])
+
+  assert "anthropic" not in modules
+  assert "httpx" not in modules
+  assert "den.commands.brew" not in modules
+  assert "den.commands.repo" not in modules
+
+
+def test_root_help_does_not_import_command_groups():
+  """Test that den --help lists groups without importing their modules."""
+  modules = _imported_modules_after(["--help"])
+
+  assert "anthropic" not in modules
+  assert "den.commands.auth" not in modules
+  assert "den.commands.launchctl" not in modules
+
+
+def test_invoked_group_imports_only_its_module():
+  """Test that invoking a group imports that group and not the others."""
+  modules = _imported_modules_after(["launchctl", "--help"])
+
+  assert "den.commands.launchctl" in modules
+  assert "den.commands.brew" not in modules
+  assert "anthropic" not in modules
+
+
+def test_help_lists_every_group():
+  """Test that --help shows all lazily registered command groups."""
+  result = runner.invoke(app, ["--help"])
+
+  assert result.exit_code == 0
+  for name in ("auth", "brew", "launchctl", "repo"):
+    assert name in result.output
+
+
+def test_lazy_help_matches_sub_app_help():
+  """Test that registered help text matches each sub-app's own help."""
+  group = typer.main.get_command(app)
+  assert isinstance(group, DenGroup)
+
+  for name, spec in DenGroup.lazy_groups.items():
+    assert group.load_command(name).help == spec.help
+
+
+def test_unknown_command_fails():
+  """Test that unknown commands are still rejected."""
+  result = runner.invoke(app, ["nonexistent"])
+
+  assert result.exit_code != 0
@@ -0,0 +1,143 @@
+"""Unit tests for log queries and `den brew logs`."""
+
+import logging
+from datetime import datetime
+from unittest.mock import patch
+
+import pytest
+from typer.testing import CliRunner
+
+from den.log_reader import RUN_START_MESSAGE, _since_offset, parse_since, query_log
+from den.logging_setup import (
+  LOG_DATE_FORMAT,
+  LOG_FORMAT,
+  CompressingRotatingFileHandler,
+  read_log_index,
+)
+from den.main import app
+
+runner = CliRunner()
+
+LOG = f"""2025-01-14 09:00:00 INFO: {RUN_START_MESSAGE}
+2025-01-14 09:00:05 ERROR: brew upgrade failed: exit 1
+Traceback (most recent call last):
+  File "brew.py", line 1
+2025-01-15 10:00:00 INFO: {RUN_START_MESSAGE}
+2025-01-15 10:00:01 WARNING: Credential preflight: slow
+2025-01-15 10:00:02 INFO: Brewfile unchanged, skipping backup
+2025-01-16 11:00:00 INFO: {RUN_START_MESSAGE}
+2025-01-16 11:00:03 INFO: Brew upgrade process completed successfully
+"""
+
+
+@pytest.fixture(params=[7, 64 * 1024], ids=["small-blocks", "one-block"])
+def log_file(request, tmp_path):
+  """Write the sample log, reading it back in blocks of different sizes."""
+  path = tmp_path / "brew-upgrade.log"
+  path.write_text(LOG)
+  with patch("den.log_reader.BLOCK_SIZE", request.param):
+    yield path
+
+
+def _messages(entries) -> list[str]:
+  """Return the first-line messages of log entries."""
+  return [entry.message for entry in entries]
+
+
+def test_tail_returns_last_records(log_file):
+  """Test --tail, including a record with continuation lines."""
+  entries = list(query_log(log_file, tail=2))
+  assert _messages(entries) == [
+    RUN_START_MESSAGE,
+    "Brew upgrade process completed successfully",
+  ]
+
+  entries = list(query_log(log_file, min_level=logging.ERROR, tail=5))
+  assert len(entries) == 1
+  assert entries[0].text.endswith('  File "brew.py", line 1')
+
+
+def test_runs_by_position(log_file):
+  """Test selecting the last and earlier runs."""
+  assert _messages(query_log(log_file, run=1)) == [
+    RUN_START_MESSAGE,
+    "Brew upgrade process completed successfully",
+  ]
+  assert _messages(query_log(log_file, run=2, min_level=logging.WARNING)) == [
+    "Credential preflight: slow"
+  ]
+  assert list(query_log(log_file, run=4)) == []
+
+
+def test_since_filters_by_time(log_file):
+  """Test --since forwards and combined with --tail."""
+  since = datetime(2025, 1, 15, 10, 0, 1)
+  assert len(list(query_log(log_file, since=since))) == 4
+  assert _messages(query_log(log_file, since=since, tail=1)) == [
+    "Brew upgrade process completed successfully"
+  ]
+
+
+def test_missing_log_yields_nothing(tmp_path):
+  """Test that a log that doesn't exist has no records."""
+  assert list(query_log(tmp_path / "missing.log", tail=3)) == []
+
+
+def test_since_seeks_with_index(tmp_path):
+  """Test that the handler's timestamp index is used to skip old records."""
+  log_file = tmp_path / "test.log"
+  handler = CompressingRotatingFileHandler(
+    log_file, max_bytes=0, when=None, index_interval=200
+  )
+  handler.setFormatter(logging.Formatter(LOG_FORMAT, LOG_DATE_FORMAT))
+  start = datetime(2025, 1, 15).timestamp()
+  for i in range(100):
+    record = logging.LogRecord("t", logging.INFO, "", 1, f"m{i}", None, None)
+    record.created = start + i * 60
+    handler.emit(record)
+  handler.close()
+
+  index = read_log_index(log_file)
+  assert len(index) > 5
+  since = datetime(2025, 1, 15, 1, 0)
+  size = log_file.stat().st_size
+  with log_file.open("rb") as f:
+    offset = _since_offset(f, log_file, "2025-01-15 01:00:00", size)
+  assert offset > 0
+  assert _messages(query_log(log_file, since=since))[0] == "m60"
+
+
+def test_parse_since():
+  """Test relative and absolute --since values."""
+  now = datetime(2025, 1, 15, 12, 0)
+  assert parse_since("2h", now) == datetime(2025, 1, 15, 10, 0)
+  assert parse_since("1w", now) == datetime(2025, 1, 8, 12, 0)
+  assert parse_since("2025-01-14 09:30") == datetime(2025, 1, 14, 9, 30)
+  with pytest.raises(ValueError):
+    parse_since("yesterday")
+
+
+def test_logs_command(log_file):
+  """Test `den brew logs` with filters, output and errors."""
+  with patch("den.commands.brew.get_log_file_path", return_value=log_file):
+    result = runner.invoke(app, ["brew", "logs", "--level", "error"])
+    assert result.exit_code == 0
+    assert "brew upgrade failed" in result.output
+    assert "Traceback" in result.output
+    assert RUN_START_MESSAGE not in result.output
+
+    args = ["brew", "logs", "--run", "last", "--level", "ERROR"]
+    result = runner.invoke(app, args)
+    assert "No matching log records." in result.output
+
+    result = runner.invoke(app, ["brew", "logs", "--run", "latest"])
+    assert result.exit_code == 1
+
+    result = runner.invoke(app, ["brew", "logs", "--since", "soon"])
+    assert result.exit_code == 1
+    assert "Invalid time" in result.output
+
+  missing = log_file.with_name("missing.log")
+  with patch("den.commands.brew.get_log_file_path", return_value=missing):
+    result = runner.invoke(app, ["brew", "logs"])
+  assert "No brew upgrade log yet." in result.output
@@ -0,0 +1,116 @@
+"""Unit tests for queued, rotating log files."""
+
+import gzip
+import logging
+import os
+import threading
+import time
+from unittest.mock import patch
+
+import pytest
+
+from den.logging_setup import (
+  DEFAULT_WHEN,
+  CompressingRotatingFileHandler,
+  get_logging_settings,
+  setup_queued_logger,
+  stop_queued_logging,
+)
+
+
+@pytest.fixture(autouse=True)
+def _stop_listeners():
+  """Stop listener threads started by a test."""
+  yield
+  stop_queued_logging()
+
+
+def _record(message: str) -> logging.LogRecord:
+  """Build an INFO record."""
+  return logging.LogRecord("test", logging.INFO, __file__, 1, message, None, None)
+
+
+def test_records_are_written_by_listener_thread(tmp_path):
+  """Test that log calls are queued and written on another thread."""
+  log_file = tmp_path / "logs" / "test.log"
+  writer_threads = []
+
+  original_emit = CompressingRotatingFileHandler.emit
+
+  def emit(self, record):
+    writer_threads.append(threading.current_thread())
+    original_emit(self, record)
+
+  with patch.object(CompressingRotatingFileHandler, "emit", emit):
+    logger = setup_queued_logger("den.test.queued", log_file)
+    logger.info("hello")
+    logger.error("failed")
+    stop_queued_logging()
+
+  lines = log_file.read_text().splitlines()
+  assert lines[0].endswith("INFO: hello")
+  assert lines[1].endswith("ERROR: failed")
+  assert threading.current_thread() not in writer_threads
+  assert not logger.handlers
+
+
+def test_setup_is_idempotent(tmp_path):
+  """Test that setting up a logger twice adds one handler."""
+  logger = setup_queued_logger("den.test.idempotent", tmp_path / "a.log")
+  again = setup_queued_logger("den.test.idempotent", tmp_path / "a.log")
+
+  assert again is logger
+  assert len(logger.handlers) == 1
+
+
+def test_size_rotation_compresses(tmp_path):
+  """Test that files over the size limit are rotated and gzipped."""
+  log_file = tmp_path / "test.log"
+  handler = CompressingRotatingFileHandler(
+    log_file, max_bytes=100, backup_count=2, when=None, index_interval=0
+  )
+  for i in range(20):
+    handler.emit(_record(f"message number {i:03d} " + "x" * 20))
+  handler.close()
+
+  rotated = sorted(path.name for path in tmp_path.iterdir())
+  assert rotated == ["test.log", "test.log.1.gz", "test.log.2.gz"]
+  rotated_content = gzip.decompress((tmp_path / "test.log.1.gz").read_bytes())
+  assert b"message number" in rotated_content
+
+
+def test_period_rotation_on_new_day(tmp_path):
+  """Test that the first record of a new day rotates yesterday's file."""
+  log_file = tmp_path / "test.log"
+  log_file.write_text("old entry\n")
+  yesterday = time.time() - 86400
+  os.utime(log_file, (yesterday, yesterday))
+
+  handler = CompressingRotatingFileHandler(log_file, when="daily")
+  handler.emit(_record("new entry"))
+  handler.emit(_record("another entry"))
+  handler.close()
+
+  rotated = tmp_path / "test.log.1.gz"
+  assert gzip.decompress(rotated.read_bytes()) == b"old entry\n"
+  assert "old entry" not in log_file.read_text()
+  assert len(log_file.read_text().splitlines()) == 2
+
+
+def test_settings_from_config():
+  """Test rotation settings from config.json with invalid values ignored."""
+  config = {"logging": {"max_bytes": 1000, "backup_count": "3", "when": "daily"}}
+  with patch("den.config.load_config") as mock_load:
+    mock_load.return_value.section.side_effect = lambda name: config.get(name, {})
+    settings = get_logging_settings()
+
+  assert settings == {"max_bytes": 1000, "backup_count": 8, "when": "daily"}
+
+
+def test_invalid_when_falls_back_to_default():
+  """Test that a misspelt period keeps the default and null disables it."""
+  for when, expected in (("dayly", DEFAULT_WHEN), (7, DEFAULT_WHEN), (None, None)):
+    config = {"logging": {"when": when}}
+    with patch("den.config.load_config") as mock_load:
+      mock_load.return_value.section.side_effect = lambda name: config.get(name, {})
+      assert get_logging_settings()["when"] == expected
@@ -0,0 +1,201 @@
+"""Unit tests for Prometheus textfile metrics.
+
+Tests the text format, atomic file replacement, metrics derived from spans,
+and the files written after commands when a metrics directory is set.
+"""
+
+from unittest.mock import MagicMock, patch
+
+import pytest
+from typer.testing import CliRunner
+
+from den.main import app
+from den.metrics import (
+  LAST_SUCCESS_METRIC,
+  MetricsCollector,
+  get_metrics_dir,
+  metrics_filename,
+  write_command_metrics,
+  write_textfile,
+)
+from den.tracing import Tracer, collect_spans
+
+runner = CliRunner()
+
+
+def test_render_text_format():
+  """Test HELP/TYPE lines, sorted labels and escaping of label values."""
+  collector = MetricsCollector()
+  collector.set("den_test", 1.5, "A test gauge.", b="x", a='say "hi"')
+
+  assert collector.render() == (
+    "# HELP den_test A test gauge.\n"
+    "# TYPE den_test gauge\n"
+    'den_test{a="say \\"hi\\"",b="x"} 1.5\n'
+  )
+
+
+def test_metrics_filename():
+  """Test that command names become safe .prom filenames."""
+  assert metrics_filename("brew upgrade") == "den_brew_upgrade.prom"
+  assert metrics_filename("hello-again") == "den_hello_again.prom"
+
+
+def test_metrics_dir_from_env(tmp_path):
+  """Test that DEN_METRICS_DIR enables metrics."""
+  with patch.dict("os.environ", {"DEN_METRICS_DIR": str(tmp_path)}):
+    assert get_metrics_dir() == tmp_path
+
+
+def test_write_textfile_replaces_atomically(tmp_path):
+  """Test that the file is replaced and no temporary file is left behind."""
+  path = tmp_path / "den_test.prom"
+  write_textfile(path, "old\n")
+  write_textfile(path, "new\n")
+
+  assert path.read_text() == "new\n"
+  assert [p.name for p in tmp_path.iterdir()] == ["den_test.prom"]
+
+
+def test_spans_become_metrics():
+  """Test that step, subprocess and HTTP spans produce metrics."""
+  tracer = Tracer()
+  tracer.start_span("upgrade", "step").end()
+  tracer.start_span("brew upgrade", "subprocess", exit_code=2).end()
+  tracer.start_span("POST /gists", "http", service="github", status_code=201).end()
+
+  collector = MetricsCollector()
+  collector.add_spans("brew upgrade", tracer.spans)
+  text = collector.render()
+
+  assert 'den_step_duration_seconds{command="brew upgrade",step="upgrade"}' in text
+  assert (
+    'den_subprocess_exit_code{command="brew upgrade",subprocess="brew upgrade"} 2'
+    in text
+  )
+  assert (
+    'den_http_request_status_code{command="brew upgrade",endpoint="POST /gists",'
+    'service="github"} 201' in text
+  )
+
+
+def test_anthropic_request_reports_status_code():
+  """Test that Brewfile formatting records the API's status code, not 0."""
+  import anthropic
+
+  from den.brewfile_formatter import BrewfileFormatterError, format_brewfile
+
+  response = MagicMock(status_code=401)
+  with (
+    patch("den.brewfile_formatter.anthropic.Anthropic") as mock_anthropic,
+    collect_spans() as tracer,
+  ):
+    create = mock_anthropic.return_value.messages.create
+    create.return_value = MagicMock(content=[MagicMock(text='brew "git"')])
+    format_brewfile('brew "git"', "test_api_key")
+    create.side_effect = anthropic.APIStatusError(
+      message="Invalid API key", response=response, body=None
+    )
+    with pytest.raises(BrewfileFormatterError):
+      format_brewfile('brew "git"', "bad_api_key")
+
+  assert [s.attributes.get("status_code") for s in tracer.spans] == [200, 401]
+  collector = MetricsCollector()
+  collector.add_spans("brew upgrade", tracer.spans[-1:])
+  assert (
+    'den_http_request_status_code{command="brew upgrade",'
+    'endpoint="POST /v1/messages",service="anthropic"} 401' in collector.render()
+  )
+
+
+def test_failed_run_keeps_last_success(tmp_path):
+  """Test that a failed run keeps the previous last-success timestamp."""
+  with patch("den.metrics.time.time", return_value=1000.0):
+    write_command_metrics(tmp_path, "hello", 0, 0.1)
+  with patch("den.metrics.time.time", return_value=2000.0):
+    path = write_command_metrics(tmp_path, "hello", 1, 0.1)
+
+  text = path.read_text()
+  assert f'{LAST_SUCCESS_METRIC}{{command="hello"}} 1000' in text
+  assert 'den_command_last_run_timestamp_seconds{command="hello"} 2000' in text
+  assert 'den_command_exit_code{command="hello"} 1' in text
+
+
+def test_command_writes_metrics_files(tmp_path):
+  """Test that a command writes its own file and the LaunchAgent count."""
+  result = runner.invoke(app, ["hello"], env={"DEN_METRICS_DIR": str(tmp_path)})
+
+  assert result.exit_code == 0
+  text = (tmp_path / "den_hello.prom").read_text()
+  assert 'den_command_exit_code{command="hello"} 0' in text
+  assert "den_launchagents_managed" in (tmp_path / "den_launchagents.prom").read_text()
+
+
+def test_no_metrics_without_directory(tmp_path):
+  """Test that nothing is written when no metrics directory is configured."""
+  with patch("den.metrics.get_metrics_dir", return_value=None):
+    result = runner.invoke(app, ["hello"], env={"DEN_METRICS_DIR": ""})
+
+  assert result.exit_code == 0
+  assert list(tmp_path.iterdir()) == []
+
+
+@pytest.mark.usefixtures("isolated_upgrade_env")
+@patch("den.commands.brew.run_brew_upgrade")
+@patch("den.commands.brew.generate_brewfile")
+@patch("den.commands.brew.get_brew_state")
+@patch("den.commands.brew.setup_brew_logger")
+def test_brew_upgrade_metrics(
+  mock_logger: MagicMock,
+  mock_get_state: MagicMock,
+  mock_generate: MagicMock,
+  mock_upgrade: MagicMock,
+  tmp_path,
+):
+  """Test that brew upgrade reports step durations and Brewfile changes."""
+  from den.hash_utils import compute_hash
+
+  mock_logger.return_value = MagicMock()
+  mock_generate.return_value = 'brew "git"'
+  mock_get_state.return_value = {"brewfile_hash": compute_hash('brew "git"')}
+
+  result = runner.invoke(
+    app, ["brew", "upgrade"], env={"DEN_METRICS_DIR": str(tmp_path)}
+  )
+
+  assert result.exit_code == 0
+  text = (tmp_path / "den_brew_upgrade.prom").read_text()
+  assert 'step="upgrade"' in text
+  assert 'step="dump"' in text
+  assert "den_brewfile_changed 0" in text
+  assert 'den_command_exit_code{command="brew upgrade"} 0' in text
+
+
+@pytest.mark.usefixtures("isolated_upgrade_env")
+@patch("den.commands.brew.run_brew_upgrade")
+@patch("den.commands.brew.generate_brewfile")
+@patch("den.commands.brew.get_brew_state")
+@patch("den.commands.brew.setup_brew_logger")
+def test_failed_command_reports_exit_code(
+  mock_logger: MagicMock,
+  mock_get_state: MagicMock,
+  mock_generate: MagicMock,
+  mock_upgrade: MagicMock,
+  tmp_path,
+):
+  """Test that the exit code of a failing command is recorded."""
+  from den.brew_runner import BrewCommandError
+
+  mock_logger.return_value = MagicMock()
+  mock_get_state.return_value = {"brewfile_hash": "sha256:x", "gist_id": "g"}
+  mock_generate.return_value = "brew 'git'"
+  mock_upgrade.side_effect = BrewCommandError("brew upgrade", 1, "failed")
+
+  result = runner.invoke(
+    app, ["brew", "upgrade"], env={"DEN_METRICS_DIR": str(tmp_path)}
+  )
+
+  assert result.exit_code == 1
+  text = (tmp_path / "den_brew_upgrade.prom").read_text()
+  assert 'den_command_exit_code{command="brew upgrade"} 1' in text
+  assert LAST_SUCCESS_METRIC not in text
@@ -0,0 +1,71 @@
+"""Unit tests for the stage graph executor."""
+
+import threading
+import time
+
+import pytest
+
+from den.pipeline import Pipeline, PipelineError
+
+
+def test_stages_run_after_their_dependencies():
+  """Test dependency order and returned results."""
+  order = []
+  pipeline = Pipeline()
+  pipeline.add("a", lambda: order.append("a") or 1)
+  pipeline.add("b", lambda: order.append("b") or 2, after=["a"])
+  pipeline.add("c", lambda: order.append("c") or 3, after=["a", "b"])
+
+  assert pipeline.run() == {"a": 1, "b": 2, "c": 3}
+  assert order == ["a", "b", "c"]
+
+
+def test_independent_stages_overlap():
+  """Test that wall time follows the critical path, not the sum."""
+  pipeline = Pipeline()
+  pipeline.add("root", lambda: None)
+  for name in ("x", "y", "z"):
+    pipeline.add(name, lambda: time.sleep(0.2), after=["root"])
+
+  start = time.perf_counter()
+  pipeline.run()
+
+  assert time.perf_counter() - start < 0.5
+
+
+def test_failure_cancels_only_dependent_stages():
+  """Test that a failing stage cancels its dependents but not other stages."""
+  slow_done = threading.Event()
+  started = []
+
+  def fail():
+    raise ValueError("boom")
+
+  def slow():
+    time.sleep(0.2)
+    slow_done.set()
+
+  pipeline = Pipeline()
+  pipeline.add("slow", slow)
+  pipeline.add("fail", fail)
+  pipeline.add("after fail", lambda: started.append("after fail"), after=["fail"])
+  pipeline.add("after slow", lambda: started.append("after slow"), after=["slow"])
+  pipeline.add("join", lambda: started.append("join"), after=["after fail", "slow"])
+
+  with pytest.raises(ValueError, match="boom"):
+    pipeline.run()
+
+  assert slow_done.is_set()
+  assert started == ["after slow"]
+  assert sorted(pipeline.cancelled) == ["after fail", "join"]
+
+
+def test_invalid_stages_are_rejected():
+  """Test duplicate names and dependencies on unknown stages."""
+  pipeline = Pipeline()
+  pipeline.add("a", lambda: None)
+
+  with pytest.raises(PipelineError, match="already defined"):
+    pipeline.add("a", lambda: None)
+  with pytest.raises(PipelineError, match="unknown stage 'b'"):
+    pipeline.add("c", lambda: None, after=["b"])
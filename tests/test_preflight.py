@@ -0,0 +1,178 @@
+"""Unit tests for the credential preflight checks."""
+
+from unittest.mock import MagicMock, patch
+
+import httpx
+import pytest
+from typer.testing import CliRunner
+
+from den.main import app
+from den.preflight import (
+  CredentialCheck,
+  check_anthropic_key,
+  check_github_token,
+  verify_credentials,
+)
+
+runner = CliRunner()
+
+
+def _mock_client(status_code: int = 200, headers: dict | None = None) -> MagicMock:
+  """Return a mock httpx.Client whose get() returns the given response."""
+  response = MagicMock()
+  response.status_code = status_code
+  response.headers = httpx.Headers(headers or {})
+  client = MagicMock()
+  client.__enter__ = MagicMock(return_value=client)
+  client.__exit__ = MagicMock(return_value=False)
+  client.get.return_value = response
+  return client
+
+
+@pytest.mark.parametrize(
+  ("status_code", "headers", "valid"),
+  [
+    (200, {"X-OAuth-Scopes": "repo, gist"}, True),
+    (200, {}, True),
+    (200, {"X-OAuth-Scopes": "repo"}, False),
+    (401, {}, False),
+    (500, {}, None),
+  ],
+)
+def test_check_github_token(status_code, headers, valid):
+  """Test GitHub token results for scopes and status codes."""
+  client = _mock_client(status_code, headers)
+  with patch("den.preflight.httpx.Client", return_value=client):
+    check = check_github_token("token")
+
+  assert check.valid is valid
+  assert client.get.call_args[0][0].endswith("/user")
+
+
+def test_check_github_token_network_error():
+  """Test that a network error leaves the token unverified."""
+  client = _mock_client()
+  client.get.side_effect = httpx.ConnectError("offline")
+  with patch("den.preflight.httpx.Client", return_value=client):
+    check = check_github_token("token")
+
+  assert check.valid is None
+
+
+@pytest.mark.parametrize(
+  ("status_code", "valid"), [(200, True), (401, False), (529, None)]
+)
+def test_check_anthropic_key(status_code, valid):
+  """Test Anthropic key results for status codes."""
+  client = _mock_client(status_code)
+  with patch("den.preflight.httpx.Client", return_value=client):
+    check = check_anthropic_key("key")
+
+  assert check.valid is valid
+  assert client.get.call_args[1]["headers"]["x-api-key"] == "key"
+
+
+def test_results_are_cached_by_fingerprint(preflight_store):
+  """Test that results are reused within the TTL and keyed by credential."""
+  with patch(
+    "den.preflight.check_credential",
+    side_effect=lambda key, value: CredentialCheck(key, True, "ok"),
+  ) as mock_check:
+    first = verify_credentials({"github_token": "a"}, ["github_token"])
+    second = verify_credentials({"github_token": "a"}, ["github_token"])
+    verify_credentials({"github_token": "b"}, ["github_token"])
+
+  assert not first["github_token"].cached
+  assert second["github_token"].cached
+  assert mock_check.call_count == 2
+  cached = preflight_store.get("preflight")["github_token"]
+  assert "b" not in cached.values()
+  assert cached["fingerprint"].startswith("sha256:")
+
+
+@pytest.mark.usefixtures("preflight_store", "state_file")
+def test_expired_and_unverified_results_are_rechecked():
+  """Test that old results and unverified results are not reused."""
+  with patch(
+    "den.preflight.check_credential",
+    side_effect=lambda key, value: CredentialCheck(key, None, "offline"),
+  ) as mock_check:
+    verify_credentials({"github_token": "a"}, ["github_token"])
+    verify_credentials({"github_token": "a"}, ["github_token"])
+  assert mock_check.call_count == 2
+
+  with patch("den.preflight.time.time", return_value=0.0):
+    verify_credentials({"github_token": "a"}, ["github_token"])
+  with patch("den.preflight.check_credential") as mock_check:
+    mock_check.return_value = CredentialCheck("github_token", True, "ok")
+    result = verify_credentials({"github_token": "a"}, ["github_token"])
+  assert not result["github_token"].cached
+  mock_check.assert_called_once()
+
+
+@pytest.mark.usefixtures("preflight_store", "state_file")
+def test_missing_credentials_are_skipped():
+  """Test that only configured credentials are checked."""
+  result = verify_credentials({"github_token": "a"}, ["anthropic_api_key"])
+
+  assert result == {}
+
+
+@pytest.mark.usefixtures("isolated_upgrade_env")
+@patch("den.commands.brew.run_brew_upgrade")
+@patch("den.commands.brew.generate_brewfile")
+@patch("den.commands.brew.load_credentials")
+@patch("den.commands.brew.format_brewfile")
+@patch("den.commands.brew.get_brew_state")
+@patch("den.commands.brew.setup_brew_logger")
+def test_rejected_credential_fails_before_formatting(
+  mock_logger: MagicMock,
+  mock_get_state: MagicMock,
+  mock_format: MagicMock,
+  mock_credentials: MagicMock,
+  mock_generate: MagicMock,
+  mock_upgrade: MagicMock,
+) -> None:
+  """Test that a revoked token stops the upgrade before the AI call."""
+  mock_logger.return_value = MagicMock()
+  mock_get_state.return_value = None
+  mock_generate.return_value = "brew 'git'"
+  mock_credentials.return_value = {
+    "anthropic_api_key": "key",
+    "github_token": "revoked",
+  }
+
+  def check(key: str, value: str) -> CredentialCheck:
+    if key == "github_token":
+      return CredentialCheck(key, False, "GitHub token is invalid or revoked")
+    return CredentialCheck(key, True, "ok")
+
+  with patch("den.preflight.check_credential", side_effect=check):
+    result = runner.invoke(app, ["brew", "upgrade"])
+
+  assert result.exit_code == 1
+  assert "GitHub token is invalid or revoked" in result.output
+  mock_format.assert_not_called()
+
+
+@pytest.mark.usefixtures("history_db", "lock_dir")
+@patch("den.commands.brew.run_brew_upgrade")
+@patch("den.commands.brew.load_credentials")
+@patch("den.commands.brew.get_brew_state")
+@patch("den.commands.brew.setup_brew_logger")
+def test_missing_credential_fails_before_brew_upgrade_when_forced(
+  mock_logger: MagicMock,
+  mock_get_state: MagicMock,
+  mock_credentials: MagicMock,
+  mock_upgrade: MagicMock,
+) -> None:
+  """Test that a certain backup checks credential presence up front."""
+  mock_logger.return_value = MagicMock()
+  mock_get_state.return_value = {"brewfile_hash": "sha256:x", "gist_id": "g"}
+  mock_credentials.return_value = {"anthropic_api_key": "key"}
+
+  result = runner.invoke(app, ["brew", "upgrade", "--force"])
+
+  assert result.exit_code == 1
+  assert "GitHub token not configured" in result.output
+  mock_upgrade.assert_not_called()
@@ -0,0 +1,101 @@
+"""Unit tests for command profiling.
+
+Tests that profile sessions write reports and that the global --profile
+option and DEN_PROFILE environment variable enable them.
+"""
+
+import pstats
+from unittest.mock import patch
+
+from typer.testing import CliRunner
+
+from den.main import app
+from den.profiling import ProfileSession, get_profiles_dir
+
+runner = CliRunner()
+
+
+def test_profiles_dir_returns_expected_location(tmp_path):
+  """Test that get_profiles_dir returns ~/.config/den/profiles."""
+  with patch("den.profiling.Path.home", return_value=tmp_path):
+    assert get_profiles_dir() == tmp_path / ".config" / "den" / "profiles"
+
+
+def test_session_writes_loadable_pstats(tmp_path):
+  """Test that a CPU-only session writes a single readable .pstats file."""
+  with patch("den.profiling.get_profiles_dir", return_value=tmp_path):
+    session = ProfileSession("brew upgrade")
+    session.start()
+    sum(range(1000))
+    paths = session.stop()
+
+  assert len(paths) == 1
+  assert paths[0].name.startswith("brew-upgrade-")
+  assert paths[0].suffix == ".pstats"
+  pstats.Stats(str(paths[0]))
+
+
+def test_session_writes_allocation_report(tmp_path):
+  """Test that a memory session also writes the top allocation sites."""
+  with patch("den.profiling.get_profiles_dir", return_value=tmp_path):
+    session = ProfileSession("hello", memory=True, top_allocations=5)
+    session.start()
+    data = [str(i) for i in range(1000)]
+    paths = session.stop()
+
+  assert len(data) == 1000
+  report = paths[1].read_text()
+  assert paths[1].name.endswith(".allocations.txt")
+  assert "Command: den hello" in report
+  assert "Top 5 allocation sites:" in report
+
+
+def test_profile_option_names_report_after_command(tmp_path):
+  """Test that --profile writes a report named after the nested command."""
+  with patch("den.profiling.get_profiles_dir", return_value=tmp_path):
+    result = runner.invoke(
+      app, ["--profile", "completion", "generate", "--shell", "bash"]
+    )
+
+  assert result.exit_code == 0
+  assert [p.name for p in tmp_path.iterdir()][0].startswith("completion-generate-")
+
+
+def test_profile_env_var_enables_profiling(tmp_path):
+  """Test that DEN_PROFILE=1 enables profiling without the option."""
+  with patch("den.profiling.get_profiles_dir", return_value=tmp_path):
+    result = runner.invoke(app, ["hello"], env={"DEN_PROFILE": "1"})
+
+  assert result.exit_code == 0
+  assert "Hello, World!" in result.output
+  assert len(list(tmp_path.glob("hello-*.pstats"))) == 1
+
+
+def test_no_profile_by_default(tmp_path):
+  """Test that nothing is written without --profile."""
+  with patch("den.profiling.get_profiles_dir", return_value=tmp_path):
+    result = runner.invoke(app, ["hello"], env={"DEN_PROFILE": ""})
+
+  assert result.exit_code == 0
+  assert list(tmp_path.iterdir()) == []
+
+
+def _stage_work() -> int:
+  """Stand-in for an upgrade stage."""
+  return sum(range(1000))
+
+
+def test_session_profiles_pipeline_stages(tmp_path):
+  """Test that stages run on pipeline worker threads are in the report."""
+  from den.pipeline import Pipeline
+
+  with patch("den.profiling.get_profiles_dir", return_value=tmp_path):
+    session = ProfileSession("brew upgrade")
+    session.start()
+    pipeline = Pipeline()
+    pipeline.add("work", _stage_work)
+    pipeline.run()
+    paths = session.stop()
+
+  functions = {name for _, _, name in pstats.Stats(str(paths[0])).stats}
+  assert "_stage_work" in functions
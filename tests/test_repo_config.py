@@ -98,3 +98,14 @@ def test_get_default_org_returns_none_when_repo_not_dict():
         with patch("den.repo_config.get_config_file_path", return_value=config_file):
             result = get_default_org()
             assert result is None
+
+
+def test_get_default_org_returns_none_when_default_org_not_string():
+    """Test that get_default_org returns None when default_org is not a string."""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        config_file = Path(tmpdir) / "config.json"
+        config_file.write_text(json.dumps({"repo": {"default_org": 42}}))
+
+        with patch("den.repo_config.get_config_file_path", return_value=config_file):
+            result = get_default_org()
+            assert result is None
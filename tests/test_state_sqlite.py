@@ -0,0 +1,117 @@
+"""Unit tests for the SQLite state backend.
+
+Tests migration from state.json, transactions, concurrent updates and
+backend selection through config.json.
+"""
+
+import json
+import sqlite3
+import threading
+from unittest.mock import patch
+
+import pytest
+
+from den.config import clear_config_cache
+from den.state_sqlite import SqliteStateStore
+from den.state_storage import (
+  StateStore,
+  get_brew_state,
+  get_state_store,
+  save_brew_state,
+)
+
+
+def test_migrates_state_json_on_first_use(tmp_path):
+  """Test that existing state.json keys are imported into the database."""
+  json_path = tmp_path / "state.json"
+  json_path.write_text(json.dumps({"brew": {"gist_id": "abc"}, "other": [1]}))
+
+  store = SqliteStateStore(tmp_path / "state.db", json_path=json_path)
+
+  assert store.load() == {"brew": {"gist_id": "abc"}, "other": [1]}
+  assert json_path.exists()
+
+
+def test_migration_runs_once(tmp_path):
+  """Test that state.json is not re-imported after the first open."""
+  json_path = tmp_path / "state.json"
+  json_path.write_text(json.dumps({"brew": {"gist_id": "abc"}}))
+  SqliteStateStore(tmp_path / "state.db", json_path=json_path).load()
+
+  json_path.write_text(json.dumps({"brew": {"gist_id": "changed"}}))
+  store = SqliteStateStore(tmp_path / "state.db", json_path=json_path)
+
+  assert store.get("brew") == {"gist_id": "abc"}
+
+
+def test_database_uses_wal(tmp_path):
+  """Test that the database is opened in WAL journal mode."""
+  SqliteStateStore(tmp_path / "state.db").load()
+
+  conn = sqlite3.connect(tmp_path / "state.db")
+  assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+  conn.close()
+
+
+def test_transaction_rolls_back_on_error(tmp_path):
+  """Test that nothing is committed when the transaction block raises."""
+  store = SqliteStateStore(tmp_path / "state.db")
+  with store.transaction() as state:
+    state["brew"] = {"gist_id": "abc"}
+
+  with pytest.raises(RuntimeError):
+    with store.transaction() as state:
+      state["brew"] = {"gist_id": "lost"}
+      raise RuntimeError("boom")
+
+  assert store.get("brew") == {"gist_id": "abc"}
+
+
+def test_concurrent_updates_are_not_lost(tmp_path):
+  """Test that concurrent read-modify-write transactions are serialized."""
+  db_path = tmp_path / "state.db"
+  SqliteStateStore(db_path).load()
+
+  def increment(feature: str) -> None:
+    store = SqliteStateStore(db_path)
+    for _ in range(20):
+      with store.transaction() as state:
+        counters = state.setdefault(feature, {"count": 0})
+        counters["count"] += 1
+    store.close()
+
+  threads = [
+    threading.Thread(target=increment, args=(feature,))
+    for feature in ("shared", "shared", "brew", "other")
+  ]
+  for thread in threads:
+    thread.start()
+  for thread in threads:
+    thread.join()
+
+  state = SqliteStateStore(db_path).load()
+  assert state["shared"]["count"] == 40
+  assert state["brew"]["count"] == 20
+  assert state["other"]["count"] == 20
+
+
+def test_backend_selected_in_config(tmp_path):
+  """Test that state.backend selects the SQLite store for brew state."""
+  config_file = tmp_path / "config.json"
+  config_file.write_text(json.dumps({"state": {"backend": "sqlite"}}))
+  state_file = tmp_path / "state.json"
+  state_file.write_text(json.dumps({"brew": {"gist_id": "abc"}}))
+
+  clear_config_cache()
+  with (
+    patch("den.config.get_config_file_path", return_value=config_file),
+    patch("den.state_storage.get_state_file_path", return_value=state_file),
+  ):
+    assert isinstance(get_state_store(), SqliteStateStore)
+    assert get_brew_state() == {"gist_id": "abc"}
+    save_brew_state("hash", "abc")
+    assert isinstance(get_state_store("json"), StateStore)
+  clear_config_cache()
+
+  assert (tmp_path / "state.db").exists()
+  assert json.loads(state_file.read_text()) == {"brew": {"gist_id": "abc"}}
@@ -8,9 +8,11 @@ import tempfile
 from pathlib import Path
 from unittest.mock import patch
 
+import pytest
 from hypothesis import given, settings, strategies as st
 
 from den.state_storage import (
+  StateStore,
   load_state,
   save_state,
   get_brew_state,
@@ -125,3 +127,77 @@ def test_property_state_serialization_round_trip(
         "brewfile_hash should round-trip correctly"
       )
       assert result["gist_id"] == gist_id, "gist_id should round-trip correctly"
+
+
+def test_read_then_save_parses_once(tmp_path) -> None:
+  """Test that reading and then saving brew state parses state.json once."""
+  state_file = tmp_path / "state.json"
+  state_file.write_text(json.dumps({"other": 1, "brew": {"gist_id": "abc"}}))
+  store = StateStore(state_file)
+
+  with (
+    patch("den.state_storage.get_state_store", return_value=store),
+    patch("den.state_storage.json.load", wraps=json.load) as mock_load,
+  ):
+    assert get_brew_state() == {"gist_id": "abc"}
+    save_brew_state("hash", "abc")
+    assert load_state()["brew"] == {"brewfile_hash": "hash", "gist_id": "abc"}
+
+  assert mock_load.call_count == 1
+  assert json.loads(state_file.read_text())["other"] == 1
+
+
+def test_failed_transaction_writes_nothing(tmp_path) -> None:
+  """Test that an exception inside a transaction leaves the file untouched."""
+  state_file = tmp_path / "state.json"
+  state_file.write_text(json.dumps({"brew": {"gist_id": "abc"}}))
+  store = StateStore(state_file)
+
+  with pytest.raises(RuntimeError):
+    with store.transaction() as state:
+      state["brew"] = {}
+      raise RuntimeError("boom")
+
+  assert store.get("brew") == {"gist_id": "abc"}
+  assert json.loads(state_file.read_text()) == {"brew": {"gist_id": "abc"}}
+
+
+def test_interrupted_write_keeps_old_file(tmp_path) -> None:
+  """Test that a failed replace keeps the old file and leaves no temp file."""
+  state_file = tmp_path / "state.json"
+  state_file.write_text(json.dumps({"brew": {"gist_id": "abc"}}))
+  store = StateStore(state_file)
+
+  with patch("den.file_utils.os.replace", side_effect=OSError("disk full")):
+    with pytest.raises(OSError):
+      with store.transaction() as state:
+        state["brew"] = {"gist_id": "new"}
+
+  assert json.loads(state_file.read_text()) == {"brew": {"gist_id": "abc"}}
+  assert [p.name for p in tmp_path.iterdir()] == ["state.json"]
+
+
+def test_corrupt_file_is_kept_aside(tmp_path) -> None:
+  """Test that a corrupt state.json is preserved before being replaced."""
+  state_file = tmp_path / "state.json"
+  state_file.write_text('{"brew": {"gist_id": "ab')
+  store = StateStore(state_file)
+
+  assert store.load() == {}
+  with store.transaction() as state:
+    state["brew"] = {"gist_id": "new"}
+
+  assert (tmp_path / "state.json.corrupt").read_text() == '{"brew": {"gist_id": "ab'
+  assert json.loads(state_file.read_text()) == {"brew": {"gist_id": "new"}}
+
+
+def test_external_changes_are_reloaded(tmp_path) -> None:
+  """Test that a change made by another process is picked up."""
+  state_file = tmp_path / "state.json"
+  state_file.write_text(json.dumps({"brew": {"gist_id": "abc"}}))
+  store = StateStore(state_file)
+  assert store.get("brew") == {"gist_id": "abc"}
+
+  state_file.write_text(json.dumps({"brew": {"gist_id": "other"}}))
+
+  assert store.get("brew") == {"gist_id": "other"}
@@ -0,0 +1,108 @@
+"""Unit tests for span tracing.
+
+Tests that spans are recorded only while tracing is enabled, that the
+Chrome trace export is well formed, and that the global --trace option
+writes a trace file.
+"""
+
+import json
+from unittest.mock import patch
+
+import pytest
+from typer.testing import CliRunner
+
+from den.brew_runner import run_brew_upgrade
+from den.main import app
+from den.tracing import get_tracer, span, start_tracing, stop_tracing
+
+runner = CliRunner()
+
+
+@pytest.fixture(autouse=True)
+def _reset_tracing():
+  yield
+  stop_tracing()
+
+
+def test_spans_are_not_recorded_when_disabled():
+  """Test that spans work but are discarded without an active tracer."""
+  assert get_tracer() is None
+  with span("work") as s:
+    s.set_attribute("key", "value")
+
+  assert s.end_ns is not None
+
+
+def test_span_records_attributes_and_errors():
+  """Test that spans record attributes and the type of a raised error."""
+  tracer = start_tracing()
+  with pytest.raises(ValueError):
+    with span("failing", "step", item=1):
+      raise ValueError("boom")
+
+  assert len(tracer.spans) == 1
+  assert tracer.spans[0].attributes == {"item": 1, "error": "ValueError"}
+
+
+def test_chrome_trace_export():
+  """Test that the export contains complete events with microsecond times."""
+  tracer = start_tracing()
+  with span("outer", path=object()):
+    with span("inner", "subprocess"):
+      pass
+
+  events = tracer.to_chrome_trace()["traceEvents"]
+  complete = [e for e in events if e["ph"] == "X"]
+
+  assert [e["name"] for e in complete] == ["outer", "inner"]
+  assert complete[1]["cat"] == "subprocess"
+  assert complete[0]["dur"] >= complete[1]["dur"]
+  assert isinstance(complete[0]["args"]["path"], str)
+  assert any(e["name"] == "process_name" for e in events)
+
+
+def test_brew_subprocess_span_records_exit_code():
+  """Test that brew subprocess calls are traced with their exit code."""
+  tracer = start_tracing()
+  with patch("den.brew_runner.stream_command", return_value=(0, "")):
+    run_brew_upgrade()
+
+  assert tracer.spans[0].name == "brew upgrade"
+  assert tracer.spans[0].attributes["exit_code"] == 0
+
+
+def test_trace_option_writes_file(tmp_path):
+  """Test that --trace writes a trace with a root span for the command."""
+  trace_path = tmp_path / "trace.json"
+  result = runner.invoke(
+    app, ["--trace", str(trace_path), "completion", "generate", "--shell", "bash"]
+  )
+
+  assert result.exit_code == 0
+  events = json.loads(trace_path.read_text())["traceEvents"]
+  assert "den completion generate" in [e["name"] for e in events]
+  assert get_tracer() is None
+
+
+def test_launchctl_install_steps_are_traced(tmp_path):
+  """Test that `den launchctl install` records its steps in the trace."""
+  trace_path = tmp_path / "trace.json"
+  agents_dir = tmp_path / "agents"
+  plist_path = agents_dir / "com.example.backup.plist"
+  with (
+    patch("den.commands.launchctl.get_domain", return_value="com.example"),
+    patch("den.commands.launchctl.get_launch_agents_dir", return_value=agents_dir),
+    patch("den.commands.launchctl.build_plist_path", return_value=plist_path),
+    patch("den.commands.launchctl.load_agent"),
+  ):
+    result = runner.invoke(
+      app,
+      ["--trace", str(trace_path), "launchctl", "install"],
+      input="backup\necho hi\n1\n3600\n",
+    )
+
+  assert result.exit_code == 0, result.output
+  events = json.loads(trace_path.read_text())["traceEvents"]
+  steps = [e["name"] for e in events if e.get("cat") == "step"]
+  assert steps == ["generate plist", "write plist", "load"]
+  assert plist_path.exists()